@@ -20,12 +20,32 @@ a = Analysis(
         'src',
         'src.gui.desktop.main_window',
         'src.gui.desktop.preview_panel',
+        'src.gui.desktop.preview_renderer',
         'src.gui.desktop.table_editor',
+        'src.gui.desktop.table_store',
         'src.gui.desktop.icon_manager',
         'src.converters.markdown_to_docx',
         'src.converters.formula_converter',
+        'src.converters.math_converter',
+        'src.converters.latex_builder',
+        'src.converters.docx_merge',
+        'src.converters.ooxml_package',
+        'src.converters.image_assets',
+        'src.converters.project_builder',
+        'latex2mathml.converter',
         'src.converters.latex_exporter',
         'src.converters.table_converter',
+        'src.converters.pandoc_runner',
+        'src.converters.pdf_exporter',
+        'src.converters.document_exporter',
+        'src.converters.batch_converter',
+        'src.cli',
+        'src.parsers.extended_markdown',
+        'src.utils.cache',
+        'src.utils.formula_cache',
+        'src.templates.style_engine',
+        'src.templates.registry',
+        'src.templates.reference_doc',
         'src.utils.config',
         'PIL',
         'PIL._tkinter_finder',
@@ -2,19 +2,28 @@
 """
 Markdown to Academia - 桌面端入口
 学术论文格式转换工具
+
+带子命令运行时（如 `markdown2academia batch ...`）进入无界面命令行模式。
 """
 
 import sys
 import os
+import multiprocessing
 
 # 添加 src 到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.gui.desktop.main_window import MainWindow
-
 
 def main():
     """主入口函数"""
+    # 打包后的可执行文件中，批量转换的工作进程需要此调用
+    multiprocessing.freeze_support()
+
+    if len(sys.argv) > 1:
+        from src.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    from src.gui.desktop.main_window import MainWindow
     app = MainWindow()
     app.run()
 
@@ -0,0 +1,124 @@
+"""
+命令行入口 - 无界面批量转换
+
+用法:
+    markdown2academia batch "theses/**/*.md" --format docx --template thesis -o out/
+    markdown2academia build thesis.yaml --format docx
+"""
+
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="markdown2academia",
+        description="Markdown to Academia - 学术论文格式转换工具（不带参数运行时启动图形界面）",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch = subparsers.add_parser("batch", help="批量转换 Markdown 文件")
+    batch.add_argument("inputs", nargs="+",
+                       help="输入文件、目录或 glob 模式（支持 **，请加引号避免 shell 展开）")
+    batch.add_argument("-f", "--format", dest="output_format", default="docx",
+                       choices=["docx", "latex", "pdf"], help="输出格式（默认 docx）")
+    batch.add_argument("-t", "--template", default="thesis",
+                       help="模板名称（默认 thesis）")
+    batch.add_argument("-o", "--output-dir", default=None,
+                       help="输出目录（默认输出到源文件旁）")
+    batch.add_argument("-j", "--jobs", type=int, default=None,
+                       help="并行进程数（默认等于 CPU 核数）")
+    batch.add_argument("--no-server", action="store_true",
+                       help="不使用常驻 pandoc server，每个文件启动一次 pandoc")
+    batch.add_argument("--no-cache", action="store_true",
+                       help="忽略转换缓存，强制重新转换所有文件")
+
+    build = subparsers.add_parser("build", help="按项目清单构建多文件论文（只重新转换修改过的章节）")
+    build.add_argument("manifest", help="项目清单 YAML 文件")
+    build.add_argument("-f", "--format", dest="output_format", default="docx",
+                       choices=["docx", "latex", "pdf"], help="输出格式（默认 docx）")
+    build.add_argument("-o", "--output", default=None,
+                       help="输出文件（默认使用清单中的 output，或清单旁的同名文件）")
+    build.add_argument("-j", "--jobs", type=int, default=None,
+                       help="并行转换章节的进程数（默认等于 CPU 核数）")
+    build.add_argument("--force", action="store_true",
+                       help="忽略章节哈希，重新转换所有章节")
+
+    return parser
+
+
+def _run_build(args) -> int:
+    """按项目清单构建，返回退出码"""
+    import yaml
+    from src.converters.project_builder import ProjectBuilder, load_manifest
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        print(f"无法读取项目清单: {e}", file=sys.stderr)
+        return 2
+
+    def report(chapter, changed):
+        print(f"[{'转换' if changed else '未变'}] {chapter}")
+
+    start = time.perf_counter()
+    try:
+        result = ProjectBuilder(manifest, workers=args.jobs).build(args.output_format, args.output,
+                                                force=args.force, on_chapter=report)
+    except Exception as e:
+        print(f"构建失败: {e}", file=sys.stderr)
+        return 1
+
+    elapsed = time.perf_counter() - start
+    print(f"完成: {len(result.rebuilt)} 章重新转换, {len(result.reused)} 章未变, "
+          f"总耗时 {elapsed:.2f}s -> {result.output_file}")
+    return 0
+
+
+def _run_batch(args) -> int:
+    """执行批量转换，返回退出码"""
+    from src.converters.batch_converter import BatchConverter
+
+    converter = BatchConverter(output_format=args.output_format, template=args.template,
+                               output_dir=args.output_dir, workers=args.jobs,
+                               use_pandoc_server=not args.no_server,
+                               use_cache=not args.no_cache)
+    input_files = converter.collect_inputs(args.inputs)
+    if not input_files:
+        print("未找到匹配的 Markdown 文件", file=sys.stderr)
+        return 2
+
+    print(f"共 {len(input_files)} 个文件，使用 {min(converter.workers, len(input_files))} 个进程")
+
+    def report(result):
+        if result.success:
+            status = "缓存" if result.cached else "成功"
+            print(f"[{status}] {result.elapsed:7.2f}s  {result.input_file} -> {result.output_file}")
+        else:
+            print(f"[失败] {result.elapsed:7.2f}s  {result.input_file}: {result.error}",
+                  file=sys.stderr)
+
+    start = time.perf_counter()
+    results = converter.run(input_files, on_result=report)
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if not r.success]
+    print(f"完成: {len(results) - len(failed)} 成功, {len(failed)} 失败, 总耗时 {elapsed:.2f}s")
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行主函数，返回退出码"""
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        return _run_batch(args)
+    if args.command == "build":
+        return _run_build(args)
+
+    parser.print_help()
+    return 2
@@ -0,0 +1,151 @@
+"""
+批量转换器 - 多进程并行转换整个目录的 Markdown 论文
+"""
+
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, List, Optional
+
+from src.converters.document_exporter import DocumentExporter
+from src.converters.pandoc_runner import get_pandoc_runner
+
+
+class BatchResult:
+    """单个文件的转换结果"""
+
+    def __init__(self, input_file: str, output_file: str, success: bool,
+                 elapsed: float, error: str = "", cached: bool = False):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.success = success
+        self.elapsed = elapsed
+        self.error = error
+        self.cached = cached
+
+
+def _convert_one(input_file: str, output_file: str, output_format: str,
+                 template: str, use_cache: bool = True) -> BatchResult:
+    """
+    在工作进程中转换单个文件
+
+    切换到输入文件所在目录，使 #figure / #table 中的相对路径按文档位置解析。
+    """
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    try:
+        os.chdir(os.path.dirname(input_file))
+        # 文件之间已经并行，单个文件不再按章切分到更多进程
+        cached = DocumentExporter(use_cache=use_cache, docx_workers=1).export_file(
+            input_file, output_file, output_format, template)
+        return BatchResult(input_file, output_file, True, time.perf_counter() - start,
+                           cached=cached)
+    except Exception as e:
+        return BatchResult(input_file, output_file, False, time.perf_counter() - start, str(e))
+    finally:
+        os.chdir(cwd)
+
+
+class BatchConverter:
+    """批量转换器"""
+
+    def __init__(self, output_format: str = "docx", template: str = "thesis",
+                 output_dir: Optional[str] = None, workers: Optional[int] = None,
+                 use_pandoc_server: bool = True, use_cache: bool = True):
+        """
+        Args:
+            output_format: 输出格式 (docx/latex/pdf)
+            template: 模板名称
+            output_dir: 输出目录，为空时输出到源文件旁
+            workers: 进程数，默认等于 CPU 核数
+            use_pandoc_server: 是否使用常驻 pandoc server（所有工作进程共用）
+            use_cache: 是否使用转换结果缓存（内容未变化的文件直接复用上次的输出）
+        """
+        if output_format not in DocumentExporter.EXTENSIONS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+
+        self.output_format = output_format
+        self.template = template
+        self.output_dir = os.path.abspath(output_dir) if output_dir else None
+        self.workers = workers or os.cpu_count() or 1
+        self.extension = DocumentExporter.EXTENSIONS[output_format]
+        self.use_cache = use_cache
+
+        runner = get_pandoc_runner()
+        runner.use_server = use_pandoc_server
+
+    @staticmethod
+    def collect_inputs(patterns: Iterable[str]) -> List[str]:
+        """
+        展开输入的 glob 模式或目录
+
+        Args:
+            patterns: 文件、目录或 glob 模式（支持 **）
+
+        Returns:
+            去重并排序后的 Markdown 文件绝对路径列表
+        """
+        files = set()
+        for pattern in patterns:
+            if os.path.isdir(pattern):
+                pattern = os.path.join(pattern, '**', '*.md')
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path) and path.endswith(('.md', '.markdown')):
+                    files.add(os.path.abspath(path))
+        return sorted(files)
+
+    def _output_path(self, input_file: str, base_dir: str) -> str:
+        """计算输出文件路径（在输出目录中保留相对目录结构）"""
+        stem = os.path.splitext(input_file)[0]
+        if self.output_dir is None:
+            return stem + self.extension
+
+        relative = os.path.relpath(stem, base_dir)
+        output_file = os.path.join(self.output_dir, relative + self.extension)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        return output_file
+
+    def run(self, input_files: List[str],
+            on_result: Optional[Callable[[BatchResult], None]] = None) -> List[BatchResult]:
+        """
+        并行转换文件
+
+        Args:
+            input_files: 输入文件绝对路径列表
+            on_result: 每个文件完成时的回调
+
+        Returns:
+            按输入顺序排列的转换结果
+        """
+        if not input_files:
+            return []
+
+        base_dir = os.path.commonpath([os.path.dirname(p) for p in input_files])
+        tasks = [(path, self._output_path(path, base_dir)) for path in input_files]
+
+        # 在创建工作进程前启动 pandoc server，子进程通过环境变量共用
+        get_pandoc_runner().export_server_env()
+
+        results = {}
+        if self.workers == 1 or len(tasks) == 1:
+            for input_file, output_file in tasks:
+                result = _convert_one(input_file, output_file, self.output_format, self.template,
+                                      self.use_cache)
+                results[input_file] = result
+                if on_result:
+                    on_result(result)
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as executor:
+                futures = [
+                    executor.submit(_convert_one, input_file, output_file,
+                                    self.output_format, self.template, self.use_cache)
+                    for input_file, output_file in tasks
+                ]
+                for future in as_completed(futures):
+                    result = future.result()
+                    results[result.input_file] = result
+                    if on_result:
+                        on_result(result)
+
+        return [results[path] for path in input_files]
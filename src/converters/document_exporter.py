@@ -0,0 +1,100 @@
+"""
+文档导出调度器 - 按输出格式分派到 Word / LaTeX / PDF 转换器
+GUI 与命令行批量转换共用
+"""
+
+import os
+from typing import Optional
+
+from src.converters.markdown_to_docx import MarkdownToDocxConverter
+from src.converters.latex_exporter import LatexExporter
+from src.converters.pdf_exporter import PdfExporter
+from src.parsers.extended_markdown import parse, referenced_files
+from src.templates.registry import get_template_registry
+from src.utils.cache import ConversionCache
+from src.utils.config import Config
+
+
+class DocumentExporter:
+    """文档导出调度器"""
+
+    # 输出格式 -> 默认扩展名
+    EXTENSIONS = {"docx": ".docx", "pdf": ".pdf", "latex": ".tex"}
+
+    def __init__(self, use_cache: bool = True, docx_workers: Optional[int] = None):
+        """
+        Args:
+            use_cache: 是否使用转换结果缓存
+            docx_workers: Word 输出按章并行转换的进程数，默认读取配置项 docx_workers（默认 1，不切分）
+        """
+        if docx_workers is None:
+            docx_workers = int(Config().get('docx_workers', 1))
+        self.docx_converter = MarkdownToDocxConverter(workers=docx_workers)
+        self.latex_exporter = LatexExporter()
+        self.pdf_exporter = PdfExporter()
+        self.cache = ConversionCache() if use_cache else None
+
+    def export(self, md_content: str, output_file: str, output_format: str = "docx",
+               template: str = "thesis", base_dir: Optional[str] = None) -> bool:
+        """
+        导出 Markdown 内容
+
+        Args:
+            md_content: Markdown 内容
+            output_file: 输出文件路径
+            output_format: 输出格式 (docx/latex/pdf)
+            template: 模板名称
+            base_dir: 文档中相对路径的基准目录，默认为当前目录
+
+        Returns:
+            是否命中缓存
+        """
+        if output_format not in self.EXTENSIONS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+
+        if self.cache is None:
+            self._export(md_content, output_file, output_format, template, base_dir)
+            return False
+
+        # 模板 YAML 也作为依赖文件，修改模板后缓存失效
+        assets = referenced_files(parse(md_content))
+        assets.append(get_template_registry().path_for(template))
+        key = self.cache.make_key(md_content, output_format, template, assets, base_dir)
+        if self.cache.get(key, output_file):
+            return True
+
+        self._export(md_content, output_file, output_format, template, base_dir)
+        self.cache.put(key, output_file)
+        return False
+
+    def _export(self, md_content: str, output_file: str, output_format: str, template: str,
+                base_dir: Optional[str] = None):
+        """按格式分派到具体的转换器"""
+        if output_format == "latex":
+            self.latex_exporter.export(md_content, output_file, template=template, base_dir=base_dir)
+        elif output_format == "pdf":
+            self.pdf_exporter.export(md_content, output_file, template=template, base_dir=base_dir)
+        elif output_format == "docx":
+            docx_bytes = self.docx_converter.convert_string(md_content, template=template,
+                                                            base_dir=base_dir)
+            with open(output_file, 'wb') as f:
+                f.write(docx_bytes)
+
+    def export_file(self, input_file: str, output_file: str, output_format: str = "docx",
+                    template: str = "thesis") -> bool:
+        """
+        导出 Markdown 文件
+
+        Args:
+            input_file: 输入 Markdown 文件路径
+            output_file: 输出文件路径
+            output_format: 输出格式 (docx/latex/pdf)
+            template: 模板名称
+
+        Returns:
+            是否命中缓存
+        """
+        with open(input_file, 'r', encoding='utf-8') as f:
+            md_content = f.read()
+        return self.export(md_content, output_file, output_format, template,
+                           base_dir=os.path.dirname(os.path.abspath(input_file)))
@@ -0,0 +1,308 @@
+"""
+Word 文档合并
+把一个 docx 的正文追加到另一个 docx 末尾，同时合并样式、图片和超链接关系、列表编号和脚注，
+并重新分配书签和图片对象的编号，避免与目标文档冲突。
+用于把分章节转换的 docx 片段拼接为完整论文。
+"""
+
+import copy
+import io
+from typing import Dict, List, Optional
+
+from docx import Document
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.part import PartFactory, XmlPart
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+# 脚注部件默认按二进制读取，注册为 XML 部件后才能修改其内容
+PartFactory.part_type_for.setdefault(CT.WML_FOOTNOTES, XmlPart)
+
+_R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_WP_DOC_PR = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}docPr'
+
+
+class DocumentMerger:
+    """把多个 docx 的正文依次追加到目标文档"""
+
+    def __init__(self, target: Document):
+        """
+        Args:
+            target: 目标文档，后续追加的内容插入到其最后的分节符之前
+        """
+        self.target = target
+        body = target.element.body
+        self._bookmark_id = self._max_id(body, qn('w:bookmarkStart'), qn('w:id'))
+        self._doc_pr_id = self._max_id(body, _WP_DOC_PR, 'id')
+
+    def append(self, source: Document, page_break: bool = False):
+        """
+        追加文档正文
+
+        Args:
+            source: 来源文档（合并后不应再使用）
+            page_break: 是否在追加的内容之前分页
+        """
+        body = self.target.element.body
+        sect_pr = body.find(qn('w:sectPr'))
+
+        elements = [copy.deepcopy(child) for child in source.element.body
+                    if child.tag != qn('w:sectPr')]
+        if not elements:
+            return
+        if page_break:
+            elements.insert(0, self._page_break())
+
+        rels: Dict[str, str] = {}
+        styles = self._merge_styles(source, elements)
+        num_ids = self._merge_numbering(source, elements + styles)
+        footnote_ids = self._merge_footnotes(source, elements)
+
+        # 复制的样式中引用的列表编号
+        for style in styles:
+            for node in style.iter(qn('w:numId')):
+                value = node.get(qn('w:val'))
+                if value in num_ids:
+                    node.set(qn('w:val'), num_ids[value])
+
+        for element in elements:
+            for node in element.iter():
+                self._remap_relationships(node, source.part, self.target.part, rels)
+                tag = node.tag
+                if tag == qn('w:numId'):
+                    value = node.get(qn('w:val'))
+                    if value in num_ids:
+                        node.set(qn('w:val'), num_ids[value])
+                elif tag == qn('w:footnoteReference'):
+                    value = node.get(qn('w:id'))
+                    if value in footnote_ids:
+                        node.set(qn('w:id'), footnote_ids[value])
+                elif tag in (qn('w:bookmarkStart'), qn('w:bookmarkEnd')):
+                    node.set(qn('w:id'), str(int(node.get(qn('w:id'), '0')) + self._bookmark_id + 1))
+                elif tag == _WP_DOC_PR:
+                    self._doc_pr_id += 1
+                    node.set('id', str(self._doc_pr_id))
+
+            if sect_pr is not None:
+                sect_pr.addprevious(element)
+            else:
+                body.append(element)
+
+        self._bookmark_id = self._max_id(body, qn('w:bookmarkStart'), qn('w:id'))
+
+    @staticmethod
+    def _max_id(root, tag: str, attribute: str) -> int:
+        """元素编号属性的最大值（没有时为 0）"""
+        ids = [node.get(attribute) for node in root.iter(tag)]
+        return max((int(value) for value in ids if value and value.lstrip('-').isdigit()), default=0)
+
+    @staticmethod
+    def _page_break():
+        """只含分页符的段落"""
+        return parse_xml(f'<w:p {nsdecls("w")}><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    def _remap_relationships(self, node, source_part, target_part, rels: Dict[str, str]):
+        """把节点上引用来源部件关系的 r:id / r:embed / r:link 改为目标部件中的关系"""
+        for name, value in node.attrib.items():
+            if not name.startswith('{' + _R_NS + '}'):
+                continue
+            if value not in rels:
+                rel = source_part.rels.get(value)
+                if rel is None:
+                    continue
+                rels[value] = self._copy_relationship(rel, target_part)
+            node.set(name, rels[value])
+
+    @staticmethod
+    def _copy_relationship(rel, target_part) -> str:
+        """在目标部件中建立等价的关系，返回新的 rId"""
+        if rel.is_external:
+            return target_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        if rel.reltype == RT.IMAGE:
+            # 按内容摘要去重，同一张图片在合并后的文档中只保存一份
+            image_part = target_part.package.get_or_add_image_part(io.BytesIO(rel.target_part.blob))
+            return target_part.relate_to(image_part, RT.IMAGE)
+        return target_part.relate_to(rel.target_part, rel.reltype)
+
+    def _merge_styles(self, source: Document, elements) -> List:
+        """
+        复制正文用到、目标文档中没有的样式（连同其基于、后续和链接的样式）
+
+        同名样式以目标文档为准。
+
+        Returns:
+            复制到目标文档的样式元素
+        """
+        used = []
+        for element in elements:
+            for tag in ('w:pStyle', 'w:rStyle', 'w:tblStyle'):
+                for node in element.iter(qn(tag)):
+                    value = node.get(qn('w:val'))
+                    if value and value not in used:
+                        used.append(value)
+
+        target_styles = self.target.styles.element
+        existing = {style.get(qn('w:styleId')) for style in target_styles.iter(qn('w:style'))}
+        pending = [value for value in used if value not in existing]
+        if not pending:
+            return []
+
+        source_styles = source.styles.element
+        copied = []
+        while pending:
+            style_id = pending.pop(0)
+            if style_id in existing:
+                continue
+            style = source_styles.find(f"{qn('w:style')}[@{qn('w:styleId')}='{style_id}']")
+            if style is None:
+                continue
+            style = copy.deepcopy(style)
+            target_styles.append(style)
+            existing.add(style_id)
+            copied.append(style)
+            for tag in ('w:basedOn', 'w:next', 'w:link'):
+                ref = style.find(qn(tag))
+                if ref is not None:
+                    pending.append(ref.get(qn('w:val')))
+        return copied
+
+    def _merge_numbering(self, source: Document, elements) -> Dict[str, str]:
+        """
+        复制正文用到的列表编号定义
+
+        Returns:
+            来源 numId -> 目标 numId
+        """
+        used = []
+        for element in elements:
+            for node in element.iter(qn('w:numId')):
+                value = node.get(qn('w:val'))
+                if value and value != '0' and value not in used:
+                    used.append(value)
+        if not used:
+            return {}
+
+        source_numbering = source.part.numbering_part.element
+        target_numbering = self.target.part.numbering_part.element
+
+        next_num = self._max_id(target_numbering, qn('w:num'), qn('w:numId'))
+        next_abstract = self._max_id(target_numbering, qn('w:abstractNum'), qn('w:abstractNumId'))
+        abstract_ids: Dict[str, str] = {}
+        num_ids: Dict[str, str] = {}
+
+        for value in used:
+            num = source_numbering.find(f"{qn('w:num')}[@{qn('w:numId')}='{value}']")
+            if num is None:
+                continue
+            num = copy.deepcopy(num)
+            abstract_ref = num.find(qn('w:abstractNumId'))
+            old_abstract = abstract_ref.get(qn('w:val'))
+
+            if old_abstract not in abstract_ids:
+                abstract = source_numbering.find(
+                    f"{qn('w:abstractNum')}[@{qn('w:abstractNumId')}='{old_abstract}']")
+                if abstract is None:
+                    continue
+                next_abstract += 1
+                abstract = copy.deepcopy(abstract)
+                abstract.set(qn('w:abstractNumId'), str(next_abstract))
+                # w:abstractNum 必须位于所有 w:num 之前
+                existing = target_numbering.findall(qn('w:abstractNum'))
+                if existing:
+                    existing[-1].addnext(abstract)
+                else:
+                    target_numbering.insert(0, abstract)
+                abstract_ids[old_abstract] = str(next_abstract)
+
+            next_num += 1
+            num.set(qn('w:numId'), str(next_num))
+            abstract_ref.set(qn('w:val'), abstract_ids[old_abstract])
+            target_numbering.append(num)
+            num_ids[value] = str(next_num)
+
+        return num_ids
+
+    def _merge_footnotes(self, source: Document, elements) -> Dict[str, str]:
+        """
+        复制正文引用的脚注
+
+        Returns:
+            来源脚注编号 -> 目标脚注编号
+        """
+        used = []
+        for element in elements:
+            for node in element.iter(qn('w:footnoteReference')):
+                value = node.get(qn('w:id'))
+                if value not in used:
+                    used.append(value)
+        if not used:
+            return {}
+
+        source_part = self._footnotes_part(source)
+        target_part = self._footnotes_part(self.target)
+        if source_part is None:
+            return {}
+        if target_part is None:
+            # 目标文档没有脚注部件时直接使用来源的脚注部件，编号不变
+            self.target.part.relate_to(source_part, RT.FOOTNOTES)
+            return {}
+
+        next_id = self._max_id(target_part.element, qn('w:footnote'), qn('w:id'))
+        rels: Dict[str, str] = {}
+        footnote_ids = {}
+        for value in used:
+            footnote = source_part.element.find(f"{qn('w:footnote')}[@{qn('w:id')}='{value}']")
+            if footnote is None:
+                continue
+            footnote = copy.deepcopy(footnote)
+            next_id += 1
+            footnote.set(qn('w:id'), str(next_id))
+            for node in footnote.iter():
+                self._remap_relationships(node, source_part, target_part, rels)
+            target_part.element.append(footnote)
+            footnote_ids[value] = str(next_id)
+        return footnote_ids
+
+    @staticmethod
+    def _footnotes_part(doc: Document) -> Optional[XmlPart]:
+        """文档的脚注部件（没有或无法解析时返回 None）"""
+        try:
+            part = doc.part.part_related_by(RT.FOOTNOTES)
+        except KeyError:
+            return None
+        return part if isinstance(part, XmlPart) else None
+
+
+def merge_documents(documents, page_break: bool = False) -> Document:
+    """
+    按顺序合并多个 docx
+
+    Args:
+        documents: docx 文件路径、二进制内容或 Document 对象，至少一个；
+                   第一个文档作为基础，页面设置、样式和页眉页脚以它为准
+        page_break: 每个后续文档之前是否分页
+
+    Returns:
+        合并后的 Document
+    """
+    merged = None
+    merger = None
+    for item in documents:
+        doc = _open(item)
+        if merger is None:
+            merged = doc
+            merger = DocumentMerger(doc)
+        else:
+            merger.append(doc, page_break=page_break)
+    if merged is None:
+        raise ValueError("没有需要合并的文档")
+    return merged
+
+
+def _open(item) -> Document:
+    """打开路径、二进制内容或直接返回 Document"""
+    if isinstance(item, bytes):
+        return Document(io.BytesIO(item))
+    if isinstance(item, str):
+        return Document(item)
+    return item
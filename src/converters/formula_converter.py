@@ -3,8 +3,101 @@
 """
 
 import base64
+import io
+import mimetypes
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
 import requests
-from typing import Optional
+from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
+
+from src.converters import math_converter
+from src.utils.formula_cache import FormulaCache
+
+# 批量识别的进度回调：(已完成数, 总数, 图片路径, 识别结果或 "Error: ...")
+ProgressCallback = Callable[[int, int, str, str], None]
+
+
+# 预处理后图片的最长边（像素），公式识别不需要更高的分辨率
+FORMULA_MAX_SIDE = 1600
+
+# 灰度值低于 255 - 该值的像素视为内容，其余视为留白
+CROP_THRESHOLD = 40
+
+# 裁剪后保留的边距（像素）
+CROP_PADDING = 8
+
+
+def preprocess_formula_image(image_bytes: bytes, max_side: int = FORMULA_MAX_SIDE) -> bytes:
+    """
+    上传前预处理公式图片：按 EXIF 旋转、转灰度、裁去四周留白、缩小并重新编码为 PNG
+
+    Args:
+        image_bytes: 原始图片内容
+        max_side: 最长边上限（像素）
+
+    Returns:
+        PNG 图片内容
+
+    Raises:
+        OSError: 无法识别的图片格式
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = ImageOps.exif_transpose(image)
+
+        # 透明背景按白色处理，截图工具导出的透明 PNG 转灰度后不会变黑
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+            background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+            image = Image.alpha_composite(background, image)
+        gray = image.convert('L')
+
+    # 以反色后足够亮的像素（原图中的深色内容）确定裁剪范围
+    mask = ImageOps.invert(gray).point(lambda value: 255 if value > CROP_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if bbox:
+        left, top, right, bottom = bbox
+        gray = gray.crop((max(0, left - CROP_PADDING), max(0, top - CROP_PADDING),
+                          min(gray.width, right + CROP_PADDING),
+                          min(gray.height, bottom + CROP_PADDING)))
+
+    if max(gray.size) > max_side:
+        gray.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    output = io.BytesIO()
+    gray.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+class RateLimiter:
+    """按固定间隔发放请求配额的限速器（线程安全）"""
+
+    def __init__(self, requests_per_second: Optional[float] = None):
+        """
+        Args:
+            requests_per_second: 每秒最多请求数，为空或不大于 0 时不限速
+        """
+        if requests_per_second and requests_per_second > 0:
+            self.interval = 1.0 / requests_per_second
+        else:
+            self.interval = 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """等待直到可以发出下一个请求"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
 
 
 class FormulaConverter:
@@ -12,14 +105,112 @@ class FormulaConverter:
 
     MATHPIX_API_URL = "https://api.mathpix.com/v3/text"
 
-    def __init__(self, app_id: str = "", app_key: str = ""):
+    # 需要重试的响应状态码：限流和服务端错误
+    RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+    # 公式识别请求的输出格式（也是缓存键的一部分）
+    LATEX_FORMATS = ('latex_styled', 'latex_simplified')
+
+    def __init__(self, app_id: str = "", app_key: str = "", api_url: Optional[str] = None,
+                 max_workers: int = 4, requests_per_second: Optional[float] = None,
+                 timeout: float = 30, max_retries: int = 3, use_cache: bool = True,
+                 preprocess: bool = True):
+        """
+        Args:
+            app_id: Mathpix App ID
+            app_key: Mathpix App Key
+            api_url: 识别接口地址，默认为 Mathpix 官方地址
+            max_workers: 批量识别时的最大并发请求数
+            requests_per_second: 每秒最多请求数，为空时不限速
+            timeout: 单个请求的超时秒数
+            max_retries: 遇到 429 / 5xx 或网络错误时的最大重试次数
+            use_cache: 是否使用本地识别结果缓存
+            preprocess: 上传前是否裁剪、转灰度并缩小图片
+        """
         self.app_id = app_id
         self.app_key = app_key
+        self.api_url = api_url or self.MATHPIX_API_URL
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.preprocess = preprocess
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.cache = FormulaCache() if use_cache else None
+
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
 
     def is_configured(self) -> bool:
         """检查是否已配置 API 密钥"""
         return bool(self.app_id and self.app_key)
 
+    @property
+    def session(self) -> requests.Session:
+        """共享的 HTTP 会话，连接池大小与并发数一致以复用长连接"""
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+
+    def close(self):
+        """关闭 HTTP 会话和缓存数据库"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+        if self.cache is not None:
+            self.cache.close()
+
+    def _headers(self) -> dict:
+        return {
+            'app_id': self.app_id,
+            'app_key': self.app_key,
+            'Content-type': 'application/json'
+        }
+
+    def _post(self, data: dict, max_retries: Optional[int] = None) -> requests.Response:
+        """
+        发送识别请求，遇到限流、服务端错误或网络错误时退避重试
+
+        Args:
+            data: 请求 JSON
+            max_retries: 最大重试次数，默认为 self.max_retries
+
+        Returns:
+            最后一次的响应（状态码未检查）
+        """
+        retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.post(self.api_url, headers=self._headers(), json=data,
+                                             timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+                response = None
+
+            if response is not None and (response.status_code not in self.RETRY_STATUS
+                                         or attempt >= retries):
+                return response
+
+            time.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    @staticmethod
+    def _backoff(attempt: int, response: Optional[requests.Response]) -> float:
+        """重试等待秒数：优先使用 Retry-After，否则指数退避并加随机抖动"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), 60.0)
+        return min(0.5 * 2 ** attempt, 30.0) * (0.5 + random.random() / 2)
+
     def image_to_latex(self, image_path: str) -> str:
         """
         将图片中的公式转换为 LaTeX 代码
@@ -30,57 +221,101 @@ class FormulaConverter:
         Returns:
             LaTeX 代码字符串
         """
+        with open(image_path, 'rb') as f:
+            image_bytes = f.read()
+
+        # 相同图片和格式的结果直接取缓存，不需要网络和 API 密钥
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(image_bytes, self.LATEX_FORMATS)
+            result = self.cache.get(key)
+            if result is not None:
+                return self._latex_from_result(result)
+
         if not self.is_configured():
             raise ValueError("Mathpix API 未配置，请在设置中配置 App ID 和 App Key")
 
-        # 读取图片并转为 base64
-        with open(image_path, 'rb') as f:
-            image_data = base64.b64encode(f.read()).decode('utf-8')
+        # 预处理后转为 base64
+        upload_bytes, mime_type = self._prepare_upload(image_bytes, image_path)
+        image_data = base64.b64encode(upload_bytes).decode('utf-8')
 
         # 构建请求
-        headers = {
-            'app_id': self.app_id,
-            'app_key': self.app_key,
-            'Content-type': 'application/json'
-        }
-
         data = {
-            'src': f'data:image/png;base64,{image_data}',
-            'formats': ['latex_styled', 'latex_simplified'],
+            'src': f'data:{mime_type};base64,{image_data}',
+            'formats': list(self.LATEX_FORMATS),
             'include_ascii': True,
             'include_tsv': True,
         }
 
         # 发送请求
-        response = requests.post(self.MATHPIX_API_URL, headers=headers, json=data)
+        response = self._post(data)
         response.raise_for_status()
 
         result = response.json()
 
-        # 返回 LaTeX 代码
+        # 接口报错的结果不缓存
+        if key is not None and 'error' not in result:
+            self.cache.put(key, result)
+
+        return self._latex_from_result(result)
+
+    def _prepare_upload(self, image_bytes: bytes, image_path: str):
+        """
+        生成上传的图片内容和 MIME 类型
+
+        Returns:
+            (图片内容, MIME 类型)；Pillow 无法识别的文件按原样上传
+        """
+        if self.preprocess:
+            try:
+                return preprocess_formula_image(image_bytes), 'image/png'
+            except OSError:
+                pass
+        mime_type = mimetypes.guess_type(image_path)[0]
+        if not mime_type or not mime_type.startswith('image/'):
+            mime_type = 'image/png'
+        return image_bytes, mime_type
+
+    @staticmethod
+    def _latex_from_result(result: dict) -> str:
+        """从识别结果中取 LaTeX 代码"""
         latex = result.get('latex_styled', '')
         if not latex:
             latex = result.get('latex_simplified', '')
-
         return latex
 
-    def image_to_latex_batch(self, image_paths: list) -> list:
+    def image_to_latex_batch(self, image_paths: list, max_workers: Optional[int] = None,
+                             progress: Optional[ProgressCallback] = None) -> list:
         """
         批量转换图片公式
 
+        请求在线程池中并发发送，共享同一个 HTTP 会话，并受限速器约束。
+
         Args:
             image_paths: 图片文件路径列表
+            max_workers: 最大并发数，默认为 self.max_workers
+            progress: 每张图片完成时的回调
 
         Returns:
-            LaTeX 代码列表
+            LaTeX 代码列表，顺序与 image_paths 一致；失败的项为 "Error: ..."
         """
-        results = []
-        for path in image_paths:
-            try:
-                latex = self.image_to_latex(path)
-                results.append(latex)
-            except Exception as e:
-                results.append(f"Error: {e}")
+        total = len(image_paths)
+        results: List[str] = [''] * total
+        if not total:
+            return results
+
+        workers = min(max_workers or self.max_workers, total)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.image_to_latex, path): index
+                       for index, path in enumerate(image_paths)}
+            for done, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    results[index] = f"Error: {e}"
+                if progress is not None:
+                    progress(done, total, image_paths[index], results[index])
         return results
 
     def latex_to_mathml(self, latex: str) -> str:
@@ -93,9 +328,7 @@ class FormulaConverter:
         Returns:
             MathML 字符串
         """
-        # 这里可以使用其他库如 latex2mathml
-        # 或者使用 Mathpix 的额外格式
-        return f"<math><mi>LaTeX:</mi><mtext>{latex}</mtext></math>"
+        return math_converter.latex_to_mathml(latex)
 
     def test_connection(self) -> bool:
         """测试 Mathpix API 连接"""
@@ -106,18 +339,12 @@ class FormulaConverter:
             # 使用一个简单的测试图片
             test_image = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
 
-            headers = {
-                'app_id': self.app_id,
-                'app_key': self.app_key,
-                'Content-type': 'application/json'
-            }
-
             data = {
                 'src': f'data:image/png;base64,{test_image}',
                 'formats': ['text'],
             }
 
-            response = requests.post(self.MATHPIX_API_URL, headers=headers, json=data)
+            response = self._post(data, max_retries=0)
             return response.status_code == 200
 
         except Exception:
@@ -0,0 +1,307 @@
+"""
+插图预处理
+#figure 引用的图片在交给 pandoc / xelatex 之前按排版尺寸处理：
+- 按内容哈希去重，同一张图片（包括不同路径下的相同文件）只处理一次
+- 按模板版心宽度、图片宽度比例和目标 DPI 计算所需像素，过大的图片缩小
+- TIFF、BMP 等格式转换为 PNG（Word 和 xelatex 都能直接嵌入），SVG 用 cairosvg 栅格化
+- 处理结果以内容哈希命名保存在磁盘缓存中，再次转换时直接使用
+- 整篇文档的图片在线程池中并行处理（Pillow 解码、缩放和编码时释放 GIL）
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from src.templates.registry import PageStyle
+from src.utils.cache import CacheUsage
+from src.utils.config import Config
+
+
+_MM_PER_INCH = 25.4
+
+
+def text_width_mm(page: PageStyle) -> float:
+    """版心宽度（毫米）"""
+    return page.width - page.margin_left - page.margin_right
+
+
+class ImageAssets:
+    """插图预处理与缓存（按大小进行 LRU 淘汰）"""
+
+    CACHE_DIR = "images"
+
+    # 默认目标分辨率和缓存上限（MB），可通过配置项 image_dpi / image_cache_max_mb 修改
+    DEFAULT_DPI = 300
+    DEFAULT_MAX_MB = 500
+
+    # 需要栅格化的矢量格式
+    SVG_EXTENSIONS = ('.svg',)
+
+    # 处理方式变化时递增，使旧缓存失效
+    CACHE_VERSION = 1
+
+    # 尺寸合适时原样使用的格式，其他位图格式转换为 PNG
+    PASSTHROUGH_FORMATS = ('PNG', 'JPEG')
+
+    JPEG_QUALITY = 90
+
+    def __init__(self, cache_dir: Optional[str] = None, dpi: Optional[int] = None,
+                 max_mb: Optional[int] = None, workers: Optional[int] = None):
+        """
+        Args:
+            cache_dir: 缓存目录，默认为 ~/.markdown2academia/images
+            dpi: 目标分辨率，默认读取配置项 image_dpi
+            max_mb: 缓存上限，默认读取配置项 image_cache_max_mb
+            workers: prepare_all 的线程数，默认读取配置项 image_workers（默认等于 CPU 核数）
+        """
+        config = Config()
+        if cache_dir is None:
+            cache_dir = config.config_path.parent / self.CACHE_DIR
+        if dpi is None:
+            dpi = config.get('image_dpi', self.DEFAULT_DPI)
+        if max_mb is None:
+            max_mb = config.get('image_cache_max_mb', self.DEFAULT_MAX_MB)
+
+        self.cache_dir = Path(cache_dir)
+        self.dpi = int(dpi)
+        self.max_bytes = int(max_mb) * 1024 * 1024
+        self._usage = CacheUsage(self.cache_dir, self.max_bytes)
+        if workers is None:
+            workers = config.get('image_workers') or os.cpu_count() or 1
+        self.workers = max(1, int(workers))
+
+        # 文件摘要缓存: 路径 -> ((大小, 修改时间), 摘要)
+        self._file_digests: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        # 本进程内已处理的图片: 缓存键 -> 结果路径（None 表示使用原图）
+        self._prepared: Dict[str, Optional[str]] = {}
+
+    def target_width(self, page: PageStyle, fraction: float) -> int:
+        """图片在页面上占 fraction 个版心宽度时所需的像素宽度"""
+        return max(1, round(text_width_mm(page) * fraction / _MM_PER_INCH * self.dpi))
+
+    def prepare(self, path: str, page: PageStyle, fraction: float,
+                base_dir: Optional[str] = None) -> str:
+        """
+        按排版尺寸处理图片
+
+        Args:
+            path: 图片路径
+            page: 模板的页面设置
+            fraction: 图片宽度占版心宽度的比例
+            base_dir: 相对路径的基准目录（文档所在目录），默认为当前目录
+
+        Returns:
+            处理后的图片路径；不需要处理、无法识别或文件不存在时返回原路径
+        """
+        source = self._source(path, base_dir)
+        pixels = self.target_width(page, fraction)
+        key = self._key(source, pixels) if fraction > 0 else None
+        if key is None:
+            return path
+        return self._resolve(key, source, pixels) or path
+
+    def prepare_all(self, items: Iterable[Tuple[str, float]], page: PageStyle,
+                    base_dir: Optional[str] = None) -> List[str]:
+        """
+        并行处理一批图片，全部完成后返回
+
+        先并行计算各文件的内容摘要，内容和目标尺寸相同的图片只处理一次。
+        处理结果同时记录在本对象中，之后对同一图片调用 prepare 直接返回。
+
+        Args:
+            items: (图片路径, 宽度比例)
+            page: 模板的页面设置
+            base_dir: 相对路径的基准目录，同 prepare
+
+        Returns:
+            与 items 顺序一致的处理后路径
+        """
+        items = [(path, fraction, self.target_width(page, fraction)) for path, fraction in items]
+        workers = min(self.workers, len(items))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                sources = [self._source(path, base_dir) for path, _, _ in items]
+                keys = list(executor.map(
+                    lambda item: self._key(item[0], item[1][2]) if item[1][1] > 0 else None,
+                    zip(sources, items)))
+
+                pending = {}
+                for source, (_, _, pixels), key in zip(sources, items, keys):
+                    if key is not None and key not in pending:
+                        pending[key] = (source, pixels)
+                # map 的结果全部取出后才返回，确保 pandoc / xelatex 运行前图片均已就绪
+                list(executor.map(lambda entry: self._resolve(entry[0], *entry[1]),
+                                  pending.items()))
+
+        return [self.prepare(path, page, fraction, base_dir) for path, fraction, _ in items]
+
+    @staticmethod
+    def _source(path: str, base_dir: Optional[str]) -> str:
+        """图片文件的实际位置"""
+        if base_dir and not os.path.isabs(path):
+            return os.path.join(base_dir, path)
+        return path
+
+    def _key(self, path: str, pixels: int) -> Optional[str]:
+        """缓存键：文件内容、目标像素宽度和分辨率的摘要，文件不存在时返回 None"""
+        digest = self._file_digest(path)
+        if digest is None:
+            return None
+        return hashlib.sha256(f'{self.CACHE_VERSION}\0{digest}\0{pixels}\0{self.dpi}'
+                              .encode('ascii')).hexdigest()
+
+    def _resolve(self, key: str, path: str, pixels: int) -> Optional[str]:
+        """
+        依次查找本进程的记录、磁盘缓存，都没有时处理图片
+
+        Returns:
+            处理结果的路径；应直接使用原图时返回 None
+        """
+        if key in self._prepared:
+            prepared = self._prepared[key]
+            # 缓存条目可能已被其他进程淘汰
+            if prepared is None or os.path.exists(prepared):
+                return prepared
+
+        prepared = self._cached(key)
+        if prepared is None:
+            try:
+                result = self._process(path, pixels)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                result = None
+            if result is not None:
+                prepared = self._store(key, *result)
+
+        self._prepared[key] = prepared
+        return prepared
+
+    def _process(self, path: str, pixels: int) -> Optional[Tuple[bytes, str]]:
+        """
+        缩小并重新编码图片
+
+        Returns:
+            (图片内容, 扩展名)；格式和尺寸都合适、无需处理时返回 None
+        """
+        if os.path.splitext(path)[1].lower() in self.SVG_EXTENSIONS:
+            return self._rasterize_svg(path, pixels)
+
+        with Image.open(path) as image:
+            source_format = image.format
+            if source_format in self.PASSTHROUGH_FORMATS and image.width <= pixels:
+                return None
+
+            # JPEG 解码时直接按 1/2、1/4、1/8 缩小，避免先解码完整的大图
+            if source_format == 'JPEG':
+                image.draft(image.mode, (pixels, pixels))
+            image = ImageOps.exif_transpose(image)
+
+            if image.width > pixels:
+                height = max(1, round(image.height * pixels / image.width))
+                image = image.resize((pixels, height), Image.LANCZOS, reducing_gap=3.0)
+
+            output = io.BytesIO()
+            if source_format == 'JPEG':
+                if image.mode not in ('L', 'RGB', 'CMYK'):
+                    image = image.convert('RGB')
+                image.save(output, format='JPEG', quality=self.JPEG_QUALITY,
+                           dpi=(self.dpi, self.dpi), optimize=True)
+                return output.getvalue(), '.jpg'
+
+            if image.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            image.save(output, format='PNG', dpi=(self.dpi, self.dpi))
+            return output.getvalue(), '.png'
+
+    def _rasterize_svg(self, path: str, pixels: int) -> Optional[Tuple[bytes, str]]:
+        """
+        按目标宽度把 SVG 栅格化为 PNG
+
+        Returns:
+            (PNG 内容, 扩展名)；未安装 cairosvg（或缺少 Cairo 系统库）时返回 None，保留 SVG
+        """
+        try:
+            import cairosvg
+        except (ImportError, OSError):
+            return None
+
+        try:
+            png_data = cairosvg.svg2png(url=path, output_width=pixels)
+        except SyntaxError:
+            # SVG 不是合法的 XML
+            return None
+        # 写入 DPI 信息，与位图的处理结果一致
+        with Image.open(io.BytesIO(png_data)) as image:
+            output = io.BytesIO()
+            image.save(output, format='PNG', dpi=(self.dpi, self.dpi))
+        return output.getvalue(), '.png'
+
+    def _file_digest(self, path: str) -> Optional[str]:
+        """计算文件内容摘要（按大小和修改时间记忆，文件不存在时返回 None）"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        path = os.path.abspath(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = self._file_digests.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._file_digests[path] = (signature, digest)
+        return digest
+
+    # ===== 磁盘缓存 =====
+
+    def _entry_path(self, key: str, extension: str) -> Path:
+        """缓存条目路径"""
+        return self.cache_dir / key[:2] / (key + extension)
+
+    def _cached(self, key: str) -> Optional[str]:
+        """查找已处理的图片，命中时更新最近使用时间"""
+        for extension in ('.png', '.jpg'):
+            entry = self._entry_path(key, extension)
+            try:
+                os.utime(entry)
+            except OSError:
+                continue
+            return entry.as_posix()
+        return None
+
+    def _store(self, key: str, data: bytes, extension: str) -> str:
+        """保存处理结果，返回其路径"""
+        entry = self._entry_path(key, extension)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # 先写临时文件再原子替换，避免并行进程读到不完整的条目
+        previous = entry.stat().st_size if entry.exists() else 0
+        fd, temp_path = tempfile.mkstemp(dir=entry.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, entry)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+        self._usage.add(len(data) - previous)
+        # 正斜杠路径在 Markdown 和 LaTeX 中都不需要转义
+        return entry.as_posix()
+
+    def clear(self):
+        """清空缓存"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self._prepared.clear()
+        self._usage.reset()
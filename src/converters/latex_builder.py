@@ -0,0 +1,248 @@
+"""
+LaTeX → PDF 构建器 - 基于 xelatex
+每个文档使用固定的构建目录，保留 .aux / .toc 等中间文件，
+再次构建时只运行必要的遍数；内容和引用的文件都未变化时直接复用上次的 PDF。
+导言区的固定部分可预编译为格式文件（mylatexformat），省去每次加载宏包的时间。
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.converters.latex_exporter import END_OF_DUMP
+from src.utils.config import Config
+
+
+class LatexBuilder:
+    """xelatex 增量构建器"""
+
+    BUILD_DIR = "build"
+    FORMATS_DIR = "formats"
+
+    JOB_NAME = "document"
+    STAMP_FILE = "build.json"
+
+    # 遍数上限：目录、交叉引用一般两遍即可稳定
+    MAX_PASSES = 4
+
+    # 变化时需要再运行一遍的中间文件
+    AUX_EXTENSIONS = ('.aux', '.toc', '.lof', '.lot', '.out')
+
+    _RERUN_RE = re.compile(r'Rerun to get|Label\(s\) may have changed')
+
+    def __init__(self, build_root: Optional[str] = None, executable: str = "xelatex",
+                 use_format: bool = True):
+        """
+        Args:
+            build_root: 构建目录的根目录，默认为 ~/.markdown2academia/build
+            executable: xelatex 可执行文件
+            use_format: 是否尝试预编译导言区
+        """
+        if build_root is None:
+            build_root = Config().config_path.parent / self.BUILD_DIR
+        self.build_root = Path(build_root)
+        self.executable = executable
+        self.use_format = use_format
+
+    def build(self, latex: str, output_file: str, base_dir: Optional[str] = None,
+              files: Optional[Dict[str, str]] = None) -> int:
+        """
+        编译 LaTeX 源码为 PDF
+
+        Args:
+            latex: 完整的 LaTeX 文档
+            output_file: 输出 PDF 路径，同时决定使用的构建目录
+            base_dir: 图片等相对路径的基准目录，默认为当前目录
+            files: 主文档 \\include 的其他源文件，文件名 -> 内容
+
+        Returns:
+            实际运行的 xelatex 遍数（0 表示直接复用了上次的结果）
+        """
+        base_dir = os.path.abspath(base_dir or os.getcwd())
+        build_dir = self.build_dir_for(output_file)
+        build_dir.mkdir(parents=True, exist_ok=True)
+
+        pdf_path = build_dir / f"{self.JOB_NAME}.pdf"
+        files = dict(files or {})
+        files[f"{self.JOB_NAME}.tex"] = latex
+
+        h = hashlib.sha256()
+        for name in sorted(files):
+            h.update(name.encode('utf-8') + b'\0' + files[name].encode('utf-8') + b'\0')
+        source_hash = h.hexdigest()
+
+        if pdf_path.exists() and self._is_up_to_date(build_dir, source_hash, base_dir):
+            shutil.copyfile(pdf_path, output_file)
+            return 0
+
+        # 编译失败时 document.pdf 可能只写出了一部分，旧的记录不能再与它配对
+        (build_dir / self.STAMP_FILE).unlink(missing_ok=True)
+
+        # 内容不变时不改写源文件，保留修改时间
+        for name, content in files.items():
+            path = build_dir / name
+            if not path.exists() or path.read_text(encoding='utf-8') != content:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(content, encoding='utf-8')
+
+        fmt = self._ensure_format(latex) if self.use_format else None
+
+        passes = 0
+        while passes < self.MAX_PASSES:
+            before = self._aux_state(build_dir)
+            log = self._run(build_dir, base_dir, fmt)
+            passes += 1
+            if self._aux_state(build_dir) == before and not self._RERUN_RE.search(log):
+                break
+
+        shutil.copyfile(pdf_path, output_file)
+        self._write_stamp(build_dir, source_hash, base_dir)
+        return passes
+
+    def build_dir_for(self, output_file: str) -> Path:
+        """输出文件对应的构建目录（同一文档每次使用同一个目录）"""
+        digest = hashlib.sha256(os.path.abspath(output_file).encode('utf-8')).hexdigest()[:16]
+        return self.build_root / digest
+
+    def _run(self, build_dir: Path, base_dir: str, fmt: Optional[str]) -> str:
+        """运行一遍 xelatex，返回日志内容"""
+        cmd = [self.executable, '-interaction=nonstopmode', '-halt-on-error',
+               '-file-line-error', '-recorder', f'-jobname={self.JOB_NAME}']
+        if fmt:
+            cmd.append(f'-fmt={fmt}')
+        cmd.append(f'{self.JOB_NAME}.tex')
+
+        try:
+            subprocess.run(cmd, cwd=build_dir, env=self._environment(base_dir),
+                           check=True, capture_output=True)
+        except FileNotFoundError:
+            raise RuntimeError("未找到 xelatex，请先安装 TeX Live 或 MiKTeX")
+        except subprocess.CalledProcessError:
+            raise RuntimeError(f"xelatex 编译失败: {self._log_errors(build_dir)}")
+
+        return self._read_log(build_dir)
+
+    def _environment(self, base_dir: str) -> Dict[str, str]:
+        """在构建目录中编译时，通过 TEXINPUTS 查找文档目录中的图片和 .bib 等文件"""
+        env = dict(os.environ)
+        # 末尾的分隔符表示保留 TeX 发行版的默认搜索路径
+        env['TEXINPUTS'] = base_dir + os.pathsep + env.get('TEXINPUTS', '')
+        env['BIBINPUTS'] = base_dir + os.pathsep + env.get('BIBINPUTS', '')
+        env['TEXFORMATS'] = str(self.build_root / self.FORMATS_DIR) + os.pathsep + \
+            env.get('TEXFORMATS', '')
+        return env
+
+    def _aux_state(self, build_dir: Path) -> Dict[str, str]:
+        """中间文件的内容摘要（包括 \\include 的章节各自的 .aux）"""
+        state = {}
+        for ext in self.AUX_EXTENSIONS:
+            for path in build_dir.rglob('*' + ext):
+                state[str(path)] = hashlib.sha256(path.read_bytes()).hexdigest()
+        return state
+
+    def _read_log(self, build_dir: Path) -> str:
+        try:
+            return (build_dir / f"{self.JOB_NAME}.log").read_text(encoding='utf-8', errors='replace')
+        except OSError:
+            return ''
+
+    def _log_errors(self, build_dir: Path) -> str:
+        """日志中以 ! 开头的错误行（或 file:line: 格式的错误）"""
+        lines = self._read_log(build_dir).splitlines()
+        errors = [line for line in lines if line.startswith('!') or re.match(r'^.+:\d+: ', line)]
+        return '\n'.join(errors[:10]) or '未知错误'
+
+    # ===== 跳过未变化的构建 =====
+
+    def _recorded_inputs(self, build_dir: Path, base_dir: str) -> List[str]:
+        """-recorder 记录的输入文件中位于文档目录下的文件（图片、数据等）"""
+        inputs = []
+        try:
+            with open(build_dir / f"{self.JOB_NAME}.fls", 'r', encoding='utf-8',
+                      errors='replace') as f:
+                for line in f:
+                    if not line.startswith('INPUT '):
+                        continue
+                    path = os.path.abspath(os.path.join(build_dir, line[6:].strip()))
+                    if path.startswith(base_dir + os.sep) and path not in inputs:
+                        inputs.append(path)
+        except OSError:
+            pass
+        return inputs
+
+    @staticmethod
+    def _signature(path: str) -> Optional[List[int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _write_stamp(self, build_dir: Path, source_hash: str, base_dir: str):
+        """记录本次构建的源码摘要和输入文件状态"""
+        inputs = {path: self._signature(path) for path in self._recorded_inputs(build_dir, base_dir)}
+        stamp = {'source': source_hash, 'base_dir': base_dir, 'inputs': inputs}
+        (build_dir / self.STAMP_FILE).write_text(json.dumps(stamp), encoding='utf-8')
+
+    def _is_up_to_date(self, build_dir: Path, source_hash: str, base_dir: str) -> bool:
+        """源码和上次记录的输入文件都未变化"""
+        try:
+            stamp = json.loads((build_dir / self.STAMP_FILE).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        if stamp.get('source') != source_hash or stamp.get('base_dir') != base_dir:
+            return False
+        return all(self._signature(path) == signature
+                   for path, signature in stamp.get('inputs', {}).items())
+
+    # ===== 预编译导言区 =====
+
+    def _ensure_format(self, latex: str) -> Optional[str]:
+        """
+        按导言区固定部分生成格式文件
+
+        Returns:
+            格式名称；文档没有固定部分标记或无法生成时返回 None（按普通方式编译）
+        """
+        marker = latex.find(END_OF_DUMP)
+        if marker < 0:
+            return None
+
+        preamble = latex[:marker]
+        name = 'm2a-' + hashlib.sha256(preamble.encode('utf-8')).hexdigest()[:16]
+        formats_dir = self.build_root / self.FORMATS_DIR
+        if (formats_dir / f"{name}.fmt").exists():
+            return name
+        # 上次生成失败（例如 xelatex 无法把已加载的字体写入格式文件）时不再重试
+        if (formats_dir / f"{name}.failed").exists():
+            return None
+
+        formats_dir.mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(dir=formats_dir))
+        try:
+            (work_dir / 'preamble.tex').write_text(
+                preamble + END_OF_DUMP + '\n\\begin{document}\n\\end{document}\n', encoding='utf-8')
+            cmd = [self.executable, '-ini', '-interaction=nonstopmode', f'-jobname={name}',
+                   '&xelatex', 'mylatexformat.ltx', 'preamble.tex']
+            try:
+                subprocess.run(cmd, cwd=work_dir, check=True, capture_output=True)
+            except FileNotFoundError:
+                # 未安装 xelatex：不记录失败，交给 _run 报告错误，安装后仍会生成格式文件
+                return None
+            except subprocess.CalledProcessError:
+                (formats_dir / f"{name}.failed").touch()
+                return None
+            fmt = work_dir / f"{name}.fmt"
+            if not fmt.exists():
+                (formats_dir / f"{name}.failed").touch()
+                return None
+            os.replace(fmt, formats_dir / f"{name}.fmt")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return name
@@ -2,22 +2,45 @@
 LaTeX 导出器 - 支持中文，解决乱码问题
 """
 
+import csv
 import os
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from src.converters.image_assets import ImageAssets
+from src.converters.table_converter import TableConverter, is_table_file, table_options
+from src.parsers.extended_markdown import (
+    Block, FrontMatter, Heading, Abstract, Keywords, Figure, Table, Equation, CodeBlock,
+    parse, extract_metadata,
+)
+from src.templates.registry import TemplateStyle, get_template
+
+# 导言区固定部分的结束标记：之前的内容只由模板决定，PDF 构建时可预编译为格式文件，
+# 依赖文档元数据的命令（标题、作者、页眉）放在标记之后。
+# xelatex 不能把已加载的字体写入格式文件，因此 ctex 以 fontset=none 载入，字体在标记之后设置。
+# 普通编译时 \csname endofdump\endcsname 等价于 \relax
+END_OF_DUMP = '\\csname endofdump\\endcsname'
 
 
 class LatexExporter:
     """LaTeX 导出器"""
 
-    def __init__(self):
-        self.templates = {
-            "thesis": ThesisLatexTemplate(),
-            "journal": JournalLatexTemplate(),
-        }
+    def __init__(self, image_assets: Optional[ImageAssets] = None):
+        """
+        Args:
+            image_assets: 指定时 #figure 图片按排版尺寸处理，引用缓存中的结果
+                          （用于编译 PDF；导出的 .tex 默认保留原图路径）
+        """
+        self.image_assets = image_assets
+
+    def _template_handler(self, style: TemplateStyle) -> 'LatexTemplate':
+        """按模板的排版方式选择 LaTeX 模板类"""
+        if style.base == "journal":
+            return JournalLatexTemplate(style)
+        return ThesisLatexTemplate(style)
 
     def export(self, md_content: str, output_file: str, template: str = "thesis",
-               metadata: Optional[Dict[str, Any]] = None):
+               metadata: Optional[Dict[str, Any]] = None, base_dir: Optional[str] = None):
         """
         导出 Markdown 为 LaTeX 文件
 
@@ -26,84 +49,114 @@ class LatexExporter:
             output_file: 输出 LaTeX 文件路径
             template: 模板名称
             metadata: 元数据
+            base_dir: 图片、数据文件等相对路径的基准目录，默认为当前目录
         """
-        # 提取元数据
-        if metadata is None:
-            metadata = self._extract_metadata(md_content)
-
-        # 预处理 Markdown 扩展语法
-        latex_content = self._convert_to_latex(md_content, metadata)
-
-        # 应用模板
-        template_handler = self.templates.get(template, ThesisLatexTemplate())
-        full_latex = template_handler.wrap(latex_content, metadata)
+        full_latex = self.to_latex(md_content, template, metadata, base_dir)
 
         # 写入文件（使用 UTF-8 编码）
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(full_latex)
 
-    def _extract_metadata(self, content: str) -> Dict[str, Any]:
-        """提取 YAML 元数据"""
-        metadata = {}
-        yaml_match = re.match(r'^---\s*\n(.*?)\n---\s*\n', content, re.DOTALL)
-
-        if yaml_match:
-            yaml_content = yaml_match.group(1)
-            for line in yaml_content.split('\n'):
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    metadata[key.strip()] = value.strip().strip('"').strip("'")
+    def to_latex(self, md_content: str, template: str = "thesis",
+                 metadata: Optional[Dict[str, Any]] = None, base_dir: Optional[str] = None) -> str:
+        """
+        转换 Markdown 为完整的 LaTeX 文档
 
-        return metadata
+        Args:
+            md_content: Markdown 内容
+            template: 模板名称
+            metadata: 元数据
+            base_dir: 图片等相对路径的基准目录，默认为当前目录
 
-    def _convert_to_latex(self, content: str, metadata: Dict[str, Any]) -> str:
-        """将 Markdown 转换为 LaTeX"""
-        # 移除 YAML 元数据
-        content = re.sub(r'^---\s*\n.*?\n---\s*\n', '', content, flags=re.DOTALL)
+        Returns:
+            LaTeX 源码
+        """
+        blocks = parse(md_content)
 
-        # 处理 #abstract（支持内容在同一行或下一行）
-        def replace_abstract(match):
-            abstract_content = match.group(1).strip()
-            return f'\\begin{{abstract}}\n{abstract_content}\n\\end{{abstract}}'
+        # 提取元数据
+        if metadata is None:
+            metadata = extract_metadata(blocks)
 
-        def replace_abstract_en(match):
-            abstract_content = match.group(1).strip()
-            return f'\\begin{{abstract-en}}\n{abstract_content}\n\\end{{abstract-en}}'
+        # 转换扩展语法块并应用模板
+        body = self._convert_to_latex(blocks, metadata, get_template(template), base_dir)
+        return self.wrap(body, template, metadata)
 
-        content = re.sub(r'^#abstract\s+(.*?)$', replace_abstract, content, flags=re.MULTILINE)
-        content = re.sub(r'^#abstract-en\s+(.*?)$', replace_abstract_en, content, flags=re.MULTILINE)
+    def convert_body(self, md_content: str, template: str = "thesis",
+                     base_dir: Optional[str] = None) -> str:
+        """
+        只转换正文，不套用模板（多文件项目中每章单独转换）
 
-        # 处理 #keywords
-        content = re.sub(r'^#keywords\s*(.+)$',
-                         r'\\textbf{关键词：}\1', content, flags=re.MULTILINE)
+        Args:
+            md_content: Markdown 内容
+            template: 模板名称，决定插图处理时的版心宽度
+            base_dir: 图片等相对路径的基准目录，默认为当前目录
 
-        # 处理标题
-        content = re.sub(r'^# (.+)$', r'\\chapter{\1}', content, flags=re.MULTILINE)
-        content = re.sub(r'^## (.+)$', r'\\section{\1}', content, flags=re.MULTILINE)
-        content = re.sub(r'^### (.+)$', r'\\subsection{\1}', content, flags=re.MULTILINE)
-        content = re.sub(r'^#### (.+)$', r'\\subsubsection{\1}', content, flags=re.MULTILINE)
+        Returns:
+            LaTeX 正文
+        """
+        blocks = parse(md_content)
+        return self._convert_to_latex(blocks, extract_metadata(blocks), get_template(template),
+                                      base_dir)
 
-        # 处理公式
-        content = self._process_equations(content)
+    def wrap(self, body: str, template: str = "thesis",
+             metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        用模板的导言区包装 LaTeX 正文
 
-        # 处理图片
-        content = self._process_figures(content)
+        Args:
+            body: LaTeX 正文
+            template: 模板名称
+            metadata: 元数据
 
-        # 处理表格
-        content = self._process_tables(content)
+        Returns:
+            完整的 LaTeX 文档
+        """
+        template_handler = self._template_handler(get_template(template))
+        return template_handler.wrap(body, metadata or {})
+
+    def _convert_to_latex(self, blocks: List[Block], metadata: Dict[str, Any],
+                          style: Optional[TemplateStyle] = None,
+                          base_dir: Optional[str] = None) -> str:
+        """将解析后的块转换为 LaTeX"""
+        # 先并行处理全部插图，之后 _process_figure 直接取用结果
+        if self.image_assets is not None and style is not None:
+            self.image_assets.prepare_all(
+                [(block.path, self._figure_width(block)) for block in blocks
+                 if isinstance(block, Figure)], style.page, base_dir)
+
+        parts = []
+        for block in blocks:
+            if isinstance(block, FrontMatter):
+                continue
+            elif isinstance(block, Heading):
+                parts.append(self._process_heading(block))
+            elif isinstance(block, Abstract):
+                env = 'abstract-en' if block.lang == 'en' else 'abstract'
+                parts.append(f'\\begin{{{env}}}\n{self._convert_text(block.text)}\n\\end{{{env}}}')
+            elif isinstance(block, Keywords):
+                parts.append('\\textbf{关键词：}' + self._convert_text(block.text))
+            elif isinstance(block, Equation):
+                parts.append(self._process_equation(block))
+            elif isinstance(block, Figure):
+                parts.append(self._process_figure(block, style, base_dir))
+            elif isinstance(block, Table):
+                parts.append(self._process_table(block, base_dir))
+            elif isinstance(block, CodeBlock):
+                parts.append(self._process_code_block(block.code + '\n', block.lang or None))
+            else:
+                parts.append(self._convert_text(block.text))
 
-        # 处理粗体和斜体
-        content = re.sub(r'\*\*\*(.+?)\*\*\*', r'\\textbf{\\textit{\1}}', content)
-        content = re.sub(r'\*\*(.+?)\*\*', r'\\textbf{\1}', content)
-        content = re.sub(r'\*(.+?)\*', r'\\textit{\1}', content)
+        return '\n\n'.join(part for part in parts if part).strip()
 
-        # 处理行内代码
-        content = re.sub(r'`([^`]+)`', r'\\texttt{\1}', content)
+    def _convert_text(self, content: str) -> str:
+        """转换普通 Markdown 文本（段落、列表等）"""
+        # 处理标准 Markdown 图片 ![alt](path)
+        content = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)',
+                         r'\\begin{figure}[htbp]\n\\centering\n\\includegraphics[width=0.8\\textwidth]{\2}\n\\caption{\1}\n\\end{figure}',
+                         content)
 
-        # 处理代码块
-        content = re.sub(r'```(\w+)?\n(.*?)```',
-                         lambda m: self._process_code_block(m.group(2), m.group(1)),
-                         content, flags=re.DOTALL)
+        # 处理粗体、斜体和行内代码
+        content = self._convert_inline(content)
 
         # 处理列表
         content = self._process_lists(content)
@@ -114,74 +167,71 @@ class LatexExporter:
 
         # 处理换行 - 将单个换行转为空格，保留段落间的双换行
         content = re.sub(r'(?<!\n)\n(?!\n)', ' ', content)
-        content = re.sub(r'\n{3,}', '\n\n', content)
 
         # 最后转义特殊字符（排除已经在 LaTeX 命令中的）
-        content = self._escape_latex_content(content)
-
-        return content.strip()
-
-    def _process_equations(self, content: str) -> str:
-        """处理公式"""
-        # 处理 #equation
-        def replace_equation(match):
-            eq = match.group(1).strip()
-            label = match.group(2)
-            if label:
-                return f'\\begin{{equation}}\n{eq}\n\\label{{{label}}}\n\\end{{equation}}'
-            return f'\\begin{{equation}}\n{eq}\n\\end{{equation}}'
+        return self._escape_latex_content(content)
 
-        content = re.sub(r'^#equation\s+(.+?)(?:\s*\|\s*label=(\S+))?\s*$',
-                         replace_equation, content, flags=re.MULTILINE)
-
-        # 处理行内公式 $...$
-        content = re.sub(r'\$([^$]+)\$', r'$\1$', content)
+    def _convert_inline(self, content: str) -> str:
+        """处理行内格式"""
+        # 处理粗体和斜体
+        content = re.sub(r'\*\*\*(.+?)\*\*\*', r'\\textbf{\\textit{\1}}', content)
+        content = re.sub(r'\*\*(.+?)\*\*', r'\\textbf{\1}', content)
+        content = re.sub(r'\*(.+?)\*', r'\\textit{\1}', content)
 
-        # 处理块级公式 $$...$$
-        content = re.sub(r'\$\$(.+?)\$\$', r'$$\1$$', content, flags=re.DOTALL)
+        # 处理行内代码
+        content = re.sub(r'`([^`]+)`', r'\\texttt{\1}', content)
 
         return content
 
-    def _process_figures(self, content: str) -> str:
+    def _process_heading(self, block: Heading) -> str:
+        """处理标题"""
+        commands = {1: 'chapter', 2: 'section', 3: 'subsection', 4: 'subsubsection'}
+        command = commands.get(block.level, 'paragraph')
+        title = self._escape_latex_content(self._convert_inline(block.text))
+        return f'\\{command}{{{title}}}'
+
+    def _process_equation(self, block: Equation) -> str:
+        """处理公式"""
+        eq = block.latex.strip()
+        if block.label:
+            return f'\\begin{{equation}}\n{eq}\n\\label{{{block.label}}}\n\\end{{equation}}'
+        return f'\\begin{{equation}}\n{eq}\n\\end{{equation}}'
+
+    @staticmethod
+    def _figure_width(block: Figure) -> float:
+        """图片宽度占 \\textwidth 的比例（默认 0.8）"""
+        width_match = re.fullmatch(r'(\d+)%', block.options.get('width', ''))
+        if width_match:
+            return int(width_match.group(1)) / 100
+        return 0.8
+
+    def _process_figure(self, block: Figure, style: Optional[TemplateStyle] = None,
+                        base_dir: Optional[str] = None) -> str:
         """处理图片"""
-        def replace_figure(match):
-            caption = match.group(1).strip()
-            image_path = match.group(2).strip()
-            options = match.group(3) or ""
-
-            width = "0.8"
-            if "width=" in options:
-                width_match = re.search(r'width=(\d+)%', options)
-                if width_match:
-                    width = int(width_match.group(1)) / 100
-
-            return f'''\\begin{{figure}}[htbp]
+        width = self._figure_width(block)
+        path = block.path
+        if self.image_assets is not None and style is not None:
+            path = self.image_assets.prepare(path, style.page, width, base_dir)
+
+        caption = self._escape_latex_content(block.caption)
+        return f'''\\begin{{figure}}[htbp]
 \\centering
-\\includegraphics[width={width}\\textwidth]{{{image_path}}}
+\\includegraphics[width={width}\\textwidth]{{{path}}}
 \\caption{{{caption}}}
 \\end{{figure}}'''
 
-        content = re.sub(r'^#figure\s+(.+?)\s*\|\s*(.+?)\s*(?:\|\s*(.+))?$',
-                         replace_figure, content, flags=re.MULTILINE)
-
-        # 处理标准 Markdown 图片 ![alt](path)
-        content = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)',
-                         r'\\begin{figure}[htbp]\n\\centering\n\\includegraphics[width=0.8\\textwidth]{\2}\n\\caption{\1}\n\\end{figure}',
-                         content)
-
-        return content
-
-    def _process_tables(self, content: str) -> str:
-        """处理表格"""
-        def replace_table(match):
-            caption = match.group(1).strip()
-            # 这里简化处理，实际应该读取 CSV 并生成表格
-            return f'% 表格: {caption}\n% 请手动插入表格数据'
-
-        content = re.sub(r'^#table\s+(.+?)\s*\|.+?$',
-                         replace_table, content, flags=re.MULTILINE)
+    def _process_table(self, block: Table, base_dir: Optional[str] = None) -> str:
+        """处理表格，CSV / Excel 数据转换为 tabular"""
+        if is_table_file(block.path):
+            try:
+                header = block.options.get('header') == 'true'
+                return TableConverter.table_to_latex(os.path.join(base_dir or '', block.path),
+                                                     block.caption, header,
+                                                     **table_options(block.options))
+            except (OSError, UnicodeDecodeError, csv.Error, ValueError):
+                pass
 
-        return content
+        return f'% 表格: {block.caption}\n% 请手动插入表格数据'
 
     def _process_code_block(self, code: str, language: Optional[str] = None) -> str:
         """处理代码块"""
@@ -264,6 +314,9 @@ class LatexExporter:
         # 保护 equation 环境（不转义内部的 ^ 和 _）
         text = re.sub(r'\\begin\{equation\}.*?\\end\{equation\}', protect_latex_commands, text, flags=re.DOTALL)
 
+        # 保护行内公式和块级公式
+        text = re.sub(r'\$\$.+?\$\$|\$[^$\n]+\$', protect_latex_commands, text, flags=re.DOTALL)
+
         # 保护其他 LaTeX 命令
         text = re.sub(r'\\[a-zA-Z]+(\[[^\]]*\])?(\{[^}]*\})?', protect_latex_commands, text)
 
@@ -278,13 +331,66 @@ class LatexExporter:
         return text
 
 
+# 中文字号（磅）-> ctex \zihao 参数
+_ZIHAO = [(42, '0'), (36, '-0'), (26, '1'), (24, '-1'), (22, '2'), (18, '-2'), (16, '3'),
+          (15, '-3'), (14, '4'), (12, '-4'), (10.5, '5'), (9, '-5'), (7.5, '6'), (6.5, '-6')]
+
+
 class LatexTemplate:
-    """LaTeX 模板基类"""
+    """LaTeX 模板基类，样式数值来自 templates/*.yaml"""
+
+    def __init__(self, style: TemplateStyle):
+        self.style = style
 
     def wrap(self, content: str, metadata: Dict[str, Any]) -> str:
         """包装内容"""
         raise NotImplementedError
 
+    def class_font_size(self) -> str:
+        """文档类的正文字号选项（10pt/11pt/12pt 中最接近的）"""
+        size = min((10, 11, 12), key=lambda pt: abs(pt - self.style.font_sizes.body))
+        return f'{size}pt'
+
+    def geometry(self) -> str:
+        """geometry 页边距参数"""
+        page = self.style.page
+        return (f'top={page.margin_top:g}mm,bottom={page.margin_bottom:g}mm,'
+                f'left={page.margin_left:g}mm,right={page.margin_right:g}mm')
+
+    def line_spacing(self) -> str:
+        """setspace 行距命令（1.5 / 2 倍与 Word 的多倍行距含义一致）"""
+        spacing = self.style.paragraph.line_spacing
+        if spacing == 1.5:
+            return '\\onehalfspacing'
+        if spacing == 2.0:
+            return '\\doublespacing'
+        return f'\\setstretch{{{spacing:g}}}'
+
+    @staticmethod
+    def cjk_fonts() -> str:
+        """
+        中文字体设置（放在 END_OF_DUMP 之后）
+
+        使用随 ctex 发布的 Fandol 字体，与 ctex 的 fontset=fandol 相同，
+        并定义 \\songti 等字体命令（fontset=none 时 ctex 不定义）。
+        """
+        return """\\setCJKmainfont[Extension=.otf,BoldFont=FandolSong-Bold,ItalicFont=FandolKai-Regular]{FandolSong-Regular}
+\\setCJKsansfont[Extension=.otf,BoldFont=FandolHei-Bold]{FandolHei-Regular}
+\\setCJKmonofont[Extension=.otf]{FandolFang-Regular}
+\\setCJKfamilyfont{zhsong}[Extension=.otf,BoldFont=FandolSong-Bold]{FandolSong-Regular}
+\\setCJKfamilyfont{zhhei}[Extension=.otf,BoldFont=FandolHei-Bold]{FandolHei-Regular}
+\\setCJKfamilyfont{zhfs}[Extension=.otf]{FandolFang-Regular}
+\\setCJKfamilyfont{zhkai}[Extension=.otf]{FandolKai-Regular}
+\\providecommand*{\\songti}{\\CJKfamily{zhsong}}
+\\providecommand*{\\heiti}{\\CJKfamily{zhhei}}
+\\providecommand*{\\fangsong}{\\CJKfamily{zhfs}}
+\\providecommand*{\\kaishu}{\\CJKfamily{zhkai}}"""
+
+    @staticmethod
+    def zihao(size: float) -> str:
+        """最接近给定磅值的中文字号"""
+        return min(_ZIHAO, key=lambda item: abs(item[0] - size))[1]
+
 
 class ThesisLatexTemplate(LatexTemplate):
     """毕业论文 LaTeX 模板（中文支持）"""
@@ -292,18 +398,29 @@ class ThesisLatexTemplate(LatexTemplate):
     def wrap(self, content: str, metadata: Dict[str, Any]) -> str:
         title = metadata.get('title', '论文标题')
         author = metadata.get('author', '作者')
-        school = metadata.get('school', '')
         date = metadata.get('date', '\\today')
+        style = self.style
+        sizes = style.font_sizes
+
+        header = style.header_text(metadata)
+        footer = '\\thepage' if style.header_footer.footer_page_number else ''
+        toc = ''
+        if style.toc.show_toc:
+            toc = f"\\setcounter{{tocdepth}}{{{style.toc.toc_depth}}}\n\\tableofcontents\n\\newpage\n"
 
         return f"""% !TEX encoding = UTF-8 Unicode
-\\documentclass[12pt,a4paper]{{ctexart}}
+\\documentclass[{self.class_font_size()},a4paper,fontset=none]{{ctexart}}
 
-% 中文支持
+% 中文支持（字体在导言区固定部分之后设置）
 \\usepackage{{ctex}}
 
 % 页面设置
 \\usepackage{{geometry}}
-\\geometry{{top=2.5cm,bottom=2.5cm,left=3cm,right=3cm}}
+\\geometry{{{self.geometry()}}}
+
+% 行距
+\\usepackage{{setspace}}
+{self.line_spacing()}
 
 % 数学支持
 \\usepackage{{amsmath}}
@@ -314,9 +431,10 @@ class ThesisLatexTemplate(LatexTemplate):
 \\usepackage{{graphicx}}
 \\graphicspath{{{{./}}{{./figures/}}{{./images/}}}}
 
-% 表格支持
+% 表格支持（siunitx 提供按小数点对齐的 S 列）
 \\usepackage{{booktabs}}
 \\usepackage{{multirow}}
+\\usepackage{{siunitx}}
 
 % 代码支持
 \\usepackage{{listings}}
@@ -336,19 +454,19 @@ class ThesisLatexTemplate(LatexTemplate):
 \\usepackage{{fancyhdr}}
 \\pagestyle{{fancy}}
 \\fancyhf{{}}
-\\fancyhead[C]{{{school}}}
-\\fancyfoot[C]{{\\thepage}}
+\\fancyfoot[C]{{{footer}}}
 
 % 标题格式
 \\ctexset{{
+    contentsname = {{{style.toc.toc_title}}},
     section = {{
-        format = \\zihao{{-3}}\\heiti\\centering,
+        format = \\zihao{{{self.zihao(sizes.chapter_title)}}}\\heiti\\centering,
     }},
     subsection = {{
-        format = \\zihao{{4}}\\heiti,
+        format = \\zihao{{{self.zihao(sizes.section_title)}}}\\heiti,
     }},
     subsubsection = {{
-        format = \\zihao{{-4}}\\heiti,
+        format = \\zihao{{{self.zihao(sizes.subsection_title)}}}\\heiti,
     }}
 }}
 
@@ -373,6 +491,9 @@ class ThesisLatexTemplate(LatexTemplate):
     \\par
 }}
 
+{END_OF_DUMP}
+{self.cjk_fonts()}
+\\fancyhead[C]{{{header}}}
 \\title{{\\zihao{{2}}\\heiti {title}}}
 \\author{{\\kaishu {author}}}
 \\date{{{date}}}
@@ -382,7 +503,7 @@ class ThesisLatexTemplate(LatexTemplate):
 % 封面
 \\maketitle
 
-% 摘要
+{toc}% 摘要
 {content}
 
 % 参考文献（如果存在）
@@ -400,14 +521,14 @@ class JournalLatexTemplate(LatexTemplate):
         author = metadata.get('author', '作者')
 
         return f"""% !TEX encoding = UTF-8 Unicode
-\\documentclass[10pt,a4paper]{{article}}
+\\documentclass[{self.class_font_size()},a4paper]{{article}}
 
-% 中文支持
-\\usepackage{{ctex}}
+% 中文支持（字体在导言区固定部分之后设置）
+\\usepackage[fontset=none]{{ctex}}
 
 % 页面设置
 \\usepackage{{geometry}}
-\\geometry{{top=2cm,bottom=2cm,left=2.5cm,right=2.5cm}}
+\\geometry{{{self.geometry()}}}
 
 % 数学支持
 \\usepackage{{amsmath}}
@@ -416,14 +537,19 @@ class JournalLatexTemplate(LatexTemplate):
 % 图片支持
 \\usepackage{{graphicx}}
 
-% 双倍行距（期刊常用）
+% 表格支持（siunitx 提供按小数点对齐的 S 列）
+\\usepackage{{siunitx}}
+
+% 行距（期刊常用双倍行距）
 \\usepackage{{setspace}}
-\\doublespacing
+{self.line_spacing()}
 
 % 其他包
 \\usepackage{{hyperref}}
 \\usepackage{{biblatex}}
 
+{END_OF_DUMP}
+{self.cjk_fonts()}
 \\title{{{title}}}
 \\author{{{author}}}
 
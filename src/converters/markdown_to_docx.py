@@ -1,28 +1,72 @@
 """
 Markdown 转 Word 转换器
-基于 Pandoc 和 python-docx
+基于 Pandoc 和 python-docx；单篇文档的后处理直接在 docx 压缩包上流式完成（见 ooxml_package）
 """
 
+import csv
+import io
 import os
-import tempfile
-import subprocess
 import re
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Optional, Dict, Any, Iterable, Iterator, List, TextIO, BinaryIO, Tuple, Union
 
 from docx import Document
-from docx.shared import Pt, Inches, RGBColor
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
+from docx.text.paragraph import Paragraph
+from docx.text.parfmt import ParagraphFormat
+from lxml import etree
+
+from src.converters import math_converter
+from src.converters.docx_merge import merge_documents
+from src.converters.image_assets import ImageAssets
+from src.converters.ooxml_package import DOCUMENT_PART, BodyTransform, OoxmlPackage
+from src.converters.pandoc_runner import get_pandoc_runner
+from src.converters.table_converter import TableConverter, is_table_file, table_options
+from src.parsers.extended_markdown import (
+    Block, Abstract, Keywords, Figure, Table, Equation, parse, extract_metadata,
+    split_chapters,
+)
+from src.templates.reference_doc import apply_document_styles, get_reference_doc
+from src.templates.registry import TemplateStyle, get_template
+from src.templates.style_engine import StyleEngine, StyleRule
+from src.utils.config import Config
+
+
+# 脚注定义（[^1]: ...）和引用式链接定义（[r]: url），与引用它们的段落可能不在同一章
+_DEFINITION_RE = re.compile(r'^ {0,3}\[[^\]\n]+\]:', re.MULTILINE)
 
 
 class MarkdownToDocxConverter:
     """Markdown 转 Word 转换器"""
 
-    def __init__(self):
-        self.templates = {
-            "thesis": ThesisTemplate(),
-            "journal": JournalTemplate(),
-        }
+    # 原生公式的占位段落，pandoc 按普通文本原样输出，后处理时替换为 Word 公式
+    EQUATION_PLACEHOLDER = "M2AEQUATION{}"
+
+    # 内存中保留的 pandoc 转换结果数
+    PANDOC_MEMO_SIZE = 4
+
+    def __init__(self, native_math: bool = True, workers: int = 1,
+                 optimize_images: Optional[bool] = None):
+        """
+        Args:
+            native_math: #equation 是否直接生成 Word 公式（需安装 latex2mathml），否则由 pandoc 转换
+            workers: 大于 1 时在一级标题处切分文档，由多个进程并行转换各章后按顺序合并
+            optimize_images: #figure 图片是否按排版尺寸缩小后再嵌入，默认读取配置项 optimize_images（默认开启）
+        """
+        self.native_math = native_math and math_converter.is_available()
+        self.workers = max(1, workers)
+        if optimize_images is None:
+            optimize_images = Config().get('optimize_images', True)
+        self.image_assets = ImageAssets() if optimize_images else None
+        # pandoc 输入 -> docx 内容；公式使用占位符，只修改公式时不需要重新运行 pandoc
+        self._pandoc_memo: 'OrderedDict[tuple, bytes]' = OrderedDict()
 
     def convert(self, input_file: str, output_file: str, template: str = "thesis",
                 metadata: Optional[Dict[str, Any]] = None):
@@ -39,259 +83,542 @@ class MarkdownToDocxConverter:
         with open(input_file, 'r', encoding='utf-8') as f:
             md_content = f.read()
 
-        # 预处理 Markdown 扩展语法
-        md_content = self._preprocess_markdown(md_content)
+        self._write(md_content, template, metadata, output_file,
+                    os.path.dirname(os.path.abspath(input_file)))
 
-        # 临时文件
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False, encoding='utf-8') as f:
-            f.write(md_content)
-            temp_md = f.name
+    def convert_string(self, md_content: str, template: str = "thesis",
+                       metadata: Optional[Dict[str, Any]] = None,
+                       base_dir: Optional[str] = None) -> bytes:
+        """
+        转换 Markdown 文本到 Word，全程在内存中完成
 
-        try:
-            # 第一步：使用 pandoc 进行基础转换
-            temp_docx = tempfile.mktemp(suffix='.docx')
-            self._run_pandoc(temp_md, temp_docx)
+        Args:
+            md_content: Markdown 内容
+            template: 模板名称 (thesis/journal)
+            metadata: 额外的元数据
+            base_dir: 图片、数据文件等相对路径的基准目录，默认为当前目录
 
-            # 第二步：使用 python-docx 进行后处理
-            doc = Document(temp_docx)
+        Returns:
+            docx 文件内容
+        """
+        output = io.BytesIO()
+        self._write(md_content, template, metadata, output, base_dir)
+        return output.getvalue()
 
-            # 应用模板样式
-            template_handler = self.templates.get(template, ThesisTemplate())
-            template_handler.apply(doc, self._extract_metadata(md_content))
+    def convert_stream(self, input_stream: TextIO, output_stream: BinaryIO,
+                       template: str = "thesis", metadata: Optional[Dict[str, Any]] = None):
+        """
+        从文本流读取 Markdown，将 docx 写入二进制流
 
-            # 保存最终文档
-            doc.save(output_file)
+        Args:
+            input_stream: Markdown 文本流
+            output_stream: docx 输出流（文件、BytesIO、socket 等）
+            template: 模板名称 (thesis/journal)
+            metadata: 额外的元数据
+        """
+        self._write(input_stream.read(), template, metadata, output_stream)
 
-        finally:
-            # 清理临时文件
-            if os.path.exists(temp_md):
-                os.unlink(temp_md)
-            if os.path.exists(temp_docx):
-                os.unlink(temp_docx)
+    def convert_fragment(self, md_content: str, template: str = "thesis",
+                         base_dir: Optional[str] = None) -> bytes:
+        """
+        转换一个章节，不添加封面和页眉页脚，用于之后用 merge_fragments 拼接
 
-    def _run_pandoc(self, input_file: str, output_file: str):
-        """运行 pandoc 命令"""
-        try:
-            cmd = [
-                'pandoc',
-                input_file,
-                '-o', output_file,
-                '--from', 'markdown+yaml_metadata_block+citations',
-                '--to', 'docx',
-                '--standalone',
-            ]
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            error_msg = e.stderr if e.stderr else "未知错误"
-            raise RuntimeError(f"Pandoc 转换失败: {error_msg}")
-        except FileNotFoundError:
-            raise RuntimeError("未找到 pandoc，请先安装: https://pandoc.org/installing.html")
-
-    def _preprocess_markdown(self, content: str) -> str:
-        """预处理 Markdown 扩展语法"""
-        # 处理 #abstract
-        content = re.sub(r'^#abstract\s*(.+?)(?=\n#|\Z)',
-                         r'\n**摘要**\n\n\1\n', content, flags=re.MULTILINE | re.DOTALL)
-
-        # 处理 #abstract-en
-        content = re.sub(r'^#abstract-en\s*(.+?)(?=\n#|\Z)',
-                         r'\n**Abstract**\n\n\1\n', content, flags=re.MULTILINE | re.DOTALL)
-
-        # 处理 #keywords
-        content = re.sub(r'^#keywords\s*(.+)$',
-                         r'**关键词：** \1', content, flags=re.MULTILINE)
-
-        # 处理 #figure
-        content = re.sub(r'^#figure\s+(.+?)\s*\|\s*(.+?)\s*(?:\|\s*(.+))?$',
-                         self._replace_figure, content, flags=re.MULTILINE)
-
-        # 处理 #table
-        content = re.sub(r'^#table\s+(.+?)\s*\|\s*(.+?)\s*(?:\|\s*(.+))?$',
-                         self._replace_table, content, flags=re.MULTILINE)
-
-        # 处理 #equation
-        content = re.sub(r'^#equation\s+(.+?)(?:\s*\|\s*label=(.+))?$',
-                         self._replace_equation, content, flags=re.MULTILINE)
-
-        return content
-
-    def _replace_figure(self, match) -> str:
-        """替换图片标记"""
-        caption = match.group(1)
-        image_path = match.group(2)
-        options = match.group(3) or ""
-
-        width = "80%"
-        if "width=" in options:
-            width_match = re.search(r'width=(\d+%)', options)
-            if width_match:
-                width = width_match.group(1)
-
-        return f'\n![{caption}]({image_path}){{ width={width} }}\n\n*{caption}*\n'
-
-    def _replace_table(self, match) -> str:
-        """替换表格标记"""
-        caption = match.group(1)
-        data_path = match.group(2)
-        options = match.group(3) or ""
+        Args:
+            md_content: 章节 Markdown 内容
+            template: 模板名称 (thesis/journal)
+            base_dir: 相对路径的基准目录，同 convert_string
 
-        # 如果是 CSV 文件，读取并转换为 Markdown 表格
-        if data_path.endswith('.csv'):
-            try:
-                with open(data_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
+        Returns:
+            docx 文件内容
+        """
+        output = io.BytesIO()
+        self._convert_blocks(parse(md_content), get_template(template), base_dir).save(output)
+        return output.getvalue()
 
-                header = "header=true" in options
-                table_md = self._csv_to_markdown(lines, header)
-                return f'\n{table_md}\n*{caption}*\n'
-            except:
-                pass
+    def merge_fragments(self, fragments: List[Union[str, bytes]], template: str = "thesis",
+                        metadata: Optional[Dict[str, Any]] = None,
+                        page_break: Optional[bool] = None) -> Document:
+        """
+        按顺序拼接章节片段，再添加封面和页眉页脚
 
-        return f'\n*{caption}*\n'
+        Args:
+            fragments: convert_fragment 生成的 docx 文件路径或内容
+            template: 模板名称 (thesis/journal)
+            metadata: 元数据（标题、作者等）
+            page_break: 各章之间是否分页，默认毕业论文分页、期刊不分页
 
-    def _csv_to_markdown(self, lines: list, has_header: bool = True) -> str:
-        """CSV 转 Markdown 表格"""
-        if not lines:
-            return ""
+        Returns:
+            合并后的 Document
+        """
+        style = get_template(template)
+        if page_break is None:
+            page_break = style.base != "journal"
+        doc = merge_documents(fragments, page_break=page_break)
+        self._template_handler(style).apply(doc, dict(metadata or {}))
+        return doc
+
+    def _write(self, md_content: str, template: str, metadata: Optional[Dict[str, Any]],
+               output: Union[str, BinaryIO], base_dir: Optional[str] = None):
+        """转换并写出 docx，能流式处理时不经过 python-docx"""
+        package = self._build_package(md_content, template, metadata, base_dir)
+        if package is None:
+            self._build_document(md_content, template, metadata, base_dir).save(output)
+            return
+        with package:
+            package.save(output)
+
+    def _build_package(self, md_content: str, template: str,
+                       metadata: Optional[Dict[str, Any]] = None,
+                       base_dir: Optional[str] = None) -> Optional[OoxmlPackage]:
+        """
+        Markdown -> pandoc -> 直接改写 docx 压缩包
 
-        rows = [line.strip().split(',') for line in lines if line.strip()]
-        if not rows:
-            return ""
+        公式、特殊段落、封面和页眉页脚在保存时随 document.xml 流式写出，图片等部件原样复制。
 
-        md_lines = []
-        # 表头
-        md_lines.append('| ' + ' | '.join(rows[0]) + ' |')
-        # 分隔符
-        md_lines.append('| ' + ' | '.join(['---'] * len(rows[0])) + ' |')
+        Returns:
+            待保存的 OoxmlPackage；需要并行分章转换或没有 reference.docx
+            （样式需由 python-docx 设置）时返回 None
+        """
+        blocks = parse(md_content)
+        if len(self._chapters(blocks)) > 1:
+            return None
+        style = get_template(template)
+        reference_doc = get_reference_doc(style)
+        if reference_doc is None:
+            return None
+
+        equations = [] if self.native_math else None
+        docx_bytes = self._run_pandoc(self._preprocess_markdown(blocks, equations, style, base_dir),
+                                      reference_doc, base_dir)
+
+        doc_metadata = extract_metadata(blocks)
+        if metadata:
+            doc_metadata.update(metadata)
+
+        package = OoxmlPackage(docx_bytes)
+        body_transform = self._template_handler(style).stream(package, doc_metadata)
+        if equations:
+            package.rewrite_body(
+                lambda elements: body_transform(self._equation_stream(elements, equations)))
+        else:
+            package.rewrite_body(body_transform)
+        return package
+
+    def _build_document(self, md_content: str, template: str,
+                        metadata: Optional[Dict[str, Any]] = None,
+                        base_dir: Optional[str] = None) -> Document:
+        """Markdown -> pandoc（stdin/stdout）-> python-docx 后处理"""
+        blocks = parse(md_content)
+        style = get_template(template)
+
+        chapters = self._chapters(blocks)
+        if len(chapters) > 1:
+            # 各章并行转换，合并时不额外分页
+            sources = ['\n\n'.join(block.source for block in chapter) + '\n'
+                       for chapter in chapters]
+            doc = merge_documents(convert_fragments(sources, template, self.workers,
+                                                    self.native_math, base_dir))
+        else:
+            doc = self._convert_blocks(blocks, style, base_dir)
+
+        # 添加封面、页眉页脚等
+        doc_metadata = extract_metadata(blocks)
+        if metadata:
+            doc_metadata.update(metadata)
+        self._template_handler(style).apply(doc, doc_metadata)
+
+        return doc
+
+    def _chapters(self, blocks: List[Block]) -> List[List[Block]]:
+        """
+        按一级标题切分为并行转换的章节
 
-        # 数据行
-        start_idx = 1 if has_header else 0
-        for row in rows[start_idx:]:
-            md_lines.append('| ' + ' | '.join(row) + ' |')
+        文档中有脚注或引用式链接定义时不切分：pandoc 分别转换各章时，
+        定义与引用不在同一章会使脚注和链接丢失。
+        """
+        if self.workers <= 1 or any(_DEFINITION_RE.search(block.source) for block in blocks):
+            return [blocks]
+        return split_chapters(blocks)
+
+    def _convert_blocks(self, blocks: List[Block], style: TemplateStyle,
+                        base_dir: Optional[str] = None) -> Document:
+        """预处理扩展语法、运行 pandoc 并插入公式，得到未添加封面和页眉页脚的文档"""
+        # 预处理 Markdown 扩展语法，公式先替换为占位符
+        equations = [] if self.native_math else None
+        md_content = self._preprocess_markdown(blocks, equations, style, base_dir)
+
+        # 第一步：使用 pandoc 进行基础转换，样式来自模板的 reference.docx
+        reference_doc = get_reference_doc(style)
+        docx_bytes = self._run_pandoc(md_content, reference_doc, base_dir)
+
+        # 第二步：使用 python-docx 进行后处理
+        doc = Document(io.BytesIO(docx_bytes))
+        if reference_doc is None:
+            self._template_handler(style).apply_styles(doc)
+
+        # 第三步：把公式占位符替换为 Word 公式
+        if equations:
+            self._insert_equations(doc, equations)
+
+        return doc
+
+    def _template_handler(self, style: TemplateStyle) -> 'BaseTemplate':
+        """按模板的排版方式选择后处理类"""
+        if style.base == "journal":
+            return JournalTemplate(style)
+        return ThesisTemplate(style)
+
+    def _run_pandoc(self, md_content: str, reference_doc: Optional[str] = None,
+                    base_dir: Optional[str] = None) -> bytes:
+        """运行 pandoc（优先使用常驻 pandoc server），返回 docx 内容；图片相对 base_dir 查找"""
+        resources = self._find_resources(md_content)
+
+        # 输入、reference.docx 和引用的图片都未变化时复用上次的结果
+        key = (md_content, reference_doc, base_dir,
+               tuple(self._file_signature(os.path.join(base_dir or '', path)) for path in resources))
+        docx_bytes = self._pandoc_memo.get(key)
+        if docx_bytes is not None:
+            self._pandoc_memo.move_to_end(key)
+            return docx_bytes
+
+        options = {'standalone': True}
+        if reference_doc:
+            options['reference_doc'] = reference_doc
+        if base_dir:
+            options['resource_path'] = base_dir
+        docx_bytes = get_pandoc_runner().convert_text(
+            md_content,
+            from_format='markdown+yaml_metadata_block+citations',
+            to_format='docx',
+            options=options,
+            resources=resources,
+        )
+
+        self._pandoc_memo[key] = docx_bytes
+        while len(self._pandoc_memo) > self.PANDOC_MEMO_SIZE:
+            self._pandoc_memo.popitem(last=False)
+        return docx_bytes
+
+    @staticmethod
+    def _file_signature(path: str) -> tuple:
+        """文件的修改时间和大小，文件不存在时为 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return path, None
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def _find_resources(self, content: str) -> List[str]:
+        """查找 Markdown 中引用的本地图片"""
+        resources = []
+        for match in re.finditer(r'!\[[^\]]*\]\((?:<([^>]+)>|([^)\s]+))', content):
+            path = match.group(1) or match.group(2)
+            if '://' not in path and path not in resources:
+                resources.append(path)
+        return resources
+
+    def _preprocess_markdown(self, blocks: List[Block],
+                             equations: Optional[List[Tuple[str, Optional[str]]]] = None,
+                             style: Optional[TemplateStyle] = None,
+                             base_dir: Optional[str] = None) -> str:
+        """
+        将扩展语法块转换为 pandoc 可识别的 Markdown
 
-        return '\n'.join(md_lines)
+        Args:
+            blocks: 解析后的块
+            equations: 不为 None 时，#equation 替换为占位符，(OMML, 编号) 依次追加到此列表
+            style: 模板样式，用于按版心宽度处理 #figure 图片
+            base_dir: 图片和数据文件相对路径的基准目录，默认为当前目录
+        """
+        # 先并行处理全部插图，之后 _replace_figure 直接取用结果
+        if self.image_assets is not None and style is not None:
+            self.image_assets.prepare_all(
+                [(block.path, self._figure_width(block) / 100) for block in blocks
+                 if isinstance(block, Figure)], style.page, base_dir)
+
+        parts = []
+        for block in blocks:
+            if isinstance(block, Abstract):
+                title = 'Abstract' if block.lang == 'en' else '摘要'
+                parts.append(f'**{title}**\n\n{block.text}')
+            elif isinstance(block, Keywords):
+                parts.append(f'**关键词：** {block.text}')
+            elif isinstance(block, Figure):
+                parts.append(self._replace_figure(block, style, base_dir))
+            elif isinstance(block, Table):
+                parts.append(self._replace_table(block, base_dir))
+            elif isinstance(block, Equation):
+                parts.append(self._replace_equation(block, equations))
+            else:
+                parts.append(block.source)
+
+        return '\n\n'.join(parts) + '\n'
+
+    @staticmethod
+    def _figure_width(block: Figure) -> int:
+        """图片宽度占版心宽度的百分比（默认 80）"""
+        width = block.options.get('width', '80%')
+        if not re.fullmatch(r'\d+%', width):
+            return 80
+        return int(width[:-1])
+
+    def _replace_figure(self, block: Figure, style: Optional[TemplateStyle] = None,
+                        base_dir: Optional[str] = None) -> str:
+        """替换图片标记（未处理的图片保留原路径，由 pandoc 相对 base_dir 查找）"""
+        width = self._figure_width(block)
+
+        path = block.path
+        if self.image_assets is not None and style is not None:
+            path = self.image_assets.prepare(path, style.page, width / 100, base_dir)
+        if re.search(r'\s', path):
+            path = f'<{path}>'
+
+        return f'![{block.caption}]({path}){{ width={width}% }}\n\n*{block.caption}*'
+
+    def _replace_table(self, block: Table, base_dir: Optional[str] = None) -> str:
+        """替换表格标记"""
+        # CSV / Excel 数据文件直接读取并转换为 Markdown 表格
+        if is_table_file(block.path):
+            try:
+                header = block.options.get('header') == 'true'
+                table_md = TableConverter.table_to_markdown(os.path.join(base_dir or '', block.path),
+                                                            header,
+                                                            **table_options(block.options))
+                return f'{table_md}\n\n*{block.caption}*'
+            except (OSError, UnicodeDecodeError, csv.Error, ValueError):
+                pass
 
-    def _replace_equation(self, match) -> str:
+        return f'*{block.caption}*'
+
+    def _replace_equation(self, block: Equation,
+                          equations: Optional[List[Tuple[str, Optional[str]]]] = None) -> str:
         """替换公式标记"""
-        equation = match.group(1)
-        label = match.group(2)
+        if equations is not None:
+            try:
+                omml = math_converter.latex_to_omml(block.latex)
+            except ValueError:
+                # 无法转换的公式仍交给 pandoc
+                pass
+            else:
+                equations.append((omml, block.label))
+                return self.EQUATION_PLACEHOLDER.format(len(equations) - 1)
+
+        if block.label:
+            return f'$$ {block.latex} \\tag{{{block.label}}} $$'
+        return f'$$ {block.latex} $$'
+
+    def _insert_equations(self, doc: Document, equations: List[Tuple[str, Optional[str]]]):
+        """把正文中的公式占位段落替换为居中的 Word 公式"""
+        for _ in self._equation_stream(list(doc.element.body.iterchildren(qn('w:p'))), equations):
+            pass
+
+    def _equation_stream(self, elements: Iterable,
+                         equations: List[Tuple[str, Optional[str]]]) -> Iterator:
+        """逐个检查正文元素，公式占位段落就地改写为 Word 公式"""
+        placeholders = {self.EQUATION_PLACEHOLDER.format(i): equation
+                        for i, equation in enumerate(equations)}
+
+        for element in elements:
+            if element.tag == qn('w:p'):
+                text = ''.join(t.text or '' for t in element.iter(qn('w:t'))).strip()
+                equation = placeholders.get(text)
+                if equation is not None:
+                    self._fill_equation(element, equation)
+            yield element
+
+    @staticmethod
+    def _fill_equation(p, equation: Tuple[str, Optional[str]]):
+        """用公式替换段落内容，保留段落属性"""
+        omml, label = equation
+        for child in list(p):
+            if child.tag != qn('w:pPr'):
+                p.remove(child)
+
+        paragraph_format = ParagraphFormat(p)
+        paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        paragraph_format.first_line_indent = 0
 
         if label:
-            return f'\n$$ {equation} \\tag{{{label}}} $$\n'
-        return f'\n$$ {equation} $$\n'
-
-    def _extract_metadata(self, content: str) -> Dict[str, Any]:
-        """提取 YAML 元数据"""
-        metadata = {}
-        yaml_match = re.match(r'^---\s*\n(.*?)\n---\s*\n', content, re.DOTALL)
-
-        if yaml_match:
-            yaml_content = yaml_match.group(1)
-            for line in yaml_content.split('\n'):
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    metadata[key.strip()] = value.strip().strip('"').strip("'")
-
-        return metadata
+            # 带编号的公式：公式后接编号文本
+            p.append(parse_xml(omml))
+            run = OxmlElement('w:r')
+            t = OxmlElement('w:t')
+            t.set(qn('xml:space'), 'preserve')
+            t.text = f'    ({label})'
+            run.append(t)
+            p.append(run)
+        else:
+            math_para = OxmlElement('m:oMathPara')
+            math_para.append(parse_xml(omml))
+            p.append(math_para)
+
+
+def _convert_fragment(md_content: str, template: str, native_math: bool,
+                      base_dir: Optional[str]) -> bytes:
+    """在工作进程中转换一个章节"""
+    return MarkdownToDocxConverter(native_math).convert_fragment(md_content, template, base_dir)
+
+
+def convert_fragments(sources: List[str], template: str = "thesis", workers: Optional[int] = None,
+                      native_math: bool = True, base_dir: Optional[str] = None) -> List[bytes]:
+    """
+    并行转换多个章节
+
+    Args:
+        sources: 各章 Markdown 内容
+        template: 模板名称
+        workers: 进程数，默认等于 CPU 核数
+        native_math: 是否直接生成 Word 公式
+        base_dir: 相对路径的基准目录，默认为当前目录
+
+    Returns:
+        与 sources 顺序一致的 docx 片段
+    """
+    workers = min(workers or os.cpu_count() or 1, len(sources))
+    if workers <= 1:
+        converter = MarkdownToDocxConverter(native_math)
+        return [converter.convert_fragment(source, template, base_dir) for source in sources]
+
+    # 在创建工作进程前启动 pandoc server，子进程通过环境变量共用
+    get_pandoc_runner().export_server_env()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_convert_fragment, sources, repeat(template),
+                                 repeat(native_math), repeat(base_dir)))
 
 
 class BaseTemplate:
-    """基础模板类"""
+    """基础模板类，样式数值来自 templates/*.yaml"""
+
+    def __init__(self, style: TemplateStyle):
+        self.style = style
 
     def apply(self, doc: Document, metadata: Dict[str, Any]):
         """应用模板样式"""
         raise NotImplementedError
 
-    def set_heading_styles(self, doc: Document):
-        """设置标题样式"""
-        # 标题 1 - 章标题
-        style = doc.styles['Heading 1']
-        font = style.font
-        font.name = '黑体'
-        font.size = Pt(16)
-        font.bold = True
-        paragraph_format = style.paragraph_format
-        paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        paragraph_format.space_before = Pt(24)
-        paragraph_format.space_after = Pt(18)
-
-        # 标题 2 - 节标题
-        style = doc.styles['Heading 2']
-        font = style.font
-        font.name = '黑体'
-        font.size = Pt(14)
-        font.bold = True
-
-        # 标题 3
-        style = doc.styles['Heading 3']
-        font = style.font
-        font.name = '黑体'
-        font.size = Pt(12)
-        font.bold = True
-
-    def set_normal_style(self, doc: Document):
-        """设置正文样式"""
-        style = doc.styles['Normal']
-        font = style.font
-        font.name = '宋体'
-        font.size = Pt(12)
-        paragraph_format = style.paragraph_format
-        paragraph_format.line_spacing = 1.5
-        paragraph_format.first_line_indent = Inches(0.5)
+    def stream(self, package: OoxmlPackage, metadata: Dict[str, Any]) -> BodyTransform:
+        """
+        在 docx 压缩包上应用模板样式，效果与 apply 相同
+
+        需要新增的部件（页眉页脚等）在调用时立即加入 package，
+        正文的修改由返回的变换在保存时流式完成。
+        """
+        raise NotImplementedError
+
+    def apply_styles(self, doc: Document):
+        """
+        设置页面、标题和正文样式
+
+        正常情况下这些样式已由 reference.docx 带入，仅在无法生成 reference.docx 时调用。
+        """
+        apply_document_styles(doc, self.style)
 
 
 class ThesisTemplate(BaseTemplate):
     """毕业论文模板"""
 
+    def __init__(self, style: TemplateStyle):
+        super().__init__(style)
+        fonts = style.chinese_fonts
+        sizes = style.font_sizes
+
+        # 特殊段落样式（摘要标题、关键词）
+        self.special_paragraph_rules = (
+            StyleRule(match=lambda text, i: text in ('摘要', 'Abstract'),
+                      alignment=WD_ALIGN_PARAGRAPH.CENTER, font_name=fonts.heading,
+                      font_size=sizes.chapter_title, bold=True),
+            StyleRule(match=lambda text, i: text.startswith(('关键词：', 'Keywords:')),
+                      font_name=fonts.body, font_size=sizes.body, bold=True),
+        )
+
     def apply(self, doc: Document, metadata: Dict[str, Any]):
-        """应用毕业论文样式"""
-        self.set_heading_styles(doc)
-        self.set_normal_style(doc)
+        """应用毕业论文样式（封面、页眉页脚和特殊段落）"""
+        # 处理特殊段落（摘要、关键词等），同时得到正文概况
+        summary = StyleEngine(self.special_paragraph_rules).apply(doc)
 
         # 添加封面（如果文档为空）
-        if len(doc.paragraphs) == 0 or not doc.paragraphs[0].text.strip():
+        if summary.paragraph_count == 0 or not summary.first_text:
             self._add_cover_page(doc, metadata)
 
         # 添加页眉页脚
         self._add_headers_footers(doc, metadata)
 
-        # 处理特殊段落（摘要、关键词等）
-        self._process_special_paragraphs(doc)
+    def stream(self, package: OoxmlPackage, metadata: Dict[str, Any]) -> BodyTransform:
+        """页眉页脚作为新部件加入，各分节引用它们；封面在正文最后的分节符之前写出"""
+        header_id = package.add_related_part(
+            DOCUMENT_PART, 'word/header{}.xml',
+            self._part_xml('w:hdr', self._header_paragraph(metadata)), CT.WML_HEADER, RT.HEADER)
+        footer_id = None
+        if self.style.header_footer.footer_page_number:
+            footer_id = package.add_related_part(
+                DOCUMENT_PART, 'word/footer{}.xml',
+                self._part_xml('w:ftr', self._page_number_paragraph()), CT.WML_FOOTER, RT.FOOTER)
+
+        def transform(elements):
+            engine = StyleEngine(self.special_paragraph_rules)
+            for element in engine.process(elements):
+                if element.tag == qn('w:sectPr'):
+                    summary = engine.summary
+                    if summary.paragraph_count == 0 or not summary.first_text:
+                        yield from self._cover_elements(metadata)
+                    self._set_references(element, header_id, footer_id)
+                elif element.tag == qn('w:p'):
+                    # 段落属性中的分节符
+                    sect_pr = element.find(f"{qn('w:pPr')}/{qn('w:sectPr')}")
+                    if sect_pr is not None:
+                        self._set_references(sect_pr, header_id, footer_id)
+                yield element
+
+        return transform
 
     def _add_cover_page(self, doc: Document, metadata: Dict[str, Any]):
         """添加封面"""
+        body = doc.element.body
+        sect_pr = body.find(qn('w:sectPr'))
+        for element in self._cover_elements(metadata):
+            if sect_pr is not None:
+                sect_pr.addprevious(element)
+            else:
+                body.append(element)
+
+    def _cover_elements(self, metadata: Dict[str, Any]) -> List:
+        """封面的段落元素（最后为分页符）"""
         title = metadata.get('title', '论文标题')
         author = metadata.get('author', '作者')
         school = metadata.get('school', '学院')
+        cover = self.style.cover
+        fonts = self.style.chinese_fonts
+        elements = []
+
+        def add_paragraph(text: str = '', size: Optional[float] = None, bold: bool = False,
+                          font_name: Optional[str] = None):
+            p = OxmlElement('w:p')
+            elements.append(p)
+            if not text:
+                return
+            paragraph = Paragraph(p, None)
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            run = paragraph.add_run(text)
+            run.font.size = Pt(size)
+            if bold:
+                run.font.bold = True
+            run.font.name = font_name
 
         # 学校名称
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = p.add_run(school)
-        run.font.size = Pt(26)
-        run.font.bold = True
-        run.font.name = '黑体'
+        if cover.show_school_name:
+            add_paragraph(school, cover.school_name_size, True, fonts.title)
 
         # 论文类型
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = p.add_run('本科毕业论文')
-        run.font.size = Pt(36)
-        run.font.bold = True
-        run.font.name = '黑体'
+        if cover.show_thesis_type:
+            add_paragraph(cover.thesis_type, cover.thesis_type_size, True, fonts.title)
 
-        doc.add_paragraph()  # 空行
+        add_paragraph()  # 空行
 
         # 论文标题
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = p.add_run(title)
-        run.font.size = Pt(22)
-        run.font.bold = True
-        run.font.name = '宋体'
+        add_paragraph(title, cover.title_size, True, fonts.body)
 
-        doc.add_paragraph()
-        doc.add_paragraph()
+        add_paragraph()
+        add_paragraph()
 
         # 作者信息表格样式
         info_items = [
@@ -303,102 +630,100 @@ class ThesisTemplate(BaseTemplate):
         ]
 
         for label, value in info_items:
-            p = doc.add_paragraph()
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p.add_run(f'{label}：{value}')
-            run.font.size = Pt(14)
-            run.font.name = '宋体'
+            add_paragraph(f'{label}：{value}', cover.info_font_size, font_name=fonts.body)
 
-        doc.add_page_break()
+        elements.append(parse_xml(f'<w:p {nsdecls("w")}><w:r><w:br w:type="page"/></w:r></w:p>'))
+        return elements
 
     def _add_headers_footers(self, doc: Document, metadata: Dict[str, Any]):
         """添加页眉页脚"""
         for section in doc.sections:
             # 页眉
-            header = section.header
-            header_para = header.paragraphs[0]
-            header_para.text = metadata.get('school', '')
-            header_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            header_para.runs[0].font.size = Pt(10)
+            self._replace_paragraph(section.header.paragraphs[0],
+                                    self._header_paragraph(metadata))
 
             # 页脚 - 页码
-            footer = section.footer
-            footer_para = footer.paragraphs[0]
-            footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-            # 添加页码字段
-            footer_para.add_run()._element.append(
-                self._create_page_number_field(footer_para)
-            )
-
-    def _create_page_number_field(self, paragraph):
-        """创建页码字段"""
-        from docx.oxml import OxmlElement
-        from docx.oxml.ns import qn
-
-        fldChar1 = OxmlElement('w:fldChar')
-        fldChar1.set(qn('w:fldCharType'), 'begin')
-
-        instrText = OxmlElement('w:instrText')
-        instrText.set(qn('xml:space'), 'preserve')
-        instrText.text = "PAGE"
-
-        fldChar2 = OxmlElement('w:fldChar')
-        fldChar2.set(qn('w:fldCharType'), 'separate')
-
-        fldChar3 = OxmlElement('w:fldChar')
-        fldChar3.set(qn('w:fldCharType'), 'end')
-
-        paragraph._p.append(fldChar1)
-        paragraph._p.append(instrText)
-        paragraph._p.append(fldChar2)
-        paragraph._p.append(fldChar3)
-
-        return fldChar3
-
-    def _process_special_paragraphs(self, doc: Document):
-        """处理特殊段落样式"""
-        for para in doc.paragraphs:
-            text = para.text.strip()
-
-            # 摘要标题
-            if text == '摘要' or text == 'Abstract':
-                para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                for run in para.runs:
-                    run.font.size = Pt(16)
-                    run.font.bold = True
-                    run.font.name = '黑体'
-
-            # 关键词
-            elif text.startswith('关键词：') or text.startswith('Keywords:'):
-                for run in para.runs:
-                    run.font.name = '宋体'
-                    run.font.size = Pt(12)
-                    if '关键词' in text or 'Keywords' in text:
-                        run.font.bold = True
+            if self.style.header_footer.footer_page_number:
+                self._replace_paragraph(section.footer.paragraphs[0],
+                                        self._page_number_paragraph())
+
+    @staticmethod
+    def _replace_paragraph(paragraph: Paragraph, p):
+        paragraph._p.addnext(p)
+        paragraph._p.getparent().remove(paragraph._p)
+
+    def _header_paragraph(self, metadata: Dict[str, Any]):
+        """居中的页眉段落"""
+        p = OxmlElement('w:p')
+        paragraph = Paragraph(p, None)
+        paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        text = self.style.header_text(metadata)
+        if text:
+            paragraph.add_run(text).font.size = Pt(10)
+        return p
+
+    def _page_number_paragraph(self):
+        """居中的页码段落（PAGE 字段）"""
+        p = OxmlElement('w:p')
+        Paragraph(p, None).alignment = WD_ALIGN_PARAGRAPH.CENTER
+        p.append(parse_xml(
+            f'<w:r {nsdecls("w")}><w:fldChar w:fldCharType="begin"/></w:r>'))
+        p.append(parse_xml(
+            f'<w:r {nsdecls("w")}><w:instrText xml:space="preserve"> PAGE </w:instrText></w:r>'))
+        p.append(parse_xml(
+            f'<w:r {nsdecls("w")}><w:fldChar w:fldCharType="separate"/></w:r>'))
+        p.append(parse_xml(f'<w:r {nsdecls("w")}><w:t>1</w:t></w:r>'))
+        p.append(parse_xml(
+            f'<w:r {nsdecls("w")}><w:fldChar w:fldCharType="end"/></w:r>'))
+        return p
+
+    @staticmethod
+    def _part_xml(tag: str, paragraph) -> bytes:
+        """只含一个段落的页眉（w:hdr）或页脚（w:ftr）部件"""
+        root = parse_xml(f'<{tag} {nsdecls("w", "r")}/>')
+        root.append(paragraph)
+        return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+    @staticmethod
+    def _set_references(sect_pr, header_id: str, footer_id: Optional[str]):
+        """让分节使用新的默认页眉页脚（引用须位于 w:sectPr 的最前面）"""
+        for tag, rid in (('w:footerReference', footer_id), ('w:headerReference', header_id)):
+            if rid is None:
+                continue
+            for old in sect_pr.findall(qn(tag)):
+                if old.get(qn('w:type')) in (None, 'default'):
+                    sect_pr.remove(old)
+            reference = OxmlElement(tag)
+            reference.set(qn('w:type'), 'default')
+            reference.set(qn('r:id'), rid)
+            sect_pr.insert(0, reference)
 
 
 class JournalTemplate(BaseTemplate):
     """期刊论文模板"""
 
     def apply(self, doc: Document, metadata: Dict[str, Any]):
-        """应用期刊论文样式"""
-        self.set_heading_styles(doc)
-        self.set_normal_style(doc)
-
+        """应用期刊论文样式（行距已由正文样式设置）"""
         # 期刊通常不需要复杂页眉页脚
         # 但可能需要特定的引用格式
-
-        # 设置双倍行距（某些期刊要求）
-        for para in doc.paragraphs:
-            para.paragraph_format.line_spacing = 2.0
-
-        # 处理标题
+        engine = self._title_engine(metadata)
+        if engine:
+            engine.apply(doc)
+
+    def stream(self, package: OoxmlPackage, metadata: Dict[str, Any]) -> BodyTransform:
+        """只处理标题段落"""
+        engine = self._title_engine(metadata)
+        if engine is None:
+            return lambda elements: elements
+        return engine.process
+
+    def _title_engine(self, metadata: Dict[str, Any]) -> Optional[StyleEngine]:
+        """标题段落居中加粗，没有标题时返回 None"""
         title = metadata.get('title', '')
-        if title and doc.paragraphs:
-            first_para = doc.paragraphs[0]
-            if title in first_para.text:
-                first_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                for run in first_para.runs:
-                    run.font.size = Pt(14)
-                    run.font.bold = True
+        if not title:
+            return None
+        return StyleEngine([
+            StyleRule(match=lambda text, i: i == 0 and title in text,
+                      alignment=WD_ALIGN_PARAGRAPH.CENTER,
+                      font_size=self.style.font_sizes.chapter_title, bold=True),
+        ])
@@ -0,0 +1,456 @@
+"""
+公式转换器 - LaTeX → MathML → OMML（Word 原生公式）
+LaTeX 到 MathML 使用 latex2mathml，MathML 到 OMML 由本模块按元素逐一映射。
+转换结果按规范化后的 LaTeX 缓存，论文中反复出现的符号和公式只转换一次。
+"""
+
+import re
+from functools import lru_cache
+
+from lxml import etree
+
+MATHML_NS = 'http://www.w3.org/1998/Math/MathML'
+OMML_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/math'
+
+# 每种转换最多缓存的公式数
+CACHE_SIZE = 2048
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 大型运算符：积分类的上下限放在右侧，其余放在正上方和正下方
+_INTEGRALS = frozenset('∫∬∭∮∯∰∱∲∳')
+_NARY = _INTEGRALS | frozenset('∑∏∐⋃⋂⋁⋀⨁⨂⨀⨄⨆')
+
+# MathML 重音符号 -> OMML 使用的组合字符
+_ACCENTS = {
+    '^': '\u0302', '\u02c6': '\u0302', '~': '\u0303', '\u02dc': '\u0303',
+    '\u02d9': '\u0307', '\u00a8': '\u0308', '\u02c7': '\u030c', '\u00b4': '\u0301',
+    '`': '\u0300', '\u02d8': '\u0306', '\u00af': '\u0305', '\u02c9': '\u0305',
+    '\u2192': '\u20d7', '\u2190': '\u20d6', '\u2194': '\u20e1',
+}
+
+# 上划线 / 下划线使用的字符
+_BARS = frozenset('\u2015\u203e\u00af_\u0332\u2014')
+
+_OPEN_FENCES = frozenset('([{|‖⟨⌈⌊')
+
+
+def _m(tag: str) -> str:
+    return f'{{{OMML_NS}}}{tag}'
+
+
+def _local(element) -> str:
+    """MathML 元素的本地名"""
+    return etree.QName(element).localname
+
+
+def normalize_latex(latex: str) -> str:
+    """规范化 LaTeX：去掉首尾空白和 $ 定界符，合并连续空白"""
+    latex = latex.strip()
+    if latex.startswith('$$') and latex.endswith('$$') and len(latex) >= 4:
+        latex = latex[2:-2]
+    elif latex.startswith('$') and latex.endswith('$') and len(latex) >= 2:
+        latex = latex[1:-1]
+    return _WHITESPACE_RE.sub(' ', latex).strip()
+
+
+def latex_to_mathml(latex: str, display: bool = True) -> str:
+    """
+    将 LaTeX 转换为 MathML
+
+    Args:
+        latex: LaTeX 公式（可带 $ 定界符）
+        display: 是否为独立公式
+
+    Returns:
+        MathML 字符串
+
+    Raises:
+        ImportError: 未安装 latex2mathml
+        ValueError: 无法解析的公式
+    """
+    return _latex_to_mathml(normalize_latex(latex), display)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _latex_to_mathml(latex: str, display: bool) -> str:
+    try:
+        from latex2mathml.converter import convert
+    except ImportError:
+        raise ImportError("请先安装 latex2mathml: pip install latex2mathml")
+
+    try:
+        return convert(latex, display='block' if display else 'inline')
+    except Exception as e:
+        # latex2mathml 对不支持的命令抛出多种异常，统一为 ValueError
+        raise ValueError(f"无法转换公式 {latex}: {e}") from e
+
+
+def latex_to_omml(latex: str) -> str:
+    """
+    将 LaTeX 转换为 OMML
+
+    Args:
+        latex: LaTeX 公式（可带 $ 定界符）
+
+    Returns:
+        m:oMath 元素的 XML 字符串（声明了 m 命名空间，可直接用 parse_xml 解析）
+
+    Raises:
+        ImportError: 未安装 latex2mathml
+        ValueError: 无法解析的公式
+    """
+    return _latex_to_omml(normalize_latex(latex))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _latex_to_omml(latex: str) -> str:
+    return mathml_to_omml(_latex_to_mathml(latex, True))
+
+
+def mathml_to_omml(mathml: str) -> str:
+    """
+    将 MathML 转换为 OMML
+
+    Args:
+        mathml: MathML 字符串（根元素为 math）
+
+    Returns:
+        m:oMath 元素的 XML 字符串
+    """
+    try:
+        root = etree.fromstring(mathml.encode('utf-8'))
+    except etree.XMLSyntaxError as e:
+        raise ValueError(f"无效的 MathML: {e}") from e
+
+    omath = etree.Element(_m('oMath'), nsmap={'m': OMML_NS})
+    for child in _convert_children(root):
+        omath.append(child)
+    return etree.tostring(omath, encoding='unicode')
+
+
+def is_available() -> bool:
+    """是否已安装 LaTeX → MathML 所需的 latex2mathml"""
+    try:
+        import latex2mathml  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ===== MathML -> OMML 映射 =====
+
+def _elements(parent) -> list:
+    """子元素（跳过注释等）"""
+    return [child for child in parent if isinstance(child.tag, str)]
+
+
+def _convert_children(parent) -> list:
+    """转换全部子元素"""
+    return _convert_sequence(_elements(parent))
+
+
+def _convert_sequence(children: list) -> list:
+    """依次转换元素；大型运算符把紧随其后的元素作为被积 / 求和对象"""
+    result = []
+    i = 0
+    while i < len(children):
+        child = children[i]
+        nary = _nary_parts(child)
+        if nary is not None:
+            operand = children[i + 1] if i + 1 < len(children) else None
+            result.append(_nary(*nary, operand))
+            i += 2 if operand is not None else 1
+            continue
+        result.extend(_convert(child))
+        i += 1
+    return result
+
+
+def _convert(element) -> list:
+    """转换单个 MathML 元素，返回 OMML 元素列表"""
+    name = _local(element)
+
+    if name in ('mi', 'mn', 'mo', 'mtext', 'ms'):
+        return _text_run(element)
+    if name == 'mspace':
+        return _space(element)
+    if name in ('mrow', 'mstyle', 'mpadded', 'math', 'merror'):
+        return _row(element)
+    if name == 'semantics':
+        children = _elements(element)
+        return _convert(children[0]) if children else []
+    if name in ('mphantom', 'annotation', 'annotation-xml', 'none', 'mprescripts'):
+        return []
+
+    children = _elements(element)
+    if name == 'mfrac' and len(children) == 2:
+        fraction = etree.Element(_m('f'))
+        if element.get('linethickness') in ('0', '0em', '0px', '0pt'):
+            pr = etree.SubElement(fraction, _m('fPr'))
+            etree.SubElement(pr, _m('type')).set(_m('val'), 'noBar')
+        fraction.append(_arg('num', children[0]))
+        fraction.append(_arg('den', children[1]))
+        return [fraction]
+    if name == 'msqrt':
+        radical = etree.Element(_m('rad'))
+        pr = etree.SubElement(radical, _m('radPr'))
+        etree.SubElement(pr, _m('degHide')).set(_m('val'), '1')
+        etree.SubElement(radical, _m('deg'))
+        radical.append(_arg('e', element))
+        return [radical]
+    if name == 'mroot' and len(children) == 2:
+        radical = etree.Element(_m('rad'))
+        radical.append(_arg('deg', children[1]))
+        radical.append(_arg('e', children[0]))
+        return [radical]
+    if name in ('msup', 'msub', 'msubsup') and len(children) >= 2:
+        return _script(name, children)
+    if name in ('mover', 'munder', 'munderover') and len(children) >= 2:
+        return _under_over(name, element, children)
+    if name == 'mfenced':
+        return [_delimiter(element.get('open', '('), element.get('close', ')'),
+                           [[child] for child in children])]
+    if name == 'menclose':
+        box = etree.Element(_m('borderBox'))
+        box.append(_arg('e', element))
+        return [box]
+    if name == 'mtable':
+        return [_matrix(children)]
+    if name == 'mmultiscripts' and children:
+        return _convert(children[0])
+
+    # 未支持的元素按普通行处理
+    return _row(element)
+
+
+def _arg(tag: str, element) -> etree._Element:
+    """创建 m:e、m:num 等参数元素；mrow 等容器展开为其子元素"""
+    arg = etree.Element(_m(tag))
+    name = _local(element)
+    if name == 'mrow':
+        children = _row(element)
+    elif name in ('mstyle', 'msqrt', 'mtd', 'menclose', 'math'):
+        children = _convert_children(element)
+    else:
+        children = _convert_sequence([element])
+    for child in children:
+        arg.append(child)
+    return arg
+
+
+def _row(element) -> list:
+    """mrow：两端为伸缩括号时转换为 m:d，否则依次展开"""
+    children = _elements(element)
+    if len(children) >= 2 and _is_fence(children[0], children[1:-1]) \
+            and _is_fence(children[-1], children[1:-1]):
+        return [_delimiter((children[0].text or '').strip(), (children[-1].text or '').strip(),
+                           [children[1:-1]])]
+    return _convert_sequence(children)
+
+
+def _is_fence(element, inner: list) -> bool:
+    """是否为成对括号的一端：\\left / \\right 生成的 fence，或矩阵、二项式两侧的括号"""
+    if _local(element) != 'mo':
+        return False
+    if element.get('fence') == 'true':
+        return True
+    text = (element.text or '').strip()
+    wrapped = len(inner) == 1 and _local(inner[0]) in ('mtable', 'mfrac')
+    return wrapped and (text in _OPEN_FENCES or text in ')]}|‖⟩⌉⌋')
+
+
+def _delimiter(open_char: str, close_char: str, items: list) -> etree._Element:
+    """括号 m:d，items 中的每组元素成为一个 m:e"""
+    delimiter = etree.Element(_m('d'))
+    pr = etree.SubElement(delimiter, _m('dPr'))
+    etree.SubElement(pr, _m('begChr')).set(_m('val'), open_char)
+    etree.SubElement(pr, _m('endChr')).set(_m('val'), close_char)
+    for item in items:
+        arg = etree.SubElement(delimiter, _m('e'))
+        for child in _convert_sequence(item):
+            arg.append(child)
+    if not items:
+        etree.SubElement(delimiter, _m('e'))
+    return delimiter
+
+
+def _text_run(element) -> list:
+    """mi / mn / mo / mtext 转换为 m:r"""
+    text = element.text or ''
+    name = _local(element)
+    if name == 'mtext':
+        text = text.replace('\u00a0', ' ')
+    elif name != 'ms':
+        text = text.strip()
+    if not text:
+        return []
+
+    run = etree.Element(_m('r'))
+    variant = element.get('mathvariant')
+    style = None
+    if name == 'mtext' or name == 'ms':
+        pr = etree.SubElement(run, _m('rPr'))
+        etree.SubElement(pr, _m('nor'))
+    elif variant == 'bold':
+        style = 'b'
+    elif variant == 'bold-italic':
+        style = 'bi'
+    elif variant == 'normal' or (name in ('mi', 'mo') and len(text) > 1 and text.isalpha()):
+        # 多字母的函数名（sin、lim、tr 等）用正体
+        style = 'p'
+    if style:
+        pr = etree.SubElement(run, _m('rPr'))
+        etree.SubElement(pr, _m('sty')).set(_m('val'), style)
+
+    t = etree.SubElement(run, _m('t'))
+    t.text = text
+    if text != text.strip():
+        t.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
+    return [run]
+
+
+def _space(element) -> list:
+    """mspace 转换为空格字符"""
+    width = element.get('width', '')
+    match = re.match(r'([\d.]+)em', width)
+    if not match:
+        return []
+    em = float(match.group(1))
+    if em <= 0:
+        return []
+    run = etree.Element(_m('r'))
+    t = etree.SubElement(run, _m('t'))
+    # 1em 以上用全角空格，否则用窄空格
+    t.text = '\u2003' * int(em) if em >= 1 else '\u2009'
+    return [run]
+
+
+def _operator_text(element):
+    """单个 mo 的文本，否则返回 None"""
+    if _local(element) == 'mo':
+        return (element.text or '').strip()
+    return None
+
+
+def _nary_parts(element):
+    """
+    识别大型运算符（∑、∫ 等），返回 (运算符, 下标, 上标, 是否上下放置)，否则返回 None
+    """
+    name = _local(element)
+    char = _operator_text(element)
+    if char in _NARY:
+        return char, None, None, char not in _INTEGRALS
+
+    children = _elements(element)
+    if name not in ('msub', 'msup', 'msubsup', 'munder', 'mover', 'munderover') or not children:
+        return None
+    char = _operator_text(children[0])
+    if char not in _NARY:
+        return None
+
+    lower = upper = None
+    if name in ('msub', 'munder', 'msubsup', 'munderover') and len(children) >= 2:
+        lower = children[1]
+    if name in ('msup', 'mover') and len(children) >= 2:
+        upper = children[1]
+    if name in ('msubsup', 'munderover') and len(children) >= 3:
+        upper = children[2]
+    under_over = name in ('munder', 'mover', 'munderover') or char not in _INTEGRALS
+    return char, lower, upper, under_over
+
+
+def _nary(char: str, lower, upper, under_over: bool, operand) -> etree._Element:
+    """大型运算符 m:nary"""
+    nary = etree.Element(_m('nary'))
+    pr = etree.SubElement(nary, _m('naryPr'))
+    etree.SubElement(pr, _m('chr')).set(_m('val'), char)
+    etree.SubElement(pr, _m('limLoc')).set(_m('val'), 'undOvr' if under_over else 'subSup')
+    if lower is None:
+        etree.SubElement(pr, _m('subHide')).set(_m('val'), '1')
+    if upper is None:
+        etree.SubElement(pr, _m('supHide')).set(_m('val'), '1')
+
+    nary.append(_arg('sub', lower) if lower is not None else etree.Element(_m('sub')))
+    nary.append(_arg('sup', upper) if upper is not None else etree.Element(_m('sup')))
+    nary.append(_arg('e', operand) if operand is not None else etree.Element(_m('e')))
+    return nary
+
+
+def _script(name: str, children: list) -> list:
+    """上下标 m:sSup / m:sSub / m:sSubSup；lim 等函数名的下标放在正下方"""
+    base_text = _operator_text(children[0])
+    if name == 'msub' and base_text and len(base_text) > 1 and base_text.isalpha():
+        return [_limit('limLow', children[0], children[1])]
+
+    if name == 'msup':
+        script = etree.Element(_m('sSup'))
+        script.append(_arg('e', children[0]))
+        script.append(_arg('sup', children[1]))
+    elif name == 'msub':
+        script = etree.Element(_m('sSub'))
+        script.append(_arg('e', children[0]))
+        script.append(_arg('sub', children[1]))
+    else:
+        script = etree.Element(_m('sSubSup'))
+        script.append(_arg('e', children[0]))
+        script.append(_arg('sub', children[1]))
+        script.append(_arg('sup', children[2] if len(children) > 2 else etree.Element('mrow')))
+    return [script]
+
+
+def _limit(tag: str, base, limit) -> etree._Element:
+    """m:limLow / m:limUpp"""
+    element = etree.Element(_m(tag))
+    element.append(_arg('e', base))
+    element.append(_arg('lim', limit))
+    return element
+
+
+def _under_over(name: str, element, children: list) -> list:
+    """mover / munder：重音、上下划线或上下限"""
+    base = children[0]
+    mark = children[1] if name != 'munderover' else None
+    mark_text = _operator_text(mark) if mark is not None else None
+
+    if mark_text is not None and mark_text in _BARS:
+        bar = etree.Element(_m('bar'))
+        pr = etree.SubElement(bar, _m('barPr'))
+        etree.SubElement(pr, _m('pos')).set(_m('val'), 'top' if name == 'mover' else 'bot')
+        bar.append(_arg('e', base))
+        return [bar]
+
+    if name == 'mover' and mark_text is not None and (
+            element.get('accent') == 'true' or mark.get('accent') == 'true'
+            or mark_text in _ACCENTS):
+        accent = etree.Element(_m('acc'))
+        pr = etree.SubElement(accent, _m('accPr'))
+        etree.SubElement(pr, _m('chr')).set(_m('val'), _ACCENTS.get(mark_text, mark_text))
+        accent.append(_arg('e', base))
+        return [accent]
+
+    if name == 'mover':
+        return [_limit('limUpp', base, children[1])]
+    if name == 'munder':
+        return [_limit('limLow', base, children[1])]
+
+    # munderover：下限包在上限之内
+    lower = _limit('limLow', base, children[1])
+    upper = etree.Element(_m('limUpp'))
+    arg = etree.SubElement(upper, _m('e'))
+    arg.append(lower)
+    upper.append(_arg('lim', children[2] if len(children) > 2 else etree.Element('mrow')))
+    return [upper]
+
+
+def _matrix(rows: list) -> etree._Element:
+    """mtable 转换为 m:m"""
+    matrix = etree.Element(_m('m'))
+    for row in rows:
+        if _local(row) not in ('mtr', 'mlabeledtr'):
+            continue
+        matrix_row = etree.SubElement(matrix, _m('mr'))
+        for cell in row:
+            if isinstance(cell.tag, str) and _local(cell) == 'mtd':
+                matrix_row.append(_arg('e', cell))
+    return matrix
@@ -0,0 +1,443 @@
+"""
+OOXML 包的底层读写
+直接操作 docx 压缩包中的部件，不经过 python-docx 的 Document 代理对象：
+- word/document.xml 用 lxml.iterparse 流式读取，正文元素逐个改写后写出，不在内存中保留整棵树
+- 未修改的部件（图片等媒体文件）按压缩后的原始字节复制，不解压也不重新压缩
+- 只重新写出修改过的部件
+"""
+
+import io
+import posixpath
+import struct
+import zipfile
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union, BinaryIO
+
+from lxml import etree
+
+from docx.oxml.ns import qn
+
+try:
+    from docx.oxml.parser import element_class_lookup, oxml_parser
+except ImportError:  # python-docx < 1.0
+    from docx.oxml import element_class_lookup, oxml_parser
+
+# 正文元素流的变换：接收 w:body 的顶层元素，产出要写出的元素
+BodyTransform = Callable[[Iterator], Iterable]
+
+DOCUMENT_PART = "word/document.xml"
+CONTENT_TYPES_PART = "[Content_Types].xml"
+
+_CT_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def rels_name(partname: str) -> str:
+    """部件对应的关系文件，如 word/document.xml -> word/_rels/document.xml.rels"""
+    directory, name = posixpath.split(partname)
+    return posixpath.join(directory, '_rels', name + '.rels')
+
+
+class OoxmlPackage:
+    """docx 压缩包，按部件读取和替换"""
+
+    def __init__(self, source: Union[str, bytes, BinaryIO]):
+        """
+        Args:
+            source: docx 文件路径、内容或可随机读取的二进制流
+        """
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        elif isinstance(source, str):
+            source = open(source, 'rb')
+        self._source = source
+        self._zip = zipfile.ZipFile(source)
+        # 原包中的条目，保存时保持顺序
+        self._infos = self._zip.infolist()
+        # 替换或新增的部件内容
+        self._parts: Dict[str, bytes] = {}
+        # 已解析并可能修改的 XML 部件，保存时重新序列化
+        self._xml: Dict[str, etree._Element] = {}
+        self._document_transform: Optional[BodyTransform] = None
+
+    def close(self):
+        self._zip.close()
+        self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ===== 部件读写 =====
+
+    def names(self) -> List[str]:
+        """包中的部件名（含新增部件）"""
+        names = [info.filename for info in self._infos]
+        names.extend(name for name in list(self._parts) + list(self._xml) if name not in names)
+        return names
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._parts or name in self._xml or name in self._zip.NameToInfo
+
+    def read(self, name: str) -> bytes:
+        """读取部件内容（包括已替换的内容）"""
+        if name in self._xml:
+            return self._serialize(self._xml[name])
+        if name in self._parts:
+            return self._parts[name]
+        return self._zip.read(name)
+
+    def write(self, name: str, data: bytes):
+        """替换或新增部件"""
+        self._xml.pop(name, None)
+        self._parts[name] = data
+
+    def xml(self, name: str) -> etree._Element:
+        """
+        解析 XML 部件，返回的元素可直接修改，保存时写回
+
+        元素使用 python-docx 的元素类（CT_P 等），可以配合 ParagraphFormat 等代理使用。
+        """
+        if name not in self._xml:
+            self._xml[name] = etree.fromstring(self.read(name), oxml_parser)
+            self._parts.pop(name, None)
+        return self._xml[name]
+
+    @staticmethod
+    def _serialize(element) -> bytes:
+        return etree.tostring(element, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+    # ===== 内容类型与关系 =====
+
+    def add_part(self, name: str, data: bytes, content_type: str):
+        """新增部件并登记内容类型"""
+        self.write(name, data)
+        types = self.xml(CONTENT_TYPES_PART)
+        partname = '/' + name
+        for override in types.iterchildren(f'{{{_CT_NS}}}Override'):
+            if override.get('PartName') == partname:
+                override.set('ContentType', content_type)
+                return
+        etree.SubElement(types, f'{{{_CT_NS}}}Override', PartName=partname,
+                         ContentType=content_type)
+
+    def next_partname(self, template: str) -> str:
+        """按模板生成未使用的部件名，如 word/header{}.xml -> word/header3.xml"""
+        index = 1
+        while template.format(index) in self:
+            index += 1
+        return template.format(index)
+
+    def relationships(self, partname: str) -> etree._Element:
+        """部件的关系列表（没有时新建）"""
+        name = rels_name(partname)
+        if name not in self:
+            self.write(name, self._serialize(etree.Element(f'{{{_RELS_NS}}}Relationships',
+                                                           nsmap={None: _RELS_NS})))
+        return self.xml(name)
+
+    def relate(self, partname: str, target: str, reltype: str) -> str:
+        """
+        在部件上添加指向另一部件的关系
+
+        Args:
+            partname: 来源部件名
+            target: 目标部件名（包内绝对名称）
+            reltype: 关系类型
+
+        Returns:
+            新关系的 rId
+        """
+        rels = self.relationships(partname)
+        ids = {rel.get('Id') for rel in rels}
+        index = len(ids) + 1
+        while f'rId{index}' in ids:
+            index += 1
+        rid = f'rId{index}'
+        relative = posixpath.relpath(target, posixpath.dirname(partname))
+        etree.SubElement(rels, f'{{{_RELS_NS}}}Relationship', Id=rid, Type=reltype,
+                         Target=relative)
+        return rid
+
+    def related_part(self, partname: str, rid: str) -> Optional[str]:
+        """关系指向的部件名，不存在或为外部链接时返回 None"""
+        if rels_name(partname) not in self:
+            return None
+        for rel in self.xml(rels_name(partname)):
+            if rel.get('Id') == rid and rel.get('TargetMode') != 'External':
+                return posixpath.normpath(posixpath.join(posixpath.dirname(partname),
+                                                         rel.get('Target')))
+        return None
+
+    def add_related_part(self, partname: str, template: str, data: bytes, content_type: str,
+                         reltype: str) -> str:
+        """新增部件并从 partname 建立关系，返回 rId"""
+        name = self.next_partname(template)
+        self.add_part(name, data, content_type)
+        return self.relate(partname, name, reltype)
+
+    # ===== 正文流式处理 =====
+
+    def iter_body(self) -> Iterator:
+        """
+        流式读取 w:body 的顶层元素（段落、表格、最后的 w:sectPr）
+
+        每个元素在调用方取下一个元素时被清空并从树中移除，调用方不应保留已产出的元素。
+        """
+        for kind, element in self._document_events():
+            if kind == 'body-child':
+                yield element
+
+    def rewrite_body(self, transform: BodyTransform):
+        """
+        设置 word/document.xml 的改写方式，保存时流式执行
+
+        Args:
+            transform: 接收正文顶层元素的迭代器，产出要写出的元素；
+                       可以原地修改、替换、插入或删除元素
+        """
+        self._document_transform = transform
+
+    def _document_events(self) -> Iterator:
+        """
+        iterparse 读取 document.xml，依次产出 (类型, 元素)：
+        root（w:document 开始）、body（w:body 开始）、body-child（正文顶层元素）、
+        body-end（w:body 结束）、root-child（w:body 以外的顶层元素）
+        """
+        with self._zip.open(DOCUMENT_PART) as f:
+            events = etree.iterparse(f, events=('start', 'end'), huge_tree=True)
+            events.set_element_class_lookup(element_class_lookup)
+            root = body = None
+            for event, element in events:
+                if event == 'start':
+                    if root is None:
+                        root = element
+                        yield 'root', element
+                    elif body is None and element.tag == qn('w:body'):
+                        body = element
+                        yield 'body', element
+                    continue
+
+                parent = element.getparent()
+                if element is body:
+                    yield 'body-end', element
+                    continue
+                if parent is not None and parent is body:
+                    yield 'body-child', element
+                elif parent is not None and parent is root:
+                    yield 'root-child', element
+                else:
+                    continue
+                # 调用方处理完后释放元素
+                element.clear()
+                parent.remove(element)
+
+    def _write_document(self, out: BinaryIO):
+        """按 rewrite_body 设置的变换流式写出 document.xml"""
+        events = self._document_events()
+
+        def body_children():
+            for kind, element in events:
+                if kind == 'body-end':
+                    return
+                yield element
+
+        _, root = next(events)
+        # 根元素上已声明的命名空间，子元素序列化时不再重复声明
+        declared = [f' xmlns:{prefix}="{uri}"'.encode('utf-8') if prefix else
+                    f' xmlns="{uri}"'.encode('utf-8') for prefix, uri in root.nsmap.items()]
+
+        out.write(b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n")
+        root_open, root_close = self._tags(root, nsmap=root.nsmap)
+        out.write(root_open)
+        for kind, element in events:
+            if kind == 'root-child':
+                out.write(self._element_bytes(element, declared))
+            elif kind == 'body':
+                body_open, body_close = self._tags(element)
+                out.write(self._strip_declarations(body_open, declared))
+                for child in self._document_transform(body_children()):
+                    out.write(self._element_bytes(child, declared))
+                out.write(body_close)
+        out.write(root_close)
+
+    @staticmethod
+    def _tags(element, nsmap=None) -> tuple:
+        """元素（不含子元素）的开始和结束标签"""
+        shell = etree.Element(element.tag, dict(element.attrib), nsmap=nsmap or element.nsmap)
+        shell.text = 'x'
+        start, end = etree.tostring(shell, encoding='UTF-8').split(b'>x</', 1)
+        return start + b'>', b'</' + end
+
+    @classmethod
+    def _element_bytes(cls, element, declared: List[bytes]) -> bytes:
+        return cls._strip_declarations(etree.tostring(element, encoding='UTF-8', with_tail=False),
+                                       declared)
+
+    @staticmethod
+    def _strip_declarations(data: bytes, declared: List[bytes]) -> bytes:
+        """去掉开始标签中与根元素重复的命名空间声明（属性值中的 > 已被转义）"""
+        end = data.index(b'>')
+        tag = data[:end]
+        for declaration in declared:
+            tag = tag.replace(declaration, b'')
+        return tag + data[end:]
+
+    # ===== 保存 =====
+
+    def save(self, output: Union[str, BinaryIO]):
+        """
+        写出 docx
+
+        Args:
+            output: 文件路径或二进制流（不要求可随机访问）
+        """
+        if isinstance(output, str):
+            with open(output, 'wb') as f:
+                self._save(f)
+        else:
+            self._save(output)
+
+    def _save(self, out: BinaryIO):
+        writer = _ZipWriter(out)
+        written = set()
+        for info in self._infos:
+            name = info.filename
+            written.add(name)
+            if name == DOCUMENT_PART and self._document_transform is not None:
+                with writer.open(name) as entry:
+                    self._write_document(entry)
+            elif name in self._xml or name in self._parts:
+                writer.write(name, self.read(name))
+            else:
+                writer.copy_raw(info, self._raw_entry(info))
+
+        for name in self.names():
+            if name not in written:
+                writer.write(name, self.read(name))
+        writer.close()
+
+    def _raw_entry(self, info: zipfile.ZipInfo) -> bytes:
+        """读取条目压缩后的原始数据"""
+        self._source.seek(info.header_offset)
+        header = self._source.read(30)
+        if header[:4] != b'PK\x03\x04':
+            raise ValueError(f"docx 条目损坏: {info.filename}")
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        self._source.seek(info.header_offset + 30 + name_length + extra_length)
+        return self._source.read(info.compress_size)
+
+
+class _ZipWriter:
+    """
+    只追加写入的 ZIP 写入器
+
+    可以直接写入已压缩的原始数据；新条目使用数据描述符，输出流无需支持 seek。
+    不支持 ZIP64（单个条目和整个包均小于 4 GB）。
+    """
+
+    # 新条目的修改时间固定，使相同内容生成相同的文件
+    DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+    # 通用标志位：3 = 使用数据描述符，11 = 文件名为 UTF-8
+    FLAG_DATA_DESCRIPTOR = 0x08
+    FLAG_UTF8 = 0x800
+
+    def __init__(self, out: BinaryIO):
+        self._out = out
+        self._offset = 0
+        self._central: List[bytes] = []
+
+    def emit(self, data: bytes):
+        self._out.write(data)
+        self._offset += len(data)
+
+    def begin(self, name: str, flags: int, method: int, date_time,
+              crc: int = 0, compress_size: int = 0, file_size: int = 0) -> tuple:
+        """写出本地文件头，返回写中央目录项所需的信息"""
+        encoded = name.encode('utf-8')
+        year, month, day, hour, minute, second = date_time
+        dos_time = (hour << 11) | (minute << 5) | (second // 2)
+        dos_date = ((year - 1980) << 9) | (month << 5) | day
+        entry = (encoded, flags | self.FLAG_UTF8, method, dos_time, dos_date, self._offset)
+        self.emit(struct.pack('<4s5H3L2H', b'PK\x03\x04', 20, flags | self.FLAG_UTF8, method,
+                              dos_time, dos_date, crc, compress_size, file_size,
+                              len(encoded), 0) + encoded)
+        return entry
+
+    def end(self, entry: tuple, crc: int, compress_size: int, file_size: int):
+        """记录中央目录项"""
+        encoded, flags, method, dos_time, dos_date, offset = entry
+        if self._offset > 0xFFFFFFFF:
+            raise ValueError("docx 过大，不支持 ZIP64")
+        self._central.append(
+            struct.pack('<4s6H3L5H2L', b'PK\x01\x02', 20, 20, flags, method, dos_time, dos_date,
+                        crc, compress_size, file_size, len(encoded), 0, 0, 0, 0, 0, offset)
+            + encoded)
+
+    def copy_raw(self, info: zipfile.ZipInfo, raw: bytes):
+        """按原样写入已压缩的条目（CRC 和大小已知，直接写在文件头中）"""
+        flags = info.flag_bits & ~self.FLAG_DATA_DESCRIPTOR
+        entry = self.begin(info.filename, flags, info.compress_type, info.date_time,
+                           info.CRC, info.compress_size, info.file_size)
+        self.emit(raw)
+        self.end(entry, info.CRC, info.compress_size, info.file_size)
+
+    def write(self, name: str, data: bytes):
+        """压缩并写入新条目"""
+        with self.open(name) as entry:
+            entry.write(data)
+
+    def open(self, name: str) -> '_EntryStream':
+        """以流的方式写入新条目（DEFLATE 压缩）"""
+        return _EntryStream(self, name)
+
+    def close(self):
+        """写出中央目录"""
+        start = self._offset
+        for record in self._central:
+            self.emit(record)
+        count = len(self._central)
+        self.emit(struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, count, count,
+                              self._offset - start, start, 0))
+        self._out.flush()
+
+
+class _EntryStream:
+    """新条目的写入流，结束时写出数据描述符"""
+
+    def __init__(self, writer: _ZipWriter, name: str):
+        self._writer = writer
+        self._name = name
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        self._crc = 0
+        self._size = 0
+        self._compressed = 0
+        self._entry = None
+
+    def __enter__(self):
+        self._entry = self._writer.begin(self._name, _ZipWriter.FLAG_DATA_DESCRIPTOR,
+                                         zipfile.ZIP_DEFLATED, _ZipWriter.DATE_TIME)
+        return self
+
+    def write(self, data: bytes) -> int:
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._emit(self._compressor.compress(data))
+        return len(data)
+
+    def _emit(self, chunk: bytes):
+        if chunk:
+            self._compressed += len(chunk)
+            self._writer.emit(chunk)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            return False
+        self._emit(self._compressor.flush())
+        self._writer.emit(struct.pack('<4s3L', b'PK\x07\x08', self._crc, self._compressed,
+                                      self._size))
+        self._writer.end(self._entry, self._crc, self._compressed, self._size)
+        return False
@@ -0,0 +1,345 @@
+"""
+Pandoc 执行层
+优先复用常驻的 pandoc server 进程，避免每次转换都承担 pandoc 启动开销；
+server 不可用（pandoc < 3.0、输出 PDF 等）时回退为一次性子进程。
+"""
+
+import atexit
+import base64
+import http.client
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+# 已启动的 server 地址通过环境变量传给批量转换的工作进程，所有进程共用一个 server；
+# 值为 off 时禁用 server 模式
+SERVER_ENV = "M2A_PANDOC_SERVER"
+SERVER_DISABLED = "off"
+
+
+class PandocRunner:
+    """Pandoc 执行器"""
+
+    # pandoc server 不支持的输出格式（需要调用外部引擎）
+    ONESHOT_FORMATS = {"pdf"}
+
+    # server 启动等待时间（秒）
+    STARTUP_TIMEOUT = 10.0
+
+    # 单次请求超时（秒）
+    REQUEST_TIMEOUT = 300
+
+    def __init__(self, executable: str = "pandoc", use_server: bool = True):
+        self.executable = executable
+        self.use_server = use_server
+        self._server_process: Optional[subprocess.Popen] = None
+        self._server_address: Optional[tuple] = None
+        self._server_failed = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # 文件路径 -> (修改时间, base64 内容)
+        self._encoded_files: Dict[str, tuple] = {}
+        self._version: Optional[str] = None
+
+    def run(self, input_file: str, output_file: str, from_format: str, to_format: str,
+            options: Optional[Dict[str, Any]] = None, resources: Optional[List[str]] = None):
+        """
+        转换文件
+
+        Args:
+            input_file: 输入文件路径
+            output_file: 输出文件路径
+            from_format: 输入格式（如 markdown+yaml_metadata_block）
+            to_format: 输出格式（如 docx、pdf）
+            options: 转换选项，支持 standalone、reference_doc、pdf_engine、variables、
+                     resource_path（相对路径资源的查找目录）
+            resources: 文档引用的本地资源（图片等），server 模式下随请求发送
+        """
+        with open(input_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+        self.convert_text(text, from_format, to_format, options, resources, output_file=output_file)
+
+    def convert_text(self, text: str, from_format: str, to_format: str,
+                     options: Optional[Dict[str, Any]] = None, resources: Optional[List[str]] = None,
+                     output_file: Optional[str] = None) -> bytes:
+        """
+        转换文本，输入经 stdin（或 server 请求体）传入，不落盘
+
+        Args:
+            text: 输入内容
+            from_format: 输入格式
+            to_format: 输出格式
+            options: 转换选项，同 run()
+            resources: 文档引用的本地资源
+            output_file: 指定时由 pandoc 直接写入该文件（PDF 无法输出到 stdout）
+
+        Returns:
+            输出内容；指定 output_file 时为空字节串
+        """
+        options = options or {}
+
+        if self._server_usable(to_format):
+            try:
+                output = self._run_server(text, from_format, to_format, options, resources)
+            except (OSError, http.client.HTTPException):
+                # server 意外退出或连接失败，本次回退为一次性进程
+                self._server_failed = True
+            else:
+                if output_file is None:
+                    return output
+                with open(output_file, 'wb') as f:
+                    f.write(output)
+                return b''
+
+        return self._run_oneshot(text, from_format, to_format, options, output_file)
+
+    def _server_usable(self, to_format: str) -> bool:
+        """判断本次转换能否走 server"""
+        if not self.use_server or self._server_failed:
+            return False
+        if to_format in self.ONESHOT_FORMATS:
+            return False
+        return self._ensure_server()
+
+    # ===== 一次性子进程模式 =====
+
+    def _build_args(self, from_format: str, to_format: str, options: Dict[str, Any]) -> List[str]:
+        """将转换选项转为 pandoc 命令行参数"""
+        args = ['--from', from_format, '--to', to_format]
+        if options.get('standalone', True):
+            args.append('--standalone')
+        if options.get('reference_doc'):
+            args.extend(['--reference-doc', options['reference_doc']])
+        if options.get('pdf_engine'):
+            args.extend(['--pdf-engine', options['pdf_engine']])
+        if options.get('resource_path'):
+            args.extend(['--resource-path', options['resource_path']])
+        for key, value in options.get('variables', {}).items():
+            args.extend(['-V', f'{key}={value}'])
+        return args
+
+    def _run_oneshot(self, text: str, from_format: str, to_format: str,
+                     options: Dict[str, Any], output_file: Optional[str] = None) -> bytes:
+        """启动一次性 pandoc 进程完成转换，通过 stdin/stdout 传递内容"""
+        cmd = [self.executable, '-o', output_file or '-']
+        cmd.extend(self._build_args(from_format, to_format, options))
+        try:
+            result = subprocess.run(cmd, input=text.encode('utf-8'), check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            error_msg = e.stderr.decode('utf-8', 'replace') if e.stderr else "未知错误"
+            raise RuntimeError(f"Pandoc 转换失败: {error_msg}")
+        except FileNotFoundError:
+            raise RuntimeError("未找到 pandoc，请先安装: https://pandoc.org/installing.html")
+        return b'' if output_file else result.stdout
+
+    def default_data_file(self, name: str) -> bytes:
+        """
+        读取 pandoc 内置的数据文件（如 reference.docx）
+
+        Args:
+            name: 数据文件名
+
+        Returns:
+            文件内容
+        """
+        try:
+            result = subprocess.run([self.executable, '-o', '-', '--print-default-data-file', name],
+                                    check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            error_msg = e.stderr.decode('utf-8', 'replace') if e.stderr else "未知错误"
+            raise RuntimeError(f"读取 pandoc 数据文件失败: {error_msg}")
+        except FileNotFoundError:
+            raise RuntimeError("未找到 pandoc，请先安装: https://pandoc.org/installing.html")
+        return result.stdout
+
+    def version(self) -> str:
+        """pandoc 版本（pandoc --version 的第一行，如 pandoc 3.1.9）"""
+        if self._version is None:
+            try:
+                result = subprocess.run([self.executable, '--version'],
+                                        check=True, capture_output=True)
+            except subprocess.CalledProcessError as e:
+                error_msg = e.stderr.decode('utf-8', 'replace') if e.stderr else "未知错误"
+                raise RuntimeError(f"读取 pandoc 版本失败: {error_msg}")
+            except FileNotFoundError:
+                raise RuntimeError("未找到 pandoc，请先安装: https://pandoc.org/installing.html")
+            self._version = result.stdout.decode('utf-8', 'replace').split('\n', 1)[0].strip()
+        return self._version
+
+    # ===== 常驻 server 模式 =====
+
+    def _ensure_server(self) -> bool:
+        """确保 pandoc server 可用，必要时启动"""
+        if self._server_address is not None and (
+                self._server_process is None or self._server_process.poll() is None):
+            return True
+
+        with self._lock:
+            if self._server_failed:
+                return False
+            if self._server_address is not None and (
+                    self._server_process is None or self._server_process.poll() is None):
+                return True
+
+            # 复用父进程已启动的 server
+            shared = os.environ.get(SERVER_ENV)
+            if shared and shared != SERVER_DISABLED:
+                host, port = shared.rsplit(':', 1)
+                self._server_address = (host, int(port))
+                return True
+
+            try:
+                self._start_server()
+            except (OSError, RuntimeError):
+                self._server_failed = True
+                return False
+            return True
+
+    def _start_server(self):
+        """启动 pandoc server 并等待就绪"""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        process = subprocess.Popen(
+            [self.executable, 'server', '--port', str(port), '--timeout', str(self.REQUEST_TIMEOUT)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + self.STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("pandoc server 启动失败（需要 pandoc 3.0 以上版本）")
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+                conn.request('GET', '/version')
+                if conn.getresponse().status == 200:
+                    conn.close()
+                    break
+            except OSError:
+                time.sleep(0.05)
+        else:
+            process.terminate()
+            raise RuntimeError("pandoc server 启动超时")
+
+        self._server_process = process
+        self._server_address = ('127.0.0.1', port)
+        atexit.register(self.shutdown)
+
+    def _connection(self) -> http.client.HTTPConnection:
+        """获取当前线程的 keep-alive 连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'address', None) != self._server_address:
+            host, port = self._server_address
+            conn = http.client.HTTPConnection(host, port, timeout=self.REQUEST_TIMEOUT)
+            self._local.conn = conn
+            self._local.address = self._server_address
+        return conn
+
+    def _build_request(self, text: str, from_format: str, to_format: str,
+                       options: Dict[str, Any], resources: Optional[List[str]]) -> Dict[str, Any]:
+        """构建 server 请求体"""
+        # 文件按文档中的写法作为键，内容从 resource_path 下读取
+        files = {}
+        for path in resources or []:
+            source = os.path.join(options.get('resource_path') or '', path)
+            if os.path.isfile(source):
+                with open(source, 'rb') as f:
+                    files[path] = base64.b64encode(f.read()).decode('ascii')
+
+        request = {
+            'text': text,
+            'from': from_format,
+            'to': to_format,
+            'standalone': options.get('standalone', True),
+        }
+        if options.get('reference_doc'):
+            reference_doc = options['reference_doc']
+            files[reference_doc] = self._encoded_file(reference_doc)
+            request['reference-doc'] = reference_doc
+        if options.get('variables'):
+            request['variables'] = dict(options['variables'])
+        if files:
+            request['files'] = files
+        return request
+
+    def _encoded_file(self, path: str) -> str:
+        """base64 编码的文件内容，按修改时间缓存（reference.docx 每次请求都要发送）"""
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._encoded_files.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'rb') as f:
+            encoded = base64.b64encode(f.read()).decode('ascii')
+        self._encoded_files[path] = (mtime, encoded)
+        return encoded
+
+    def _run_server(self, text: str, from_format: str, to_format: str,
+                    options: Dict[str, Any], resources: Optional[List[str]]) -> bytes:
+        """通过 server 转换，返回输出内容"""
+        body = json.dumps(self._build_request(text, from_format, to_format, options, resources))
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+
+        conn = self._connection()
+        try:
+            conn.request('POST', '/', body=body.encode('utf-8'), headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+        if response.status != 200:
+            raise RuntimeError(f"Pandoc 转换失败: {payload.decode('utf-8', 'replace')}")
+
+        result = json.loads(payload)
+        if result.get('error'):
+            raise RuntimeError(f"Pandoc 转换失败: {result['error']}")
+        output = result.get('output', '')
+        if result.get('base64'):
+            return base64.b64decode(output)
+        return output.encode('utf-8')
+
+    def export_server_env(self) -> bool:
+        """
+        启动 server 并写入环境变量，供之后创建的子进程共用
+
+        Returns:
+            server 是否可用
+        """
+        if not self.use_server or not self._ensure_server():
+            os.environ[SERVER_ENV] = SERVER_DISABLED
+            return False
+        host, port = self._server_address
+        os.environ[SERVER_ENV] = f'{host}:{port}'
+        return True
+
+    def shutdown(self):
+        """关闭本进程启动的 server"""
+        if self._server_process is not None and self._server_process.poll() is None:
+            self._server_process.terminate()
+            try:
+                self._server_process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._server_process.kill()
+        self._server_process = None
+        self._server_address = None
+
+
+# 全局实例
+_pandoc_runner = None
+
+
+def get_pandoc_runner() -> PandocRunner:
+    """获取全局 PandocRunner 实例"""
+    global _pandoc_runner
+    if _pandoc_runner is None:
+        _pandoc_runner = PandocRunner(use_server=os.environ.get(SERVER_ENV) != SERVER_DISABLED)
+    return _pandoc_runner
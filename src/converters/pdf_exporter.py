@@ -0,0 +1,81 @@
+"""
+PDF 导出器 - 基于 xelatex
+默认由 LatexExporter 生成 LaTeX 源码，再交给 LatexBuilder 增量编译；
+也可以使用 Pandoc 直接生成（每次从头编译）。
+"""
+
+from typing import Optional
+
+from src.converters.image_assets import ImageAssets
+from src.converters.latex_builder import LatexBuilder
+from src.converters.latex_exporter import LatexExporter
+from src.converters.pandoc_runner import get_pandoc_runner
+from src.utils.config import Config
+
+
+class PdfExporter:
+    """PDF 导出器"""
+
+    MODES = ("latex", "pandoc")
+
+    def __init__(self, mode: Optional[str] = None):
+        """
+        Args:
+            mode: 构建方式，latex（LaTeX 导出 + 增量编译）或 pandoc，
+                  默认读取配置项 pdf_mode
+        """
+        if mode is None:
+            mode = Config().get('pdf_mode', 'latex')
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的 PDF 构建方式: {mode}")
+        self.mode = mode
+        self._latex_exporter: Optional[LatexExporter] = None
+        self._builder: Optional[LatexBuilder] = None
+
+    def export(self, md_content: str, output_file: str, template: str = "thesis",
+               base_dir: Optional[str] = None):
+        """
+        导出 Markdown 为 PDF 文件
+
+        Args:
+            md_content: Markdown 内容
+            output_file: 输出 PDF 文件路径
+            template: 模板名称
+            base_dir: 图片等相对路径的基准目录，默认为当前目录
+        """
+        try:
+            if self.mode == "latex":
+                self._export_latex(md_content, output_file, template, base_dir)
+            else:
+                self._export_pandoc(md_content, output_file)
+        except RuntimeError as e:
+            raise RuntimeError(f"PDF 导出失败: {e}")
+
+    def _export_latex(self, md_content: str, output_file: str, template: str,
+                      base_dir: Optional[str]):
+        """按模板生成 LaTeX，在文档固定的构建目录中编译"""
+        if self._builder is None:
+            # 编译时插图按排版尺寸缩小，大幅减小 PDF 体积和 xelatex 读取图片的时间
+            optimize = Config().get('optimize_images', True)
+            self._latex_exporter = LatexExporter(ImageAssets() if optimize else None)
+            self._builder = LatexBuilder()
+        latex = self._latex_exporter.to_latex(md_content, template, base_dir=base_dir)
+        self._builder.build(latex, output_file, base_dir)
+
+    def _export_pandoc(self, md_content: str, output_file: str):
+        """使用 Pandoc 直接生成 PDF"""
+        # 需调用 xelatex，始终走一次性进程
+        get_pandoc_runner().convert_text(
+            md_content,
+            from_format='markdown+yaml_metadata_block',
+            to_format='pdf',
+            options={
+                'pdf_engine': 'xelatex',  # 使用 xelatex 支持中文
+                'standalone': False,
+                'variables': {
+                    'CJKmainfont': 'PingFang SC',  # macOS 中文字体
+                    'geometry': 'margin=2.5cm',
+                },
+            },
+            output_file=output_file,
+        )
@@ -0,0 +1,300 @@
+"""
+多文件论文项目构建
+项目清单（YAML）列出各章 Markdown 文件，构建时按章记录内容哈希，
+只重新转换修改过的章节（Word 片段或 LaTeX \\include 文件），再拼接为完整文档。
+
+清单示例（thesis.yaml）:
+
+    template: thesis
+    title: 论文标题
+    author: 作者
+    output: build/thesis.docx
+    chapters:
+      - chapters/ch1.md
+      - chapters/ch2.md
+
+除 template / chapters / output 外的键作为元数据（与 Markdown 的 YAML 元数据相同）。
+章节中的相对路径以清单所在目录为基准。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from src.converters.document_exporter import DocumentExporter
+from src.converters.latex_builder import LatexBuilder
+from src.converters.latex_exporter import LatexExporter
+from src.converters.markdown_to_docx import MarkdownToDocxConverter, convert_fragments
+from src.parsers.extended_markdown import parse, referenced_files
+from src.templates.registry import DEFAULT_TEMPLATE, get_template_registry
+from src.utils.cache import ConversionCache
+from src.utils.config import Config
+
+
+# 清单中不属于元数据的键
+MANIFEST_KEYS = ("template", "chapters", "output")
+
+
+@dataclass(frozen=True)
+class ProjectManifest:
+    """项目清单"""
+    path: str
+    template: str
+    chapters: Tuple[str, ...]
+    output: Optional[str] = None
+    metadata: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def base_dir(self) -> str:
+        """清单所在目录，章节和相对路径的基准"""
+        return os.path.dirname(self.path)
+
+
+def load_manifest(path: str) -> ProjectManifest:
+    """
+    读取项目清单
+
+    Args:
+        path: YAML 文件路径
+
+    Returns:
+        ProjectManifest，章节和输出路径已转换为绝对路径
+    """
+    path = os.path.abspath(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"项目清单格式错误: {path}")
+
+    base_dir = os.path.dirname(path)
+    chapters = data.get('chapters') or []
+    if not isinstance(chapters, list) or not chapters:
+        raise ValueError(f"项目清单中没有 chapters: {path}")
+
+    output = data.get('output')
+    return ProjectManifest(
+        path=path,
+        template=str(data.get('template', DEFAULT_TEMPLATE)),
+        chapters=tuple(os.path.normpath(os.path.join(base_dir, str(chapter)))
+                       for chapter in chapters),
+        output=os.path.normpath(os.path.join(base_dir, str(output))) if output else None,
+        metadata={str(key): str(value) for key, value in data.items()
+                  if key not in MANIFEST_KEYS and value is not None},
+    )
+
+
+class ProjectResult:
+    """项目构建结果"""
+
+    def __init__(self, output_file: str, rebuilt: List[str], reused: List[str]):
+        self.output_file = output_file
+        # 重新转换的章节和直接复用的章节
+        self.rebuilt = rebuilt
+        self.reused = reused
+
+
+class ProjectBuilder:
+    """多文件项目的增量构建器"""
+
+    PROJECTS_DIR = "projects"
+    STATE_FILE = "state.json"
+
+    # LaTeX 章节文件所在的子目录，主文档中以 \include{chapters/ch01} 引用
+    LATEX_CHAPTER_DIR = "chapters"
+
+    def __init__(self, manifest: ProjectManifest, build_dir: Optional[str] = None,
+                 workers: Optional[int] = None):
+        """
+        Args:
+            manifest: 项目清单
+            build_dir: 章节片段的保存目录，默认为 ~/.markdown2academia/projects/<清单路径摘要>
+            workers: 并行转换章节的进程数，默认等于 CPU 核数
+        """
+        if build_dir is None:
+            digest = hashlib.sha256(manifest.path.encode('utf-8')).hexdigest()[:16]
+            build_dir = Config().config_path.parent / self.PROJECTS_DIR / digest
+        self.manifest = manifest
+        self.build_dir = Path(build_dir)
+        self.workers = workers
+        # 只用于计算与转换缓存相同的内容哈希（Markdown、引用的文件、模板和版本）
+        self.cache = ConversionCache()
+
+    def default_output(self, output_format: str) -> str:
+        """清单未指定输出路径时，输出到清单旁的同名文件"""
+        extension = DocumentExporter.EXTENSIONS[output_format]
+        if self.manifest.output:
+            return os.path.splitext(self.manifest.output)[0] + extension
+        return os.path.splitext(self.manifest.path)[0] + extension
+
+    def build(self, output_format: str = "docx", output_file: Optional[str] = None,
+              force: bool = False,
+              on_chapter: Optional[Callable[[str, bool], None]] = None) -> ProjectResult:
+        """
+        构建项目
+
+        Args:
+            output_format: 输出格式 (docx/latex/pdf)
+            output_file: 输出文件路径，默认见 default_output
+            force: 忽略记录的哈希，重新转换所有章节
+            on_chapter: 每章处理完成时的回调，参数为章节路径和是否重新转换
+
+        Returns:
+            ProjectResult
+        """
+        if output_format not in DocumentExporter.EXTENSIONS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        output_file = os.path.abspath(output_file or self.default_output(output_format))
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+        # 章节按 docx 或 LaTeX 片段缓存，PDF 与 LaTeX 共用片段
+        kind = "docx" if output_format == "docx" else "latex"
+        fragment_dir = self.build_dir / kind
+        fragment_dir.mkdir(parents=True, exist_ok=True)
+
+        state = self._load_state()
+        hashes: Dict[str, str] = {} if force else state.get(kind, {})
+        fragments = []
+        rebuilt, reused = [], []
+
+        # 章节中 #figure / #table 的相对路径以清单所在目录为基准
+        base_dir = self.manifest.base_dir
+
+        # 找出内容变化的章节
+        pending = []
+        for index, chapter in enumerate(self.manifest.chapters, 1):
+            name = f"ch{index:02d}"
+            fragment = fragment_dir / (name + ('.docx' if kind == "docx" else '.tex'))
+            fragments.append(fragment)
+
+            with open(chapter, 'r', encoding='utf-8') as f:
+                md_content = f.read()
+            key = self._chapter_key(md_content, kind)
+            if hashes.get(name) != key or not fragment.exists():
+                pending.append((chapter, fragment, md_content, key))
+            else:
+                reused.append(chapter)
+                if on_chapter:
+                    on_chapter(chapter, False)
+
+        # Word 片段由多个进程并行转换，LaTeX 片段直接转换
+        sources = [md_content for _, _, md_content, _ in pending]
+        if kind == "docx":
+            results = convert_fragments(sources, self.manifest.template, self.workers,
+                                        base_dir=base_dir)
+        else:
+            exporter = LatexExporter()
+            results = [exporter.convert_body(source, self.manifest.template, base_dir).encode('utf-8')
+                       for source in sources]
+
+        for (chapter, fragment, _, key), data in zip(pending, results):
+            self._write_atomic(fragment, data)
+            hashes[fragment.stem] = key
+            rebuilt.append(chapter)
+            if on_chapter:
+                on_chapter(chapter, True)
+
+        # 删除多出的章节记录（清单中减少了章节时）
+        for name in list(hashes):
+            if name not in {fragment.stem for fragment in fragments}:
+                del hashes[name]
+        state[kind] = hashes
+        self._save_state(state)
+
+        if output_format == "docx":
+            self._assemble_docx(fragments, output_file)
+        elif output_format == "latex":
+            self._assemble_latex(fragments, output_file)
+        else:
+            self._assemble_pdf(fragments, output_file)
+
+        return ProjectResult(output_file, rebuilt, reused)
+
+    def _chapter_key(self, md_content: str, kind: str) -> str:
+        """章节内容、引用的文件和模板的哈希"""
+        template = self.manifest.template
+        assets = referenced_files(parse(md_content))
+        assets.append(get_template_registry().path_for(template))
+        return self.cache.make_key(md_content, kind, template, assets, self.manifest.base_dir)
+
+    def _assemble_docx(self, fragments: List[Path], output_file: str):
+        """拼接 Word 片段并添加封面和页眉页脚"""
+        doc = MarkdownToDocxConverter().merge_fragments([str(fragment) for fragment in fragments],
+                                        self.manifest.template, self.manifest.metadata)
+        doc.save(output_file)
+
+    def _main_latex(self, fragments: List[Path], output_dir: Optional[str] = None) -> str:
+        """
+        以 \\include 引用各章的主文档
+
+        Args:
+            fragments: 章节文件
+            output_dir: 主文档所在目录；指定时用 \\graphicspath 指向清单所在目录，
+                        使章节中相对清单目录的图片路径在输出目录中编译时仍能找到
+        """
+        lines = []
+        if output_dir is not None:
+            lines.append(f'\\graphicspath{{{{{self._graphics_dir(output_dir)}}}}}')
+        lines.extend(f'\\include{{{self.LATEX_CHAPTER_DIR}/{fragment.stem}}}'
+                     for fragment in fragments)
+        return LatexExporter().wrap('\n'.join(lines), self.manifest.template, self.manifest.metadata)
+
+    def _graphics_dir(self, output_dir: str) -> str:
+        """清单所在目录相对输出目录的路径（以 / 结尾，不在同一驱动器时为绝对路径）"""
+        try:
+            path = os.path.relpath(self.manifest.base_dir, output_dir)
+        except ValueError:
+            path = self.manifest.base_dir
+        return Path(path).as_posix().rstrip('/') + '/'
+
+    def _assemble_latex(self, fragments: List[Path], output_file: str):
+        """输出主文档，章节文件写入输出目录的 chapters 子目录（内容不变的文件不改写）"""
+        chapter_dir = Path(os.path.dirname(output_file)) / self.LATEX_CHAPTER_DIR
+        chapter_dir.mkdir(exist_ok=True)
+        for fragment in fragments:
+            data = fragment.read_bytes()
+            target = chapter_dir / fragment.name
+            if not target.exists() or target.read_bytes() != data:
+                self._write_atomic(target, data)
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(self._main_latex(fragments, os.path.dirname(output_file)))
+
+    def _assemble_pdf(self, fragments: List[Path], output_file: str):
+        """在固定的构建目录中编译，各章的 .aux 在两次构建之间保留"""
+        files = {f'{self.LATEX_CHAPTER_DIR}/{fragment.name}': fragment.read_text(encoding='utf-8')
+                 for fragment in fragments}
+        try:
+            LatexBuilder().build(self._main_latex(fragments), output_file,
+                                 self.manifest.base_dir, files=files)
+        except RuntimeError as e:
+            raise RuntimeError(f"PDF 导出失败: {e}")
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.build_dir / self.STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict[str, Any]):
+        self._write_atomic(self.build_dir / self.STATE_FILE,
+                           json.dumps(state, indent=2).encode('utf-8'))
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        """先写临时文件再原子替换"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
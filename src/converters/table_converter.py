@@ -3,120 +3,691 @@
 """
 
 import csv
+import datetime
+import itertools
+import os
+import random
 import re
-from typing import List, Optional
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
 from pathlib import Path
 
+from src.utils.config import Config
+
+
+_LATEX_SPECIAL_CHARS = {
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\textasciicircum{}',
+    '\\': r'\textbackslash{}',
+}
+_LATEX_SPECIAL_RE = re.compile('|'.join(re.escape(char) for char in _LATEX_SPECIAL_CHARS))
+
+# #table 可直接引用的数据文件
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+TABLE_EXTENSIONS = ('.csv',) + EXCEL_EXTENSIONS
+
+# #table 未指定 max_rows / sample 时最多保留的数据行数，可通过配置项 table_max_rows 修改（0 为不限制）。
+# 表格内容要嵌入整篇文档交给 pandoc / xelatex，行数有上限才能使内存占用与数据文件大小无关
+DEFAULT_TABLE_MAX_ROWS = 10000
+
+
+def is_table_file(path: str) -> bool:
+    """是否为 #table 支持的数据文件"""
+    return path.lower().endswith(TABLE_EXTENSIONS)
+
+
+def table_options(options: Dict[str, str]) -> Dict[str, Any]:
+    """
+    从 #table 指令选项中取出行数限制和数值格式
+
+    Args:
+        options: 指令选项，如 {"max_rows": "1000", "decimals": "2", "bold_best": "min"}
+
+    Returns:
+        sheet、cell_range、max_rows、sample、decimals、thousands、bold_best，
+        未设置或无效时为 None / False；max_rows 和 sample 都未设置时 max_rows 取默认上限
+    """
+    # Excel 工作表和单元格区域，如 sheet=Results range=A1:F200
+    result: Dict[str, Any] = {'sheet': options.get('sheet') or None,
+                              'cell_range': options.get('range') or None}
+    for key in ('max_rows', 'sample'):
+        value = options.get(key, '')
+        result[key] = int(value) if value.isdigit() and int(value) > 0 else None
+    if result['max_rows'] is None and result['sample'] is None:
+        limit = int(Config().get('table_max_rows', DEFAULT_TABLE_MAX_ROWS))
+        result['max_rows'] = limit if limit > 0 else None
+
+    decimals = options.get('decimals', '')
+    result['decimals'] = int(decimals) if decimals.isdigit() else None
+    result['thousands'] = options.get('thousands') == 'true'
+
+    # bold_best 不带值时加粗每列最大值，bold_best=min 时加粗最小值
+    bold_best = options.get('bold_best')
+    result['bold_best'] = {'true': 'max', 'max': 'max', 'min': 'min'}.get(bold_best)
+    return result
+
+
+def iter_csv_rows(csv_path: str, max_rows: Optional[int] = None,
+                  sample: Optional[int] = None) -> Iterator[List[str]]:
+    """
+    逐行读取 CSV，不把整个文件载入内存
+
+    Args:
+        csv_path: CSV 文件路径
+        max_rows: 最多输出的数据行数（不含第一行）
+        sample: 从全部数据行中均匀抽样的行数，保持原有顺序
+
+    Yields:
+        第一行以及筛选后的数据行
+    """
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        yield from _limit_rows(csv.reader(f), max_rows, sample)
+
+
+def iter_excel_rows(excel_path: str, sheet: Optional[str] = None,
+                    cell_range: Optional[str] = None, max_rows: Optional[int] = None,
+                    sample: Optional[int] = None) -> Iterator[List[str]]:
+    """
+    读取 Excel 工作表中的行
+
+    Args:
+        excel_path: .xlsx / .xlsm 文件路径
+        sheet: 工作表名称，为空时使用活动工作表
+        cell_range: 单元格区域，如 A1:F200、B:D 或 3:10，为空时使用整个工作表
+        max_rows: 最多输出的数据行数（不含第一行）
+        sample: 从全部数据行中均匀抽样的行数，保持原有顺序
+
+    Yields:
+        区域内的第一行以及筛选后的数据行（跳过整行为空的行）
+    """
+    rows: Iterable[Tuple[str, ...]] = load_excel_sheet(excel_path, sheet)
+
+    if cell_range:
+        try:
+            from openpyxl.utils.cell import range_boundaries
+        except ImportError:
+            raise ImportError("请先安装 openpyxl: pip install openpyxl")
+        min_col, min_row, max_col, max_row = range_boundaries(cell_range.upper())
+        first_col = (min_col or 1) - 1
+        rows = (row[first_col:max_col] for row in
+                itertools.islice(rows, (min_row or 1) - 1, max_row))
 
-class TableConverter:
-    """表格转换器"""
+    yield from _limit_rows((list(row) for row in rows if any(row)), max_rows, sample)
+
+
+def iter_table_rows(path: str, sheet: Optional[str] = None, cell_range: Optional[str] = None,
+                    max_rows: Optional[int] = None,
+                    sample: Optional[int] = None) -> Iterator[List[str]]:
+    """按扩展名读取 CSV 或 Excel 数据文件，参数含义同 iter_excel_rows（CSV 忽略工作表和区域）"""
+    if path.lower().endswith(EXCEL_EXTENSIONS):
+        return iter_excel_rows(path, sheet, cell_range, max_rows, sample)
+    return iter_csv_rows(path, max_rows, sample)
+
+
+def _limit_rows(rows: Iterable[List[str]], max_rows: Optional[int],
+                sample: Optional[int]) -> Iterator[List[str]]:
+    """保留第一行，对其余行按 sample / max_rows 筛选"""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    yield first
+
+    if sample is not None:
+        rows = iter(_reservoir_sample(rows, sample))
+    if max_rows is not None:
+        rows = itertools.islice(rows, max_rows)
+    yield from rows
+
+
+class ExcelSheetCache:
+    """
+    已解析工作表的内存缓存
+
+    以 (文件, 工作表) 为键，文件修改时间或大小变化后重新解析；
+    同一文档多次引用同一个工作簿时只解析一次。
+    """
+
+    def __init__(self, max_sheets: int = 8):
+        """
+        Args:
+            max_sheets: 最多缓存的工作表数，超出时淘汰最久未使用的
+        """
+        self.max_sheets = max_sheets
+        # (绝对路径, 工作表) -> ((修改时间, 大小), 各行单元格文本)
+        self._sheets: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, excel_path: str, sheet: Optional[str] = None) -> List[Tuple[str, ...]]:
+        """
+        获取工作表的全部行
+
+        Args:
+            excel_path: Excel 文件路径
+            sheet: 工作表名称，为空时使用活动工作表
+
+        Returns:
+            各行单元格文本，行号与工作表一致（包括空行）
+        """
+        path = os.path.abspath(excel_path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (path, sheet)
+
+        with self._lock:
+            cached = self._sheets.get(key)
+            if cached and cached[0] == version:
+                self._sheets.move_to_end(key)
+                return cached[1]
+
+            rows = self._read(path, sheet)
+            self._sheets[key] = (version, rows)
+            self._sheets.move_to_end(key)
+            while len(self._sheets) > self.max_sheets:
+                self._sheets.popitem(last=False)
+            return rows
 
     @staticmethod
-    def csv_to_latex(csv_path: str, caption: str = "", has_header: bool = True) -> str:
+    def _read(path: str, sheet: Optional[str]) -> List[Tuple[str, ...]]:
+        """以只读模式流式读取工作表，单元格取缓存的计算结果"""
+        try:
+            from openpyxl import load_workbook
+            from openpyxl.utils.exceptions import InvalidFileException
+        except ImportError:
+            raise ImportError("请先安装 openpyxl: pip install openpyxl")
+
+        try:
+            workbook = load_workbook(path, read_only=True, data_only=True)
+        except (InvalidFileException, zipfile.BadZipFile) as e:
+            raise ValueError(f"无法读取 Excel 文件 {path}: {e}")
+
+        try:
+            if sheet is None:
+                worksheet = workbook.active
+            elif sheet in workbook.sheetnames:
+                worksheet = workbook[sheet]
+            else:
+                raise ValueError(f"工作表不存在: {sheet}")
+            return [tuple(_cell_text(value) for value in row)
+                    for row in worksheet.iter_rows(values_only=True)]
+        finally:
+            # 只读模式会保持文件打开，需显式关闭
+            workbook.close()
+
+
+def _cell_text(value: Any) -> str:
+    """单元格值转为文本"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time():
+            return value.date().isoformat()
+        return value.isoformat(sep=' ')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+# 全局实例
+_excel_cache: Optional[ExcelSheetCache] = None
+
+
+def load_excel_sheet(excel_path: str, sheet: Optional[str] = None) -> List[Tuple[str, ...]]:
+    """读取工作表的全部行（带缓存）"""
+    global _excel_cache
+    if _excel_cache is None:
+        _excel_cache = ExcelSheetCache()
+    return _excel_cache.get(excel_path, sheet)
+
+
+def _reservoir_sample(rows: Iterable[List[str]], size: int) -> List[List[str]]:
+    """蓄水池抽样，内存只与样本数有关；固定随机种子使同一文件每次结果相同"""
+    rng = random.Random(0)
+    reservoir = []
+    for index, row in enumerate(rows):
+        if index < size:
+            reservoir.append((index, row))
+        else:
+            slot = rng.randint(0, index)
+            if slot < size:
+                reservoir[slot] = (index, row)
+    reservoir.sort(key=lambda item: item[0])
+    return [row for _, row in reservoir]
+
+
+def markdown_table_lines(rows: Iterable[List[str]], has_header: bool = True) -> Iterator[str]:
+    """
+    把行流转换为 Markdown 表格行
+
+    第一行总是作为表头；has_header 为 False 时第一行同时作为数据行输出。
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+
+    yield "| " + " | ".join(header) + " |"
+    yield "| " + " | ".join(["---"] * len(header)) + " |"
+    if not has_header:
+        yield "| " + " | ".join(header) + " |"
+    for row in rows:
+        yield "| " + " | ".join(row) + " |"
+
+
+def latex_table_lines(rows: Iterable[List[str]], caption: str = "",
+                      has_header: bool = True) -> Iterator[str]:
+    """把行流转换为 LaTeX table 环境的各行"""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+
+    yield "\\begin{table}[htbp]"
+    yield "\\centering"
+    if caption:
+        yield f"\\caption{{{caption}}}"
+    yield f"\\begin{{tabular}}{{{'|'.join(['c'] * len(first))}}}"
+    yield "\\hline"
+
+    yield " & ".join(TableConverter._escape_latex(cell) for cell in first) + " \\\\"
+    if has_header:
+        yield "\\hline"
+    for row in rows:
+        # 转义特殊字符
+        yield " & ".join(TableConverter._escape_latex(cell) for cell in row) + " \\\\"
+
+    yield "\\hline"
+    yield "\\end{tabular}"
+    yield "\\label{tab:" + TableConverter._to_label(caption) + "}"
+    yield "\\end{table}"
+
+
+def write_lines(lines: Iterable[str], output: TextIO):
+    """把生成的表格行逐行写入输出流"""
+    for line in lines:
+        output.write(line)
+        output.write("\n")
+
+
+class TableModel:
+    """
+    按列存储的表格模型（pandas）
+
+    每列的类型只推断一次：所有非空单元格都能解析为数字的列视为数值列。
+    数值列按整列向量化格式化（固定小数位、千位分隔符、加粗最优值），
+    并在 LaTeX 中使用 S / r 对齐、在 Markdown 中使用右对齐标记。
+    """
+
+    def __init__(self, header: List[str], frame):
         """
-        将 CSV 文件转换为 LaTeX 表格
+        Args:
+            header: 表头
+            frame: 各列为原始字符串的 DataFrame
+        """
+        import numpy as np
+        import pandas as pd
+
+        self.header = header
+        self.frame = frame
+        self.numeric: List[bool] = []
+        self.values = {}
+
+        for index in range(len(header)):
+            column = frame.iloc[:, index].fillna('').str.strip()
+            filled = column != ''
+            values = pd.to_numeric(column.str.replace(',', '', regex=False).where(filled),
+                                   errors='coerce')
+            is_numeric = bool(filled.any()) and not bool((values.isna() & filled).any())
+            self.numeric.append(is_numeric)
+            if is_numeric:
+                self.values[index] = values.to_numpy(dtype=np.float64)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[List[str]], has_header: bool = True) -> 'TableModel':
+        """
+        由行流构建
+
+        第一行总是作为表头；has_header 为 False 时第一行同时作为数据行。
+        """
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("请先安装 pandas: pip install pandas")
+
+        rows = iter(rows)
+        header = next(rows, None) or []
+        data = list(rows)
+        if not has_header:
+            data.insert(0, header)
+
+        width = len(header)
+        data = [(row + [''] * width)[:width] for row in data]
+        frame = pd.DataFrame(data, columns=range(width), dtype=object)
+        return cls(header, frame)
+
+    @classmethod
+    def from_csv(cls, csv_path: str, has_header: bool = True, max_rows: Optional[int] = None,
+                 sample: Optional[int] = None) -> 'TableModel':
+        """由 CSV 文件构建，max_rows / sample 含义同 iter_csv_rows"""
+        return cls.from_rows(iter_csv_rows(csv_path, max_rows, sample), has_header)
+
+    @classmethod
+    def from_file(cls, path: str, has_header: bool = True, sheet: Optional[str] = None,
+                  cell_range: Optional[str] = None, max_rows: Optional[int] = None,
+                  sample: Optional[int] = None) -> 'TableModel':
+        """由 CSV 或 Excel 文件构建，参数含义同 iter_table_rows"""
+        return cls.from_rows(iter_table_rows(path, sheet, cell_range, max_rows, sample), has_header)
+
+    def format_columns(self, markup: str, decimals: Optional[int] = None,
+                       thousands: bool = False, bold_best: Optional[str] = None) -> list:
+        """
+        按列格式化所有单元格
 
         Args:
-            csv_path: CSV 文件路径
-            caption: 表格标题
-            has_header: 是否有表头
+            markup: latex 或 markdown，决定转义和加粗方式
+            decimals: 数值列的小数位数，为空时保留原文
+            thousands: 数值列是否加千位分隔符
+            bold_best: max / min，加粗每个数值列的最大 / 最小值
 
         Returns:
-            LaTeX 表格代码
+            各列格式化后的字符串 Series
         """
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
+        import numpy as np
+        import pandas as pd
+
+        columns = []
+        for index in range(len(self.header)):
+            raw = self.frame.iloc[:, index].fillna('').str.strip()
+            if not self.numeric[index]:
+                if markup == 'latex':
+                    raw = raw.str.replace(_LATEX_SPECIAL_RE,
+                                          lambda m: _LATEX_SPECIAL_CHARS[m.group(0)], regex=True)
+                columns.append(raw)
+                continue
 
-        if not rows:
+            values = self.values[index]
+            missing = np.isnan(values)
+            places = decimals
+            if places is None and np.array_equal(values[~missing], np.round(values[~missing])):
+                places = 0
+            if places is not None:
+                text = _fixed_decimals(values, places, thousands)
+            else:
+                # 未指定小数位的小数列保留原文
+                text = raw.str.replace(',', '', regex=False)
+                if thousands:
+                    text = _group_thousands(text)
+            text = text.where(~missing, '')
+
+            if bold_best and not missing.all():
+                best = np.nanmax(values) if bold_best == 'max' else np.nanmin(values)
+                mask = pd.Series(values == best, index=text.index)
+                if markup == 'latex':
+                    text = text.where(~mask, '\\textbf{' + text + '}')
+                else:
+                    text = text.where(~mask, '**' + text + '**')
+            columns.append(text)
+        return columns
+
+    def _alignments(self, thousands: bool, bold_best: Optional[str]) -> List[str]:
+        """LaTeX 列格式：纯数字列用 siunitx 的 S 按小数点对齐，含分隔符或加粗时用 r"""
+        plain_numbers = not thousands and not bold_best
+        return [('S' if plain_numbers else 'r') if numeric else 'c' for numeric in self.numeric]
+
+    def to_latex(self, caption: str = "", has_header: bool = True, decimals: Optional[int] = None,
+                 thousands: bool = False, bold_best: Optional[str] = None) -> str:
+        """生成 LaTeX table 环境"""
+        if not self.header:
             return ""
 
-        num_cols = len(rows[0])
+        alignments = self._alignments(thousands, bold_best)
+        header = []
+        for cell, alignment in zip(self.header, alignments):
+            cell = TableConverter._escape_latex(cell)
+            # S 列中的非数字内容需用花括号包裹
+            header.append('{' + cell + '}' if alignment == 'S' else cell)
 
-        # 构建 LaTeX 代码
-        lines = []
-        lines.append("\\begin{table}[htbp]")
-        lines.append("\\centering")
+        lines = ["\\begin{table}[htbp]", "\\centering"]
         if caption:
             lines.append(f"\\caption{{{caption}}}")
-        lines.append(f"\\begin{{tabular}}{{{'|'.join(['c'] * num_cols)}}}")
+        lines.append(f"\\begin{{tabular}}{{{'|'.join(alignments)}}}")
         lines.append("\\hline")
-
-        for i, row in enumerate(rows):
-            # 转义特殊字符
-            escaped_row = [TableConverter._escape_latex(cell) for cell in row]
-            lines.append(" & ".join(escaped_row) + " \\\\")
-
-            if has_header and i == 0:
-                lines.append("\\hline")
-
+        lines.append(" & ".join(header) + " \\\\")
+        if has_header:
+            lines.append("\\hline")
+        lines.extend(_join_columns(self.format_columns('latex', decimals, thousands, bold_best),
+                                   '', ' & ', ' \\\\'))
         lines.append("\\hline")
         lines.append("\\end{tabular}")
         lines.append("\\label{tab:" + TableConverter._to_label(caption) + "}")
         lines.append("\\end{table}")
+        return "\n".join(lines)
+
+    def to_markdown(self, has_header: bool = True, decimals: Optional[int] = None,
+                    thousands: bool = False, bold_best: Optional[str] = None) -> str:
+        """生成 Markdown 表格，数值列右对齐"""
+        if not self.header:
+            return ""
 
+        lines = ["| " + " | ".join(self.header) + " |",
+                 "| " + " | ".join('---:' if numeric else '---' for numeric in self.numeric) + " |"]
+        lines.extend(_join_columns(self.format_columns('markdown', decimals, thousands, bold_best),
+                                   '| ', ' | ', ' |'))
         return "\n".join(lines)
 
+
+# 按整数运算格式化的数值上限（乘以 10^decimals 后须能放入 int64）
+_FIXED_LIMIT = 9e18
+
+
+def _fixed_decimals(values, decimals: int, thousands: bool = False):
+    """
+    按固定小数位整列格式化（整数运算，避免逐个单元格调用 format）
+
+    inf、nan 和乘以 10^decimals 后超出 int64 的值逐个按文本格式化。
+    """
+    import numpy as np
+    import pandas as pd
+
+    scale = 10 ** decimals
+    with np.errstate(invalid='ignore', over='ignore'):
+        in_range = np.isfinite(values) & (np.abs(values) * scale < _FIXED_LIMIT)
+    finite = np.where(in_range, values, 0.0)
+    scaled = np.round(np.abs(finite) * scale).astype(np.int64)
+    whole = scaled // scale
+    sign = pd.Series(np.where((finite < 0) & (scaled > 0), '-', ''))
+
+    # 按三位一组拼接整数部分，整列同时处理
+    integer = pd.Series(whole).astype(str)
+    if thousands:
+        levels = 1
+        while (whole >= 1000 ** levels).any():
+            levels += 1
+        integer = pd.Series([''] * len(whole), dtype=object)
+        for level in reversed(range(levels)):
+            group = pd.Series(whole // 1000 ** level % 1000).astype(str)
+            lower = whole >= 1000 ** (level + 1)
+            present = (whole >= 1000 ** level) | (level == 0)
+            integer = integer + np.where(lower, ',' + group.str.zfill(3),
+                                         np.where(present, group, ''))
+
+    if decimals == 0:
+        text = sign + integer
+    else:
+        fraction = pd.Series(scaled % scale).astype(str).str.zfill(decimals)
+        text = sign + integer + '.' + fraction
+
+    if not in_range.all():
+        others = pd.Series([np.format_float_positional(value, precision=decimals, unique=False,
+                                                       trim='-' if decimals == 0 else 'k')
+                            for value in values[~in_range]], dtype=object)
+        if thousands:
+            others = _group_thousands(others)
+        text = text.to_numpy(dtype=object)
+        text[~in_range] = others.to_numpy()
+        text = pd.Series(text)
+    return text
+
+
+def _group_thousands(text):
+    """在整数部分插入千位分隔符"""
+    parts = text.str.partition('.')
+    integer = parts[0].str.replace(r'(\d)(?=(\d{3})+$)', r'\1,', regex=True)
+    return integer + parts[1] + parts[2]
+
+
+def _join_columns(columns: list, prefix: str, separator: str, suffix: str) -> List[str]:
+    """把各列拼接成行（按列做字符串加法）"""
+    if not columns:
+        return []
+    joined = prefix + columns[0].reset_index(drop=True)
+    for column in columns[1:]:
+        joined = joined + separator + column.reset_index(drop=True)
+    return (joined + suffix).tolist()
+
+
+class TableConverter:
+    """表格转换器"""
+
     @staticmethod
-    def csv_to_markdown(csv_path: str, has_header: bool = True) -> str:
+    def csv_to_latex(csv_path: str, caption: str = "", has_header: bool = True,
+                     max_rows: Optional[int] = None, sample: Optional[int] = None,
+                     decimals: Optional[int] = None, thousands: bool = False,
+                     bold_best: Optional[str] = None) -> str:
+        """
+        将 CSV 文件转换为 LaTeX 表格
+
+        Args:
+            csv_path: CSV 文件路径
+            caption: 表格标题
+            has_header: 是否有表头
+            max_rows: 最多保留的数据行数
+            sample: 均匀抽样的数据行数
+            decimals: 数值列小数位数
+            thousands: 数值列是否加千位分隔符
+            bold_best: max / min，加粗每个数值列的最优值
+
+        Returns:
+            LaTeX 表格代码
+        """
+        return TableConverter.table_to_latex(csv_path, caption, has_header, max_rows=max_rows,
+                                             sample=sample, decimals=decimals,
+                                             thousands=thousands, bold_best=bold_best)
+
+    @staticmethod
+    def csv_to_markdown(csv_path: str, has_header: bool = True,
+                        max_rows: Optional[int] = None, sample: Optional[int] = None,
+                        decimals: Optional[int] = None, thousands: bool = False,
+                        bold_best: Optional[str] = None) -> str:
         """
         将 CSV 文件转换为 Markdown 表格
 
         Args:
             csv_path: CSV 文件路径
             has_header: 是否有表头
+            max_rows: 最多保留的数据行数
+            sample: 均匀抽样的数据行数
+            decimals: 数值列小数位数
+            thousands: 数值列是否加千位分隔符
+            bold_best: max / min，加粗每个数值列的最优值
 
         Returns:
             Markdown 表格代码
         """
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
+        return TableConverter.table_to_markdown(csv_path, has_header, max_rows=max_rows,
+                                                sample=sample, decimals=decimals,
+                                                thousands=thousands, bold_best=bold_best)
 
-        if not rows:
-            return ""
+    @staticmethod
+    def table_to_latex(path: str, caption: str = "", has_header: bool = True,
+                       sheet: Optional[str] = None, cell_range: Optional[str] = None,
+                       max_rows: Optional[int] = None, sample: Optional[int] = None,
+                       decimals: Optional[int] = None, thousands: bool = False,
+                       bold_best: Optional[str] = None) -> str:
+        """
+        将 CSV 或 Excel 数据文件转换为 LaTeX 表格
 
-        lines = []
+        Args:
+            path: CSV / .xlsx / .xlsm 文件路径
+            caption: 表格标题
+            has_header: 是否有表头
+            sheet: Excel 工作表名称
+            cell_range: Excel 单元格区域，如 A1:F200
+            其余参数同 csv_to_latex
 
-        # 表头
-        header = rows[0]
-        lines.append("| " + " | ".join(header) + " |")
-        lines.append("| " + " | ".join(["---"] * len(header)) + " |")
+        Returns:
+            LaTeX 表格代码
+        """
+        # 需要数值格式时使用按列类型化的模型，否则逐行流式转换
+        if decimals is not None or thousands or bold_best:
+            model = TableModel.from_file(path, has_header, sheet, cell_range, max_rows, sample)
+            return model.to_latex(caption, has_header, decimals, thousands, bold_best)
 
-        # 数据行
-        start_idx = 1 if has_header else 0
-        for row in rows[start_idx:]:
-            lines.append("| " + " | ".join(row) + " |")
+        rows = iter_table_rows(path, sheet, cell_range, max_rows, sample)
+        return "\n".join(latex_table_lines(rows, caption, has_header))
 
-        return "\n".join(lines)
+    @staticmethod
+    def table_to_markdown(path: str, has_header: bool = True,
+                          sheet: Optional[str] = None, cell_range: Optional[str] = None,
+                          max_rows: Optional[int] = None, sample: Optional[int] = None,
+                          decimals: Optional[int] = None, thousands: bool = False,
+                          bold_best: Optional[str] = None) -> str:
+        """
+        将 CSV 或 Excel 数据文件转换为 Markdown 表格
+
+        Args:
+            path: CSV / .xlsx / .xlsm 文件路径
+            has_header: 是否有表头
+            sheet: Excel 工作表名称
+            cell_range: Excel 单元格区域，如 A1:F200
+            其余参数同 csv_to_markdown
+
+        Returns:
+            Markdown 表格代码
+        """
+        if decimals is not None or thousands or bold_best:
+            model = TableModel.from_file(path, has_header, sheet, cell_range, max_rows, sample)
+            return model.to_markdown(has_header, decimals, thousands, bold_best)
+
+        rows = iter_table_rows(path, sheet, cell_range, max_rows, sample)
+        return "\n".join(markdown_table_lines(rows, has_header))
 
     @staticmethod
-    def excel_to_csv(excel_path: str, sheet_name: Optional[str] = None) -> str:
+    def excel_to_csv(excel_path: str, sheet_name: Optional[str] = None,
+                     csv_path: Optional[str] = None) -> str:
         """
         将 Excel 文件转换为 CSV
 
+        #table 可以直接引用 Excel 文件，一般不再需要先转换为 CSV。
+
         Args:
             excel_path: Excel 文件路径
             sheet_name: 工作表名称
+            csv_path: 输出路径，默认为源文件旁的同名 .csv
 
         Returns:
             CSV 文件路径
         """
-        try:
-            import pandas as pd
-
-            if sheet_name:
-                df = pd.read_excel(excel_path, sheet_name=sheet_name)
-            else:
-                df = pd.read_excel(excel_path)
-
-            # 转换为 CSV
-            csv_path = excel_path.replace('.xlsx', '.csv').replace('.xls', '.csv')
-            df.to_csv(csv_path, index=False, encoding='utf-8')
-            return csv_path
+        if csv_path is None:
+            csv_path = str(Path(excel_path).with_suffix('.csv'))
+            # 不覆盖源文件旁已有的同名 CSV
+            if os.path.exists(csv_path):
+                raise FileExistsError(f"CSV 文件已存在: {csv_path}")
 
-        except ImportError:
-            raise ImportError("请先安装 pandas: pip install pandas openpyxl")
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows(iter_excel_rows(excel_path, sheet_name))
+        return csv_path
 
     @staticmethod
     def latex_to_csv(latex_table: str) -> str:
@@ -152,24 +723,8 @@ class TableConverter:
 
     @staticmethod
     def _escape_latex(text: str) -> str:
-        """转义 LaTeX 特殊字符"""
-        special_chars = {
-            '&': r'\&',
-            '%': r'\%',
-            '$': r'\$',
-            '#': r'\#',
-            '_': r'\_',
-            '{': r'\{',
-            '}': r'\}',
-            '~': r'\textasciitilde{}',
-            '^': r'\textasciicircum{}',
-            '\\': r'\textbackslash{}',
-        }
-
-        for char, replacement in special_chars.items():
-            text = text.replace(char, replacement)
-
-        return text
+        """转义 LaTeX 特殊字符（单次替换，避免反斜杠被重复转义）"""
+        return _LATEX_SPECIAL_RE.sub(lambda m: _LATEX_SPECIAL_CHARS[m.group(0)], text)
 
     @staticmethod
     def _to_label(text: str) -> str:
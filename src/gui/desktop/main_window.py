@@ -7,11 +7,11 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
 import threading
 
-from src.converters.markdown_to_docx import MarkdownToDocxConverter
+from src.converters.document_exporter import DocumentExporter
 from src.converters.formula_converter import FormulaConverter
-from src.converters.latex_exporter import LatexExporter
 from src.gui.desktop.preview_panel import PreviewPanel
 from src.gui.desktop.icon_manager import get_icon_manager
+from src.templates.registry import get_template_registry
 from src.utils.config import Config
 
 
@@ -28,10 +28,10 @@ class MainWindow:
         self.config = Config()
 
         # 转换器
-        self.docx_converter = MarkdownToDocxConverter()
-        self.latex_exporter = LatexExporter()
+        self.exporter = DocumentExporter()
         self.formula_converter = FormulaConverter(self.config.get('mathpix_app_id', ''),
-                                                   self.config.get('mathpix_app_key', ''))
+                                                   self.config.get('mathpix_app_key', ''),
+                                                   **self.config.get_mathpix_options())
 
         # 当前文件
         self.current_file = None
@@ -77,7 +77,7 @@ class MainWindow:
         ttk.Label(template_frame, text="选择模板:").grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
         self.template_var = tk.StringVar(value="thesis")
         template_combo = ttk.Combobox(template_frame, textvariable=self.template_var, state="readonly",
-                                      values=["thesis", "journal", "custom"], width=20)
+                                      values=get_template_registry().names(), width=20)
         template_combo.grid(row=0, column=1, sticky=tk.W, padx=5)
 
         ttk.Label(template_frame, text="输出格式:").grid(row=0, column=2, sticky=tk.W, padx=(20, 5))
@@ -270,8 +270,7 @@ English abstract here...
 
         # 选择输出路径
         output_format = self.output_format.get()
-        extensions = {"docx": ".docx", "pdf": ".pdf", "latex": ".tex"}
-        default_ext = extensions.get(output_format, ".docx")
+        default_ext = DocumentExporter.EXTENSIONS.get(output_format, ".docx")
 
         output_file = filedialog.asksaveasfilename(
             title="保存文档",
@@ -295,24 +294,9 @@ English abstract here...
         """执行导出"""
         try:
             template = self.template_var.get()
-
-            if output_format == "latex":
-                # 使用 LaTeX 导出器
-                self.latex_exporter.export(md_content, output_file, template=template)
-            elif output_format == "pdf":
-                # PDF 导出（通过 Pandoc 直接生成）
-                self._export_pdf(md_content, output_file, template)
-            else:
-                # Word 导出（通过 Pandoc）
-                import tempfile
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False, encoding='utf-8') as f:
-                    f.write(md_content)
-                    temp_md = f.name
-                try:
-                    self.docx_converter.convert(temp_md, output_file, template=template)
-                finally:
-                    import os
-                    os.unlink(temp_md)
+            # 已打开的文件以其所在目录解析图片等相对路径
+            base_dir = os.path.dirname(os.path.abspath(self.current_file)) if self.current_file else None
+            self.exporter.export(md_content, output_file, output_format, template, base_dir=base_dir)
 
             self.root.after(0, lambda: self._export_complete(output_file))
         except Exception as e:
@@ -330,39 +314,6 @@ English abstract here...
         self.status_var.set("导出失败")
         messagebox.showerror("转换错误", f"导出失败:\n{error_msg}")
 
-    def _export_pdf(self, md_content: str, output_file: str, template: str):
-        """导出 PDF（使用 Pandoc 直接生成）"""
-        import tempfile
-        import subprocess
-        import os
-
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False, encoding='utf-8') as f:
-            f.write(md_content)
-            temp_md = f.name
-
-        try:
-            # 使用 pandoc 直接生成 PDF
-            cmd = [
-                'pandoc',
-                temp_md,
-                '-o', output_file,
-                '--from', 'markdown+yaml_metadata_block',
-                '--to', 'pdf',
-                '--pdf-engine', 'xelatex',  # 使用 xelatex 支持中文
-                '-V', 'CJKmainfont=PingFang SC',  # macOS 中文字体
-                '-V', 'geometry:margin=2.5cm',
-            ]
-
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            error_msg = e.stderr if e.stderr else "Pandoc PDF 转换失败"
-            raise RuntimeError(f"PDF 导出失败: {error_msg}")
-        except FileNotFoundError:
-            raise RuntimeError("未找到 pandoc 或 xelatex，请先安装: https://pandoc.org/installing.html")
-        finally:
-            if os.path.exists(temp_md):
-                os.unlink(temp_md)
-
     def _open_file(self, file_path):
         """打开文件"""
         import platform
@@ -466,7 +417,7 @@ class SettingsDialog:
         ttk.Label(frame, text="默认设置", font=("", 10, "bold")).pack(anchor=tk.W, pady=(0, 10))
 
         ttk.Label(frame, text="默认模板:").pack(anchor=tk.W)
-        self.default_template = ttk.Combobox(frame, values=["thesis", "journal", "custom"], state="readonly")
+        self.default_template = ttk.Combobox(frame, values=get_template_registry().names(), state="readonly")
         self.default_template.pack(fill=tk.X, pady=(0, 10))
 
         ttk.Label(frame, text="默认输出格式:").pack(anchor=tk.W)
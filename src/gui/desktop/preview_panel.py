@@ -3,14 +3,26 @@ Markdown 实时渲染预览面板
 左右分栏：左边编辑 Markdown，右边实时预览
 """
 
+import threading
 import tkinter as tk
 from tkinter import ttk
-import re
+
+from src.gui.desktop.preview_renderer import split_chunks, render_chunk
+from src.templates.registry import get_template
 
 
 class PreviewPanel:
     """Markdown 预览面板 - 左右分栏"""
 
+    # 每轮事件循环最多插入的文本片段数，避免大段粘贴时界面卡顿
+    APPLY_SLICE_SEGMENTS = 400
+
+    # 块数超过该值时启用虚拟化预览，只在控件中保留视口附近的块
+    VIRTUAL_THRESHOLD = 1500
+    VIRTUAL_WINDOW = 300
+    # 视口距窗口边缘小于该比例时移动窗口
+    VIRTUAL_MARGIN = 0.2
+
     def __init__(self, parent):
         self.parent = parent
         self.frame = ttk.Frame(parent)
@@ -22,6 +34,23 @@ class PreviewPanel:
         # 当前模板
         self.current_template = "thesis"
 
+        # 增量渲染状态：已渲染块的键和对应的起始 mark
+        self._chunk_keys = []
+        self._chunk_marks = []
+        self._mark_counter = 0
+        self._placeholder_shown = False
+        self._tags_style = None
+
+        # 后台渲染状态：当前代号和未完成的分批插入任务
+        self._generation = 0
+        self._apply_pending = None
+
+        # 虚拟化状态：整篇文档的块、控件中实际插入的块范围和已渲染片段
+        self._model = []
+        self._window = (0, 0)
+        self._segment_cache = {}
+        self._shift_pending = None
+
         self._setup_ui()
 
     def _setup_ui(self):
@@ -76,10 +105,10 @@ class PreviewPanel:
         )
         self.preview_text.grid(row=0, column=0, sticky="nsew")
 
-        # 滚动条
-        preview_scroll = ttk.Scrollbar(right_frame, command=self.preview_text.yview)
-        preview_scroll.grid(row=0, column=1, sticky="ns")
-        self.preview_text.configure(yscrollcommand=preview_scroll.set)
+        # 滚动条（虚拟化模式下按整篇文档的位置显示和跳转）
+        self.preview_scroll = ttk.Scrollbar(right_frame, command=self._on_preview_scrollbar)
+        self.preview_scroll.grid(row=0, column=1, sticky="ns")
+        self.preview_text.configure(yscrollcommand=self._on_preview_yscroll)
 
         # 添加到 PanedWindow
         self.paned.add(left_frame, minsize=300)
@@ -123,95 +152,310 @@ class PreviewPanel:
         self._update_preview()
 
     def _update_preview(self):
-        """更新右侧渲染预览"""
+        """
+        更新右侧渲染预览
+
+        解析和渲染在后台线程完成，Tk 线程只负责分批插入变化的块。
+        每次更新递增代号，旧代号的解析结果和未完成的插入直接丢弃。
+        """
         content = self.source_text.get(1.0, tk.END).strip()
 
-        self.preview_text.config(state=tk.NORMAL)
-        self.preview_text.delete(1.0, tk.END)
+        # 模板或其 YAML 变化时重新配置标签样式
+        style = get_template(self.current_template)
+        if self._tags_style is not style:
+            self._configure_tags(self.current_template)
+            self._tags_style = style
+
+        self._cancel_pending()
 
         if content and content != "请选择或拖拽 Markdown 文件...":
-            # 渲染 Markdown
-            self._render_markdown(content, self.current_template)
-        else:
+            threading.Thread(target=self._parse_worker,
+                             args=(self._generation, content, set(self._chunk_keys),
+                                   self._window[0]),
+                             daemon=True).start()
+        elif not self._placeholder_shown:
+            self.preview_text.config(state=tk.NORMAL)
+            self._reset_preview()
             self.preview_text.insert(tk.END, "请在左侧编辑 Markdown 内容...", 'body')
+            self._placeholder_shown = True
+            self.preview_text.config(state=tk.DISABLED)
+
+    def _cancel_pending(self):
+        """作废正在进行的解析和分批插入"""
+        self._generation += 1
+        if self._apply_pending:
+            self.frame.after_cancel(self._apply_pending)
+            self._apply_pending = None
+        if self._shift_pending:
+            self.frame.after_cancel(self._shift_pending)
+            self._shift_pending = None
+
+    def _window_range(self, total: int, start: int) -> tuple:
+        """计算控件中应插入的块范围，块数不多时为整篇文档"""
+        if total <= self.VIRTUAL_THRESHOLD:
+            return 0, total
+        start = max(0, min(start, total - self.VIRTUAL_WINDOW))
+        return start, start + self.VIRTUAL_WINDOW
+
+    def _parse_worker(self, generation: int, content: str, rendered_keys: set, window_start: int):
+        """后台线程：切分文档并渲染窗口内预览中还没有的块"""
+        chunks = split_chunks(content)
+        start, stop = self._window_range(len(chunks), window_start)
+
+        segments = {}
+        for i in range(start, stop):
+            if generation != self._generation:
+                return
+            if chunks[i].key not in rendered_keys:
+                segments[chunks[i].key] = render_chunk(chunks[i])
+
+        self.frame.after(0, lambda: self._start_apply(generation, chunks, segments))
+
+    def _reset_preview(self):
+        """清空预览控件和已渲染块记录"""
+        self.preview_text.delete(1.0, tk.END)
+        for name in self._chunk_marks:
+            self.preview_text.mark_unset(name)
+        self._chunk_keys = []
+        self._chunk_marks = []
+        self._model = []
+        self._window = (0, 0)
+        self._segment_cache = {}
+        self._placeholder_shown = False
+
+    def _start_apply(self, generation: int, chunks: list, segments: dict):
+        """
+        与当前预览比较，删除中间变化的块并开始分批插入新块
 
+        相同的前缀和后缀块保持不动，每个块起始处有一个左粘附的 mark，
+        用于定位需要删除和插入的位置。
+        """
+        if generation != self._generation:
+            return
+
+        text = self.preview_text
+        text.config(state=tk.NORMAL)
+        if self._placeholder_shown:
+            self._reset_preview()
+
+        # 只保留当前文档中仍存在的块的渲染结果
+        keys = {chunk.key for chunk in chunks}
+        self._segment_cache = {key: value for key, value in self._segment_cache.items()
+                               if key in keys}
+        self._segment_cache.update(segments)
+
+        self._model = chunks
+        start, stop = self._window_range(len(chunks), self._window[0])
+        self._window = (start, stop)
+
+        old_keys = self._chunk_keys
+        new_keys = [chunk.key for chunk in chunks[start:stop]]
+
+        # 公共前缀和后缀
+        limit = min(len(old_keys), len(new_keys))
+        prefix = 0
+        while prefix < limit and old_keys[prefix] == new_keys[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old_keys[-1 - suffix] == new_keys[-1 - suffix]:
+            suffix += 1
+
+        old_stop = len(old_keys) - suffix
+        new_stop = len(new_keys) - suffix
+        if prefix == old_stop and prefix == new_stop:
+            text.config(state=tk.DISABLED)
+            return
+
+        self._save_view(tk.LEFT)
+        self._delete_chunks(prefix, old_stop)
+        self._restore_view()
+        text.config(state=tk.DISABLED)
+
+        self._apply_slice(generation, chunks[start + prefix:start + new_stop], 0, prefix)
+
+    def _apply_slice(self, generation: int, pending: list, pos: int, index: int):
+        """
+        插入一批块，剩余的通过 after() 留到下一轮事件循环
+
+        Args:
+            generation: 渲染代号
+            pending: 待插入的块列表
+            pos: pending 中下一个待插入的位置
+            index: pending 第一个块在已渲染块记录中的位置
+        """
+        self._apply_pending = None
+        if generation != self._generation:
+            return
+
+        self.preview_text.config(state=tk.NORMAL)
+        self._save_view(tk.LEFT)
+        pos = self._insert_chunks(pending, pos, index + pos, self.APPLY_SLICE_SEGMENTS)
+        self._restore_view()
         self.preview_text.config(state=tk.DISABLED)
 
-    def _render_markdown(self, content: str, template: str):
-        """渲染 Markdown 为富文本"""
-        # 配置标签样式
-        self._configure_tags(template)
-
-        # 预处理扩展语法
-        content = self._preprocess_extended_syntax(content)
-
-        # 逐行解析和渲染
-        lines = content.split('\n')
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-
-            # 标题
-            if line.startswith('# '):
-                self._insert_heading(line[2:], 1)
-            elif line.startswith('## '):
-                self._insert_heading(line[3:], 2)
-            elif line.startswith('### '):
-                self._insert_heading(line[4:], 3)
-            elif line.startswith('#### '):
-                self._insert_heading(line[5:], 4)
-            # 代码块
-            elif line.startswith('```'):
-                i = self._insert_code_block(lines, i)
-                continue
-            # 表格
-            elif '|' in line and i + 1 < len(lines) and '---' in lines[i + 1]:
-                i = self._insert_table(lines, i)
-                continue
-            # 列表
-            elif line.strip().startswith('- ') or line.strip().startswith('* '):
-                self._insert_bullet(line.strip()[2:])
-            elif re.match(r'^\d+\.\s', line.strip()):
-                self._insert_numbered(line.strip())
-            # 普通段落
-            elif line.strip():
-                self._insert_paragraph(line)
-            else:
-                self.preview_text.insert(tk.END, '\n')
-
-            i += 1
+        if pos < len(pending):
+            self._apply_pending = self.frame.after(
+                1, lambda: self._apply_slice(generation, pending, pos, index))
+
+    def _delete_chunks(self, start: int, stop: int):
+        """删除已渲染记录中 [start, stop) 的块"""
+        if start >= stop:
+            return
+        marks = self._chunk_marks
+        self.preview_text.delete(marks[start], marks[stop] if stop < len(marks) else 'end-1c')
+        for name in marks[start:stop]:
+            self.preview_text.mark_unset(name)
+        del self._chunk_keys[start:stop]
+        del self._chunk_marks[start:stop]
+
+    def _insert_chunks(self, pending: list, pos: int, index: int, limit: int = 0) -> int:
+        """
+        在已渲染记录的 index 处依次插入块
+
+        Args:
+            pending: 待插入的块列表
+            pos: pending 中的起始位置
+            index: 插入位置
+            limit: 最多插入的片段数，0 表示不限
+
+        Returns:
+            pending 中下一个未插入的位置
+        """
+        text = self.preview_text
+        next_mark = self._chunk_marks[index] if index < len(self._chunk_marks) else None
+        text.mark_set('render_pos', next_mark or 'end-1c')
+        text.mark_gravity('render_pos', tk.RIGHT)
+
+        inserted = 0
+        while pos < len(pending) and (not limit or inserted < limit):
+            chunk = pending[pos]
+            segments = self._segment_cache.get(chunk.key)
+            if segments is None:
+                segments = self._segment_cache[chunk.key] = render_chunk(chunk)
+
+            name = f'chunk{self._mark_counter}'
+            self._mark_counter += 1
+            text.mark_set(name, 'render_pos')
+            text.mark_gravity(name, tk.LEFT)
+            for segment, tags in segments:
+                text.insert('render_pos', segment, tags)
+
+            self._chunk_keys.insert(index, chunk.key)
+            self._chunk_marks.insert(index, name)
+            index += 1
+            pos += 1
+            inserted += len(segments)
+
+        # 左粘附的 mark 会停在插入内容之前，需移到插入内容之后
+        if next_mark is not None:
+            text.mark_set(next_mark, 'render_pos')
+        text.mark_unset('render_pos')
+        return pos
+
+    def _save_view(self, gravity: str):
+        """用 mark 记住视口顶部，插入内容后视口停留在原来的文字上"""
+        self.preview_text.mark_set('view_top', '@0,0')
+        self.preview_text.mark_gravity('view_top', gravity)
+
+    def _restore_view(self):
+        """恢复视口顶部"""
+        self.preview_text.yview('view_top')
+        self.preview_text.mark_unset('view_top')
+
+    def _is_virtual(self) -> bool:
+        """控件中是否只插入了文档的一部分"""
+        return self._window != (0, len(self._model))
+
+    def _on_preview_yscroll(self, first, last):
+        """预览滚动时更新滚动条，接近窗口边缘时加载更多块"""
+        if not self._is_virtual():
+            self.preview_scroll.set(first, last)
+            return
+
+        first, last = float(first), float(last)
+        start, stop = self._window
+        total = len(self._model)
+        count = stop - start
+        self.preview_scroll.set((start + first * count) / total, (start + last * count) / total)
+
+        if self._apply_pending or self._shift_pending:
+            return
+        if (first < self.VIRTUAL_MARGIN and start > 0) or \
+                (last > 1 - self.VIRTUAL_MARGIN and stop < total):
+            self._shift_pending = self.frame.after_idle(self._recenter_window)
+
+    def _on_preview_scrollbar(self, *args):
+        """拖动滚动条：虚拟化模式下按整篇文档的位置跳转"""
+        if not self._is_virtual() or args[0] != 'moveto':
+            self.preview_text.yview(*args)
+            return
+
+        position = float(args[1]) * len(self._model)
+        start, stop = self._window
+        if not self._apply_pending and not start <= position < stop:
+            self._move_window(int(position) - self.VIRTUAL_WINDOW // 2, tk.LEFT)
+            start, stop = self._window
+        self.preview_text.yview_moveto((position - start) / max(stop - start, 1))
+
+    def _recenter_window(self):
+        """以当前视口为中心重新确定窗口"""
+        self._shift_pending = None
+        if self._apply_pending:
+            return
+        first, last = self.preview_text.yview()
+        start, stop = self._window
+        center = start + int((first + last) / 2 * (stop - start))
+        self._move_window(center - self.VIRTUAL_WINDOW // 2, tk.RIGHT)
+
+    def _move_window(self, new_start: int, gravity: str):
+        """
+        把窗口移动到 new_start，只删除和插入两端变化的块
+
+        Args:
+            new_start: 新窗口的起始块
+            gravity: 视口标记的粘附方向，在视口前插入内容时应为 RIGHT
+        """
+        start, stop = self._window
+        new_start, new_stop = self._window_range(len(self._model), new_start)
+        if (new_start, new_stop) == (start, stop):
+            return
+
+        text = self.preview_text
+        text.config(state=tk.NORMAL)
+        self._save_view(gravity)
+
+        if new_stop <= start or new_start >= stop:
+            # 没有重叠，整体替换
+            self._delete_chunks(0, len(self._chunk_keys))
+            self._insert_chunks(self._model[new_start:new_stop], 0, 0)
+        else:
+            self._delete_chunks(new_stop - start, len(self._chunk_keys))
+            self._delete_chunks(0, new_start - start)
+            self._insert_chunks(self._model[new_start:start], 0, 0)
+            self._insert_chunks(self._model[stop:new_stop], 0, len(self._chunk_keys))
+
+        self._window = (new_start, new_stop)
+        self._restore_view()
+        text.config(state=tk.DISABLED)
 
     def _configure_tags(self, template: str):
-        """配置文本标签样式"""
-        # 根据系统和模板设置字体
-        if self._is_macos():
-            # macOS 字体
-            if template == "thesis":
-                h1_font = ('PingFang SC', 18, 'bold')
-                h2_font = ('PingFang SC', 15, 'bold')
-                h3_font = ('PingFang SC', 13, 'bold')
-                h4_font = ('PingFang SC', 12, 'bold')
-                body_font = ('PingFang SC', 12)
-            else:  # journal
-                h1_font = ('Times New Roman', 14, 'bold')
-                h2_font = ('Times New Roman', 12, 'bold')
-                h3_font = ('Times New Roman', 11, 'bold')
-                h4_font = ('Times New Roman', 11, 'bold')
-                body_font = ('Times New Roman', 11)
+        """配置文本标签样式（字号取自模板 YAML）"""
+        style = get_template(template)
+        sizes = style.font_sizes
+
+        # 期刊模板使用英文字体，其余使用系统中文字体（YAML 中的宋体/黑体在 macOS 上不一定存在）
+        if style.base == "journal":
+            family = style.english_fonts.body
+        elif self._is_macos():
+            family = 'PingFang SC'
         else:
-            # Windows/Linux 字体
-            if template == "thesis":
-                h1_font = ('Microsoft YaHei', 16, 'bold')
-                h2_font = ('Microsoft YaHei', 14, 'bold')
-                h3_font = ('Microsoft YaHei', 12, 'bold')
-                h4_font = ('Microsoft YaHei', 11, 'bold')
-                body_font = ('Microsoft YaHei', 11)
-            else:  # journal
-                h1_font = ('Times New Roman', 14, 'bold')
-                h2_font = ('Times New Roman', 12, 'bold')
-                h3_font = ('Times New Roman', 11, 'bold')
-                h4_font = ('Times New Roman', 11, 'bold')
-                body_font = ('Times New Roman', 11)
+            family = 'Microsoft YaHei'
+
+        h1_font = (family, round(sizes.chapter_title), 'bold')
+        h2_font = (family, round(sizes.section_title), 'bold')
+        h3_font = (family, round(sizes.subsection_title), 'bold')
+        h4_font = (family, round(sizes.body), 'bold')
+        body_font = (family, round(sizes.body))
 
         # 配置文本颜色
         text_color = '#333333'
@@ -231,118 +475,6 @@ class PreviewPanel:
         self.preview_text.tag_configure('bullet', font=body_font, foreground=text_color)
         self.preview_text.tag_configure('numbered', font=body_font, foreground=text_color)
 
-    def _preprocess_extended_syntax(self, content: str) -> str:
-        """预处理扩展语法"""
-        # 处理 #abstract
-        content = re.sub(r'^#abstract\s*', '**摘要**\n\n', content, flags=re.MULTILINE)
-        content = re.sub(r'^#abstract-en\s*', '**Abstract**\n\n', content, flags=re.MULTILINE)
-        content = re.sub(r'^#keywords\s*', '**关键词：**', content, flags=re.MULTILINE)
-
-        # 处理 #equation
-        def replace_equation(match):
-            eq = match.group(1).strip()
-            return f"\n$$ {eq} $$\n"
-
-        content = re.sub(r'^#equation\s+(.+?)(?:\s*\|\s*label=(.+))?$',
-                         replace_equation, content, flags=re.MULTILINE)
-
-        # 处理 #figure
-        def replace_figure(match):
-            caption = match.group(1)
-            return f"\n**图:** {caption}\n"
-
-        content = re.sub(r'^#figure\s+(.+?)\s*\|.+?$', replace_figure,
-                         content, flags=re.MULTILINE)
-
-        # 处理 #table
-        def replace_table(match):
-            caption = match.group(1)
-            return f"\n**表:** {caption}\n"
-
-        content = re.sub(r'^#table\s+(.+?)\s*\|.+?$', replace_table,
-                         content, flags=re.MULTILINE)
-
-        return content
-
-    def _insert_heading(self, text: str, level: int):
-        """插入标题"""
-        tag = f'h{level}'
-        self.preview_text.insert(tk.END, text + '\n', tag)
-        self.preview_text.insert(tk.END, '\n')
-
-    def _insert_paragraph(self, text: str):
-        """插入段落（支持行内格式）"""
-        self._insert_with_inline_format(text, 'body')
-        self.preview_text.insert(tk.END, '\n\n', 'body')
-
-    def _insert_with_inline_format(self, text: str, default_tag: str = 'body'):
-        """插入带行内格式的文本"""
-        # 解析粗体和斜体
-        parts = re.split(r'(\*\*\*[^*]+\*\*\*|\*\*[^*]+\*\*|\*[^*]+\*|`[^`]+`)', text)
-
-        for part in parts:
-            if part.startswith('***') and part.endswith('***'):
-                self.preview_text.insert(tk.END, part[3:-3], ('bold', 'italic'))
-            elif part.startswith('**') and part.endswith('**'):
-                self.preview_text.insert(tk.END, part[2:-2], 'bold')
-            elif part.startswith('*') and part.endswith('*'):
-                self.preview_text.insert(tk.END, part[1:-1], 'italic')
-            elif part.startswith('`') and part.endswith('`'):
-                self.preview_text.insert(tk.END, part[1:-1], 'code')
-            else:
-                self.preview_text.insert(tk.END, part, default_tag)
-
-    def _insert_code_block(self, lines: list, start_idx: int) -> int:
-        """插入代码块"""
-        i = start_idx + 1
-        code_lines = []
-
-        while i < len(lines) and not lines[i].startswith('```'):
-            code_lines.append(lines[i])
-            i += 1
-
-        code = '\n'.join(code_lines)
-        self.preview_text.insert(tk.END, code + '\n', 'code_block')
-        self.preview_text.insert(tk.END, '\n', 'body')
-
-        return i + 1
-
-    def _insert_table(self, lines: list, start_idx: int) -> int:
-        """插入表格"""
-        i = start_idx
-        rows = []
-
-        while i < len(lines) and '|' in lines[i]:
-            rows.append(lines[i])
-            i += 1
-
-        for j, row in enumerate(rows):
-            if '---' in row:
-                continue
-
-            cells = [cell.strip() for cell in row.split('|') if cell.strip()]
-            row_text = ' | '.join(cells)
-
-            if j == 0:
-                self.preview_text.insert(tk.END, row_text + '\n', 'bold')
-                self.preview_text.insert(tk.END, '-' * len(row_text) + '\n', 'body')
-            else:
-                self.preview_text.insert(tk.END, row_text + '\n', 'body')
-
-        self.preview_text.insert(tk.END, '\n', 'body')
-        return i
-
-    def _insert_bullet(self, text: str):
-        """插入无序列表项"""
-        self.preview_text.insert(tk.END, '• ', 'bullet')
-        self._insert_with_inline_format(text, 'bullet')
-        self.preview_text.insert(tk.END, '\n', 'bullet')
-
-    def _insert_numbered(self, text: str):
-        """插入有序列表项"""
-        self._insert_with_inline_format(text, 'numbered')
-        self.preview_text.insert(tk.END, '\n', 'numbered')
-
     def get_content(self) -> str:
         """获取当前 Markdown 内容"""
         return self.source_text.get(1.0, tk.END)
@@ -350,6 +482,7 @@ class PreviewPanel:
     def clear(self):
         """清空预览"""
         self.source_text.delete(1.0, tk.END)
+        self._cancel_pending()
         self.preview_text.config(state=tk.NORMAL)
-        self.preview_text.delete(1.0, tk.END)
+        self._reset_preview()
         self.preview_text.config(state=tk.DISABLED)
@@ -0,0 +1,155 @@
+"""
+预览渲染器 - 把 Markdown 转换为带标签的文本片段
+不依赖 Tk 控件，PreviewPanel 只负责把片段插入 Text 控件
+"""
+
+import re
+from typing import List, Tuple
+
+from src.parsers.extended_markdown import (
+    Block, FrontMatter, Heading, Abstract, Keywords, Figure, Table, Equation, CodeBlock, parse,
+)
+
+# 片段: (文本, 标签元组)
+Segment = Tuple[str, tuple]
+
+_INLINE_RE = re.compile(r'(\*\*\*[^*]+\*\*\*|\*\*[^*]+\*\*|\*[^*]+\*|`[^`]+`)')
+
+
+class Chunk:
+    """预览中的一个渲染单元：一个块及其前面的空行"""
+
+    __slots__ = ('block', 'gap', 'key')
+
+    def __init__(self, block: Block, gap: int):
+        self.block = block
+        self.gap = gap
+        # 块的类型、源码和前导空行都相同时渲染结果相同，可直接复用
+        self.key = (type(block).__name__, gap, block.source)
+
+
+def split_chunks(content: str) -> List[Chunk]:
+    """
+    把文档切分为渲染单元
+
+    Args:
+        content: Markdown 原文
+
+    Returns:
+        按文档顺序排列的渲染单元（YAML 元数据不显示）
+    """
+    chunks = []
+    prev_end = None
+    for block in parse(content):
+        if isinstance(block, FrontMatter):
+            prev_end = block.end
+            continue
+        gap = block.start - prev_end if prev_end is not None else 0
+        chunks.append(Chunk(block, gap))
+        prev_end = block.end
+    return chunks
+
+
+def render_chunk(chunk: Chunk) -> List[Segment]:
+    """渲染单个单元为文本片段"""
+    segments = []
+    if chunk.gap:
+        segments.append(('\n' * chunk.gap, ()))
+
+    block = chunk.block
+    if isinstance(block, Heading):
+        segments.append((block.text + '\n', (f'h{min(block.level, 4)}',)))
+        segments.append(('\n', ()))
+    elif isinstance(block, Abstract):
+        _paragraph(segments, '**Abstract**' if block.lang == 'en' else '**摘要**')
+        _lines(segments, block.text.split('\n'))
+    elif isinstance(block, Keywords):
+        _paragraph(segments, f'**关键词：**{block.text}')
+    elif isinstance(block, Equation):
+        _paragraph(segments, f'$$ {block.latex} $$')
+    elif isinstance(block, Figure):
+        _paragraph(segments, f'**图:** {block.caption}')
+    elif isinstance(block, Table):
+        _paragraph(segments, f'**表:** {block.caption}')
+    elif isinstance(block, CodeBlock):
+        segments.append((block.code + '\n', ('code_block',)))
+        segments.append(('\n', ('body',)))
+    else:
+        _lines(segments, block.text.split('\n'))
+    return segments
+
+
+def _lines(segments: List[Segment], lines: list):
+    """逐行解析和渲染普通文本"""
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        # 表格
+        if '|' in line and i + 1 < len(lines) and '---' in lines[i + 1]:
+            i = _table(segments, lines, i)
+            continue
+        # 列表
+        elif line.strip().startswith('- ') or line.strip().startswith('* '):
+            segments.append(('• ', ('bullet',)))
+            _inline(segments, line.strip()[2:], 'bullet')
+            segments.append(('\n', ('bullet',)))
+        elif re.match(r'^\d+\.\s', line.strip()):
+            _inline(segments, line.strip(), 'numbered')
+            segments.append(('\n', ('numbered',)))
+        # 普通段落
+        elif line.strip():
+            _paragraph(segments, line)
+        else:
+            segments.append(('\n', ()))
+
+        i += 1
+
+
+def _paragraph(segments: List[Segment], text: str):
+    """段落（支持行内格式）"""
+    _inline(segments, text, 'body')
+    segments.append(('\n\n', ('body',)))
+
+
+def _inline(segments: List[Segment], text: str, default_tag: str = 'body'):
+    """解析粗体、斜体和行内代码"""
+    for part in _INLINE_RE.split(text):
+        if not part:
+            continue
+        if part.startswith('***') and part.endswith('***'):
+            segments.append((part[3:-3], ('bold', 'italic')))
+        elif part.startswith('**') and part.endswith('**'):
+            segments.append((part[2:-2], ('bold',)))
+        elif part.startswith('*') and part.endswith('*'):
+            segments.append((part[1:-1], ('italic',)))
+        elif part.startswith('`') and part.endswith('`'):
+            segments.append((part[1:-1], ('code',)))
+        else:
+            segments.append((part, (default_tag,)))
+
+
+def _table(segments: List[Segment], lines: list, start_idx: int) -> int:
+    """渲染 Markdown 表格，返回表格之后的行号"""
+    i = start_idx
+    rows = []
+
+    while i < len(lines) and '|' in lines[i]:
+        rows.append(lines[i])
+        i += 1
+
+    for j, row in enumerate(rows):
+        if '---' in row:
+            continue
+
+        cells = [cell.strip() for cell in row.split('|') if cell.strip()]
+        row_text = ' | '.join(cells)
+
+        if j == 0:
+            segments.append((row_text + '\n', ('bold',)))
+            segments.append(('-' * len(row_text) + '\n', ('body',)))
+        else:
+            segments.append((row_text + '\n', ('body',)))
+
+    segments.append(('\n', ('body',)))
+    return i
@@ -2,16 +2,26 @@
 表格编辑器 - 可视化编辑表格数据
 """
 
+import csv
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import csv
-import io
 
+from src.converters.table_converter import latex_table_lines, markdown_table_lines, write_lines
 from src.gui.desktop.icon_manager import get_icon_manager
+from src.gui.desktop.table_store import TableStore
 
 
 class TableEditor:
-    """表格编辑器对话框"""
+    """
+    表格编辑器对话框
+
+    数据保存在按列存储的 TableStore 中，Treeview 只保留一屏的行，
+    滚动时按可见范围重新填充，十万行的表格也不会卡顿。
+    """
+
+    # Treeview 默认行高，样式未指定时使用
+    DEFAULT_ROW_HEIGHT = 20
 
     def __init__(self, parent, converter):
         self.converter = converter
@@ -22,10 +32,22 @@ class TableEditor:
         self.dialog.grab_set()
 
         # 表格数据
-        self.headers = ["列1", "列2", "列3"]
-        self.data = [["", "", ""]]
+        self.store = TableStore()
+
+        # 虚拟滚动状态：首个可见行号、可见行数和选中的行号
+        self._top = 0
+        self._visible_rows = 1
+        self._selected_rows = set()
+        self._refreshing = False
+
+        # 后台导入状态
+        self._import_thread = None
+        self._import_cancel = None
+        self._import_progress = 0.0
+        self._import_result = None
 
         self._setup_ui()
+        self.dialog.protocol("WM_DELETE_WINDOW", self._close)
 
     def _setup_ui(self):
         """设置界面"""
@@ -45,8 +67,9 @@ class TableEditor:
         self.icon_manager.create_button(toolbar, icon_name="minus", text="删除列",
                                         command=self._remove_col, size="small").pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
-        self.icon_manager.create_button(toolbar, icon_name="upload", text="导入 CSV",
-                                        command=self._import_csv, size="small").pack(side=tk.LEFT, padx=2)
+        self.import_button = self.icon_manager.create_button(toolbar, icon_name="upload", text="导入 CSV",
+                                                             command=self._import_csv, size="small")
+        self.import_button.pack(side=tk.LEFT, padx=2)
         self.icon_manager.create_button(toolbar, icon_name="download", text="导出",
                                         command=self._show_export_dialog, size="small").pack(side=tk.LEFT, padx=2)
 
@@ -54,17 +77,17 @@ class TableEditor:
         table_frame = ttk.Frame(self.dialog)
         table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
-        # 创建 Treeview
-        self.tree = ttk.Treeview(table_frame, columns=self.headers, show='headings')
+        # 创建 Treeview，行由 _refresh_rows 按可见范围填充
+        self.tree = ttk.Treeview(table_frame, columns=self.store.headers, show='headings')
         self._update_tree_columns()
 
-        # 滚动条
-        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        # 滚动条：纵向按整个数据集的行号滚动，不使用 Treeview 自身的滚动
+        self.vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self._on_scrollbar)
         hsb = ttk.Scrollbar(table_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.tree.configure(xscrollcommand=hsb.set)
 
         self.tree.grid(row=0, column=0, sticky='nsew')
-        vsb.grid(row=0, column=1, sticky='ns')
+        self.vsb.grid(row=0, column=1, sticky='ns')
         hsb.grid(row=1, column=0, sticky='ew')
 
         table_frame.grid_rowconfigure(0, weight=1)
@@ -73,12 +96,28 @@ class TableEditor:
         # 绑定双击编辑
         self.tree.bind('<Double-1>', self._on_double_click)
 
+        # 虚拟滚动
+        self.tree.bind('<Configure>', self._on_tree_configure)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self._scroll_units(-3))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_units(3))
+        self.tree.bind('<Up>', lambda e: self._on_arrow(-1))
+        self.tree.bind('<Down>', lambda e: self._on_arrow(1))
+        self.tree.bind('<Prior>', lambda e: self._scroll_units(-self._visible_rows))
+        self.tree.bind('<Next>', lambda e: self._scroll_units(self._visible_rows))
+
         # 按钮区域
         btn_frame = ttk.Frame(self.dialog)
         btn_frame.pack(fill=tk.X, padx=10, pady=10)
 
         ttk.Button(btn_frame, text="清空", command=self._clear).pack(side=tk.LEFT, padx=5)
-        ttk.Button(btn_frame, text="关闭", command=self.dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(btn_frame, text="关闭", command=self._close).pack(side=tk.RIGHT, padx=5)
+
+        # 导入进度（导入时显示）
+        self.status_var = tk.StringVar()
+        ttk.Label(btn_frame, textvariable=self.status_var).pack(side=tk.LEFT, padx=5)
+        self.progress = ttk.Progressbar(btn_frame, mode='determinate', maximum=100, length=200)
 
     def _update_tree_columns(self):
         """更新表格列"""
@@ -86,48 +125,151 @@ class TableEditor:
         for col in self.tree['columns']:
             self.tree.heading(col, text='')
 
-        self.tree['columns'] = self.headers
-        for col in self.headers:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=100)
+        # 以列号作为列标识，表头重复或为空时也不会冲突
+        self.tree['columns'] = [str(i) for i in range(self.store.col_count)]
+        for i, header in enumerate(self.store.headers):
+            self.tree.heading(str(i), text=header)
+            self.tree.column(str(i), width=100)
 
-        # 刷新数据
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self._refresh_rows()
 
-        for row in self.data:
-            self.tree.insert('', tk.END, values=row)
+    # ===== 虚拟滚动 =====
+
+    def _row_height(self) -> int:
+        """Treeview 行高"""
+        try:
+            height = int(ttk.Style().lookup('Treeview', 'rowheight') or 0)
+        except (tk.TclError, ValueError):
+            height = 0
+        return height or self.DEFAULT_ROW_HEIGHT
+
+    def _on_tree_configure(self, event):
+        """控件尺寸变化时重新计算可见行数"""
+        row_height = self._row_height()
+        # 表头高度：取第一行的位置，尚无行时按一行估算
+        items = self.tree.get_children()
+        bbox = self.tree.bbox(items[0]) if items else None
+        header = bbox[1] if bbox else row_height
+        visible = max(1, (event.height - header) // row_height)
+        if visible != self._visible_rows:
+            self._visible_rows = visible
+            self._refresh_rows()
+
+    def _refresh_rows(self):
+        """用 [top, top + 可见行数) 范围内的数据填充 Treeview"""
+        store = self.store
+        self._top = max(0, min(self._top, store.row_count - self._visible_rows))
+        rows = list(store.rows(self._top, self._top + self._visible_rows))
+
+        # 条目以槽位号为标识，数量不变时只更新值
+        self._refreshing = True
+        try:
+            items = self.tree.get_children()
+            if len(items) > len(rows):
+                self.tree.delete(*items[len(rows):])
+            for slot, row in enumerate(rows):
+                if slot < len(items):
+                    self.tree.item(items[slot], values=row)
+                else:
+                    self.tree.insert('', tk.END, iid=str(slot), values=row)
+
+            # 恢复滚动前选中的行
+            selected = [str(row - self._top) for row in self._selected_rows
+                        if self._top <= row < self._top + len(rows)]
+            self.tree.selection_set(selected)
+        finally:
+            self._refreshing = False
+
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        """按整个数据集设置滚动条位置"""
+        total = self.store.row_count
+        if total <= self._visible_rows:
+            self.vsb.set(0.0, 1.0)
+        else:
+            self.vsb.set(self._top / total, (self._top + self._visible_rows) / total)
+
+    def _scroll_to(self, top: int):
+        """把首个可见行设为 top"""
+        top = max(0, min(int(top), self.store.row_count - self._visible_rows))
+        if top != self._top:
+            self._top = top
+            self._refresh_rows()
+
+    def _scroll_units(self, count: int):
+        self._scroll_to(self._top + count)
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        """滚动条拖动和点击"""
+        if args[0] == 'moveto':
+            self._scroll_to(float(args[1]) * self.store.row_count)
+        elif args[0] == 'scroll':
+            count = int(args[1])
+            if args[2] == 'pages':
+                count *= self._visible_rows
+            self._scroll_units(count)
+
+    def _on_mousewheel(self, event):
+        """鼠标滚轮（Windows 的 delta 为 120 的倍数，macOS 为较小的整数）"""
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_units(-delta * 3)
+
+    def _on_arrow(self, step: int):
+        """方向键移到可见范围之外时滚动一行"""
+        focus = self.tree.focus()
+        if not focus:
+            return None
+        slot = self.tree.index(focus)
+        if 0 <= slot + step < len(self.tree.get_children()):
+            return None
+
+        row = self._top + slot + step
+        if not 0 <= row < self.store.row_count:
+            return "break"
+        self._selected_rows = {row}
+        self._scroll_to(self._top + step)
+        item = str(row - self._top)
+        self.tree.focus(item)
+        self.tree.selection_set(item)
+        return "break"
+
+    def _on_select(self, event=None):
+        """记录选中的行号（刷新可见行时不处理）"""
+        if self._refreshing:
+            return
+        visible = range(self._top, self._top + len(self.tree.get_children()))
+        # 保留滚出视口的已选行，替换视口内的选择
+        self._selected_rows = {row for row in self._selected_rows if row not in visible}
+        self._selected_rows.update(self._top + self.tree.index(item)
+                                   for item in self.tree.selection())
+
+    # ===== 编辑 =====
 
     def _add_row(self):
         """添加行"""
-        new_row = [""] * len(self.headers)
-        self.data.append(new_row)
-        self.tree.insert('', tk.END, values=new_row)
+        self.store.append_row()
+        # 滚动到新行
+        self._top = self.store.row_count
+        self._refresh_rows()
 
     def _remove_row(self):
         """删除选中行"""
-        selected = self.tree.selection()
-        if selected:
-            for item in selected:
-                idx = self.tree.index(item)
-                self.data.pop(idx)
-                self.tree.delete(item)
+        if self._selected_rows:
+            self.store.delete_rows(self._selected_rows)
+            self._selected_rows = set()
+            self._refresh_rows()
 
     def _add_col(self):
         """添加列"""
-        new_col = f"列{len(self.headers) + 1}"
-        self.headers.append(new_col)
-        for row in self.data:
-            row.append("")
+        self.store.add_column(f"列{self.store.col_count + 1}")
         self._update_tree_columns()
 
     def _remove_col(self):
         """删除最后一列"""
-        if len(self.headers) > 1:
-            self.headers.pop()
-            for row in self.data:
-                if row:
-                    row.pop()
+        if self.store.col_count > 1:
+            self.store.remove_column()
             self._update_tree_columns()
 
     def _on_double_click(self, event):
@@ -155,14 +297,19 @@ class TableEditor:
         entry.insert(0, current_value)
         entry.focus()
 
+        # 可见条目对应的数据行号
+        row_idx = self._top + self.tree.index(item)
+
         def save_edit(event=None):
             new_value = entry.get()
             entry.destroy()
 
             # 更新数据
-            row_idx = self.tree.index(item)
-            if row_idx < len(self.data) and col_idx < len(self.data[row_idx]):
-                self.data[row_idx][col_idx] = new_value
+            if row_idx < self.store.row_count and col_idx < self.store.col_count:
+                self.store.set(row_idx, col_idx, new_value)
+            # 编辑期间滚动过时条目已对应其他行，只更新数据
+            if self._top + self.tree.index(item) != row_idx:
+                return
 
             # 更新显示
             values[col_idx] = new_value
@@ -176,7 +323,10 @@ class TableEditor:
         entry.bind('<Escape>', cancel_edit)
 
     def _import_csv(self):
-        """导入 CSV 文件"""
+        """导入 CSV 文件（在后台线程中读取）"""
+        if self._import_thread is not None:
+            return
+
         file_path = filedialog.askopenfilename(
             title="选择 CSV 文件",
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
@@ -184,19 +334,65 @@ class TableEditor:
         if not file_path:
             return
 
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
+        self._import_cancel = threading.Event()
+        self._import_progress = 0.0
+        self._import_result = None
+        self._import_thread = threading.Thread(
+            target=self._import_worker, args=(file_path, self._import_cancel), daemon=True)
+        self._import_thread.start()
 
-            if rows:
-                self.headers = rows[0]
-                self.data = rows[1:] if len(rows) > 1 else []
-                self._update_tree_columns()
+        self.import_button.configure(state=tk.DISABLED)
+        self.status_var.set("正在导入...")
+        self.progress['value'] = 0
+        self.progress.pack(side=tk.LEFT, padx=5)
+        self.dialog.after(100, self._poll_import)
 
-            messagebox.showinfo("成功", f"已导入 {len(self.data)} 行数据")
+    def _import_worker(self, file_path: str, cancelled: threading.Event):
+        """后台线程：读取 CSV，结果由 _poll_import 在主线程中取用"""
+        def progress(fraction):
+            self._import_progress = fraction
+
+        try:
+            self._import_result = TableStore.from_csv(file_path, progress, cancelled)
         except Exception as e:
-            messagebox.showerror("错误", f"导入失败: {e}")
+            self._import_result = e
+
+    def _poll_import(self):
+        """在主线程中更新进度并在导入结束后刷新表格"""
+        if self._import_thread is None:
+            return
+        if self._import_thread.is_alive():
+            self.progress['value'] = self._import_progress * 100
+            self.dialog.after(100, self._poll_import)
+            return
+
+        result = self._import_result
+        self._import_thread = None
+        self._import_result = None
+        self.progress.pack_forget()
+        self.status_var.set("")
+        self.import_button.configure(state=tk.NORMAL)
+
+        if isinstance(result, Exception):
+            messagebox.showerror("错误", f"导入失败: {result}")
+            return
+        if result is None:
+            # 关闭对话框取消导入时不会到达这里，None 只表示文件为空
+            messagebox.showwarning("提示", "文件为空，未导入数据")
+            return
+
+        self.store = result
+        self._top = 0
+        self._selected_rows = set()
+        self._update_tree_columns()
+        messagebox.showinfo("成功", f"已导入 {self.store.row_count} 行数据")
+
+    def _close(self):
+        """关闭对话框，同时停止未完成的导入"""
+        if self._import_cancel is not None:
+            self._import_cancel.set()
+        self._import_thread = None
+        self.dialog.destroy()
 
     def _show_export_dialog(self):
         """显示导出对话框"""
@@ -221,15 +417,7 @@ class TableEditor:
             fmt = format_var.get()
             caption = caption_var.get()
 
-            if fmt == "latex":
-                content = self._export_latex(caption)
-                ext = ".tex"
-            elif fmt == "markdown":
-                content = self._export_markdown(caption)
-                ext = ".md"
-            else:
-                content = self._export_csv()
-                ext = ".csv"
+            ext = {"latex": ".tex", "markdown": ".md"}.get(fmt, ".csv")
 
             file_path = filedialog.asksaveasfilename(
                 title="保存文件",
@@ -239,8 +427,14 @@ class TableEditor:
 
             if file_path:
                 try:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(content)
+                    # 逐行写入，不在内存中拼接整个表格
+                    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                        if fmt == "latex":
+                            self._export_latex(caption, f)
+                        elif fmt == "markdown":
+                            self._export_markdown(caption, f)
+                        else:
+                            self._export_csv(f)
                     messagebox.showinfo("成功", f"已导出到: {file_path}")
                     dialog.destroy()
                 except Exception as e:
@@ -248,70 +442,23 @@ class TableEditor:
 
         ttk.Button(dialog, text="导出", command=do_export).pack(pady=20)
 
-    def _export_latex(self, caption: str) -> str:
+    def _export_latex(self, caption: str, output):
         """导出为 LaTeX"""
-        lines = []
-        lines.append("\\begin{table}[htbp]")
-        lines.append("\\centering")
-        lines.append(f"\\caption{{{caption}}}")
+        write_lines(latex_table_lines(self.store.iter_rows(), caption), output)
 
-        col_format = "c" * len(self.headers)
-        lines.append(f"\\begin{{tabular}}{{{'|'.join(col_format)}}}")
-        lines.append("\\hline")
-
-        # 表头
-        lines.append(" & ".join(self.headers) + " \\\\")
-        lines.append("\\hline")
-
-        # 数据
-        for row in self.data:
-            escaped = [self._escape_latex(cell) for cell in row]
-            lines.append(" & ".join(escaped) + " \\\\")
-
-        lines.append("\\hline")
-        lines.append("\\end{tabular}")
-        lines.append("\\label{tab:" + caption.replace(' ', '_') + "}")
-        lines.append("\\end{table}")
-
-        return "\n".join(lines)
-
-    def _export_markdown(self, caption: str) -> str:
+    def _export_markdown(self, caption: str, output):
         """导出为 Markdown"""
-        lines = []
-
-        # 表头
-        lines.append("| " + " | ".join(self.headers) + " |")
-        lines.append("| " + " | ".join(["---"] * len(self.headers)) + " |")
-
-        # 数据
-        for row in self.data:
-            lines.append("| " + " | ".join(row) + " |")
-
-        lines.append("")
-        lines.append(f"*{caption}*")
-
-        return "\n".join(lines)
+        write_lines(markdown_table_lines(self.store.iter_rows()), output)
+        output.write(f"\n*{caption}*\n")
 
-    def _export_csv(self) -> str:
+    def _export_csv(self, output):
         """导出为 CSV"""
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(self.headers)
-        writer.writerows(self.data)
-        return output.getvalue()
-
-    def _escape_latex(self, text: str) -> str:
-        """转义 LaTeX 特殊字符"""
-        special = {'&': r'\&', '%': r'\%', '$': r'\$', '#': r'\#',
-                   '_': r'\_', '{': r'\{', '}': r'\}', '~': r'\textasciitilde{}',
-                   '^': r'\textasciicircum{}'}
-        for char, replacement in special.items():
-            text = text.replace(char, replacement)
-        return text
+        csv.writer(output).writerows(self.store.iter_rows())
 
     def _clear(self):
         """清空表格"""
         if messagebox.askyesno("确认", "确定要清空所有数据吗?"):
-            self.headers = ["列1", "列2", "列3"]
-            self.data = [["", "", ""]]
+            self.store = TableStore()
+            self._top = 0
+            self._selected_rows = set()
             self._update_tree_columns()
@@ -0,0 +1,133 @@
+"""
+表格编辑器的数据存储
+按列保存单元格文本，不依赖 Tk 控件，TableEditor 只负责显示可见的行
+"""
+
+import csv
+import io
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional
+
+
+class TableStore:
+    """
+    按列存储的表格数据
+
+    每列是一个字符串列表，没有逐行的列表对象；
+    导入时同一列中相同的文本只保存一份，重复值较多的大表内存占用明显减少。
+    """
+
+    def __init__(self, headers: Optional[List[str]] = None, row_count: int = 1):
+        """
+        Args:
+            headers: 表头，默认为三列
+            row_count: 初始空行数
+        """
+        self.headers = list(headers or ["列1", "列2", "列3"])
+        self.columns: List[List[str]] = [[""] * row_count for _ in self.headers]
+
+    @property
+    def row_count(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    @property
+    def col_count(self) -> int:
+        return len(self.headers)
+
+    def row(self, index: int) -> List[str]:
+        """第 index 行的单元格"""
+        return [column[index] for column in self.columns]
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[List[str]]:
+        """按行读取 [start, stop) 范围内的数据"""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        return (list(cells) for cells in zip(*(column[start:stop] for column in self.columns)))
+
+    def iter_rows(self) -> Iterator[List[str]]:
+        """表头以及全部数据行，供导出使用"""
+        yield list(self.headers)
+        # 分段转置，避免一次生成全部行
+        for start in range(0, self.row_count, 4096):
+            yield from self.rows(start, start + 4096)
+
+    def get(self, row: int, col: int) -> str:
+        return self.columns[col][row]
+
+    def set(self, row: int, col: int, value: str):
+        self.columns[col][row] = value
+
+    def append_row(self):
+        """在末尾添加空行"""
+        for column in self.columns:
+            column.append("")
+
+    def delete_rows(self, indices: Iterable[int]):
+        """删除若干行"""
+        indices = sorted(set(indices), reverse=True)
+        if len(indices) > 64:
+            # 删除的行较多时整列重建，避免逐个删除时反复移动元素
+            removed = set(indices)
+            self.columns = [[value for i, value in enumerate(column) if i not in removed]
+                            for column in self.columns]
+            return
+        for column in self.columns:
+            for index in indices:
+                del column[index]
+
+    def add_column(self, header: str):
+        """在末尾添加空列"""
+        self.headers.append(header)
+        self.columns.append([""] * self.row_count)
+
+    def remove_column(self):
+        """删除最后一列（至少保留一列）"""
+        if len(self.headers) > 1:
+            self.headers.pop()
+            self.columns.pop()
+
+    @classmethod
+    def from_csv(cls, file_path: str, progress: Optional[Callable[[float], None]] = None,
+                 cancelled: Optional[threading.Event] = None) -> Optional['TableStore']:
+        """
+        从 CSV 文件读取，第一行作为表头（可在后台线程中调用）
+
+        Args:
+            file_path: CSV 文件路径
+            progress: 进度回调，参数为 0~1 之间的已读比例
+            cancelled: 设置后停止读取
+
+        Returns:
+            TableStore；文件为空或已取消时返回 None
+        """
+        with open(file_path, 'rb') as raw:
+            raw.seek(0, io.SEEK_END)
+            size = raw.tell() or 1
+            raw.seek(0)
+
+            f = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+            reader = csv.reader(f)
+            headers = next(reader, None)
+            if not headers:
+                return None
+
+            width = len(headers)
+            columns: List[List[str]] = [[] for _ in range(width)]
+            # 每列的文本驻留表，相同的单元格共用一个字符串对象
+            pools = [{} for _ in range(width)]
+            padding = [""] * width
+
+            for count, row in enumerate(reader, 1):
+                if len(row) != width:
+                    row = (row + padding)[:width]
+                for column, pool, value in zip(columns, pools, row):
+                    column.append(pool.setdefault(value, value))
+
+                if count % 4096 == 0:
+                    if cancelled is not None and cancelled.is_set():
+                        return None
+                    if progress is not None:
+                        progress(raw.tell() / size)
+
+        store = cls(headers, 0)
+        store.columns = columns
+        return store
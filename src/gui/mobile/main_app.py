@@ -174,16 +174,10 @@ class Markdown2AcademiaApp(App):
             if output_format == 'docx':
                 output_file = os.path.join(output_dir, f'{base_name}.docx')
                 converter = MarkdownToDocxConverter()
-                # 创建临时 md 文件
-                temp_md = os.path.join(output_dir, f'_{base_name}_temp.md')
-                with open(temp_md, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                try:
-                    converter.convert(temp_md, output_file, template='thesis')
-                    self.status_label.text = f'Word 导出成功: {output_file}'
-                finally:
-                    if os.path.exists(temp_md):
-                        os.unlink(temp_md)
+                docx_bytes = converter.convert_string(content, template='thesis')
+                with open(output_file, 'wb') as f:
+                    f.write(docx_bytes)
+                self.status_label.text = f'Word 导出成功: {output_file}'
 
             elif output_format == 'latex':
                 output_file = os.path.join(output_dir, f'{base_name}.tex')
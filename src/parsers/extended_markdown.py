@@ -0,0 +1,300 @@
+"""
+扩展 Markdown 语法解析器
+单次线性扫描，把文档切分为类型化的块流，供 Word / LaTeX / 预览三个前端共用
+
+扩展语法:
+    #abstract 内容...        中文摘要（内容可换行，直到下一个以 # 开头的行）
+    #abstract-en 内容...     英文摘要
+    #keywords 关键词1, 关键词2
+    #figure 标题 | path.png | width=80%
+    #table 标题 | data.csv | header=true
+    #equation E=mc^2 | label=eq-1
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List
+
+
+# 扩展指令：名称后必须是空白或行尾，避免 #abstract 误匹配 #abstract-en
+_DIRECTIVE_RE = re.compile(r'^#(abstract-en|abstract|keywords|figure|table|equation)(?=\s|$)\s*(.*)$')
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)(?:\s+#+)?\s*$')
+_FENCE_RE = re.compile(r'^(`{3,}|~{3,})\s*([\w+-]*)')
+_LABEL_RE = re.compile(r'^(.*?)\s*\|\s*label=(\S+)\s*$')
+
+
+@dataclass
+class Block:
+    """块基类"""
+    start: int          # 起始行号（从 0 开始）
+    end: int            # 结束行号（不含）
+    source: str         # 块对应的原始 Markdown 文本
+
+
+@dataclass
+class FrontMatter(Block):
+    """YAML 元数据块"""
+    metadata: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class Heading(Block):
+    """标题"""
+    level: int = 1
+    text: str = ""
+
+
+@dataclass
+class Abstract(Block):
+    """摘要，lang 为 zh 或 en"""
+    lang: str = "zh"
+    text: str = ""
+
+
+@dataclass
+class Keywords(Block):
+    """关键词"""
+    text: str = ""
+
+
+@dataclass
+class Figure(Block):
+    """#figure 图片"""
+    caption: str = ""
+    path: str = ""
+    options: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class Table(Block):
+    """#table 数据表格"""
+    caption: str = ""
+    path: str = ""
+    options: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class Equation(Block):
+    """#equation 公式"""
+    latex: str = ""
+    label: str = ""
+
+
+@dataclass
+class CodeBlock(Block):
+    """围栏代码块"""
+    lang: str = ""
+    code: str = ""
+
+
+@dataclass
+class Text(Block):
+    """普通 Markdown 文本（段落、列表、表格等连续的非空行）"""
+    text: str = ""
+
+
+def parse_options(options: str) -> Dict[str, str]:
+    """
+    解析指令选项
+
+    Args:
+        options: 如 "width=80%" 或 "sheet=Results range=A1:F200"
+
+    Returns:
+        选项字典，无值的选项记为 "true"
+    """
+    result = {}
+    for token in re.split(r'[\s,]+', options.strip()):
+        if not token:
+            continue
+        key, sep, value = token.partition('=')
+        result[key.strip().lower()] = value.strip() if sep else "true"
+    return result
+
+
+def _parse_front_matter(lines: List[str]) -> Dict[str, str]:
+    """解析简单的 key: value 形式元数据"""
+    metadata = {}
+    for line in lines:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            metadata[key.strip()] = value.strip().strip('"').strip("'")
+    return metadata
+
+
+def _split_pipe_directive(body: str):
+    """拆分 `标题 | 路径 | 选项` 形式的指令，格式不符时返回 None"""
+    parts = [part.strip() for part in body.split('|', 2)]
+    if len(parts) < 2 or not parts[0] or not parts[1]:
+        return None
+    options = parse_options(parts[2]) if len(parts) > 2 else {}
+    return parts[0], parts[1], options
+
+
+def iter_blocks(content: str) -> Iterator[Block]:
+    """
+    单次扫描，逐块产出解析结果
+
+    Args:
+        content: Markdown 原文
+
+    Yields:
+        Block 子类实例，按文档顺序
+    """
+    lines = content.replace('\r\n', '\n').split('\n')
+    n = len(lines)
+    i = 0
+
+    # YAML 元数据只能出现在文档开头
+    if n and lines[0].strip() == '---':
+        for j in range(1, n):
+            if lines[j].strip() in ('---', '...'):
+                yield FrontMatter(0, j + 1, '\n'.join(lines[:j + 1]),
+                                  metadata=_parse_front_matter(lines[1:j]))
+                i = j + 1
+                break
+
+    while i < n:
+        line = lines[i]
+
+        # 空行只作为块分隔
+        if not line.strip():
+            i += 1
+            continue
+
+        # 围栏代码块（内部的 # 行不作为指令或标题）
+        fence = _FENCE_RE.match(line)
+        if fence:
+            marker = fence.group(1)
+            j = i + 1
+            while j < n and not lines[j].startswith(marker):
+                j += 1
+            end = min(j + 1, n)
+            yield CodeBlock(i, end, '\n'.join(lines[i:end]),
+                            lang=fence.group(2), code='\n'.join(lines[i + 1:j]))
+            i = end
+            continue
+
+        if line.startswith('#'):
+            directive = _DIRECTIVE_RE.match(line)
+            if directive:
+                block = _parse_directive(directive.group(1), directive.group(2).strip(), lines, i)
+                if block is not None:
+                    yield block
+                    i = block.end
+                    continue
+
+            heading = _HEADING_RE.match(line)
+            if heading:
+                yield Heading(i, i + 1, line, level=len(heading.group(1)), text=heading.group(2))
+                i += 1
+                continue
+
+        # 普通文本：收集到空行、标题/指令行或代码围栏为止
+        j = i + 1
+        while j < n and lines[j].strip() and not lines[j].startswith('#') \
+                and not _FENCE_RE.match(lines[j]):
+            j += 1
+        text = '\n'.join(lines[i:j])
+        yield Text(i, j, text, text=text)
+        i = j
+
+
+def _parse_directive(name: str, body: str, lines: List[str], i: int):
+    """解析第 i 行的扩展指令，格式不符时返回 None（按普通文本处理）"""
+    line = lines[i]
+
+    if name in ('abstract', 'abstract-en'):
+        # 摘要内容延续到下一个以 # 开头的行
+        j = i + 1
+        while j < len(lines) and not lines[j].startswith('#'):
+            j += 1
+        # 末尾空行不属于摘要
+        while j > i + 1 and not lines[j - 1].strip():
+            j -= 1
+        text = '\n'.join([body] + lines[i + 1:j]).strip()
+        return Abstract(i, j, '\n'.join(lines[i:j]),
+                        lang='en' if name == 'abstract-en' else 'zh', text=text)
+
+    if name == 'keywords':
+        return Keywords(i, i + 1, line, text=body)
+
+    if name == 'equation':
+        if not body:
+            return None
+        label_match = _LABEL_RE.match(body)
+        if label_match:
+            return Equation(i, i + 1, line, latex=label_match.group(1), label=label_match.group(2))
+        return Equation(i, i + 1, line, latex=body)
+
+    parts = _split_pipe_directive(body)
+    if parts is None:
+        return None
+    caption, path, options = parts
+    block_type = Figure if name == 'figure' else Table
+    return block_type(i, i + 1, line, caption=caption, path=path, options=options)
+
+
+def parse(content: str) -> List[Block]:
+    """
+    解析整个文档
+
+    Args:
+        content: Markdown 原文
+
+    Returns:
+        块列表
+    """
+    return list(iter_blocks(content))
+
+
+def split_chapters(blocks: List[Block]) -> List[List[Block]]:
+    """
+    在一级标题处把块列表切分为章节
+
+    Args:
+        blocks: 块列表
+
+    Returns:
+        章节列表，第一个一级标题之前的内容（元数据、摘要等）单独作为第一段
+    """
+    chapters: List[List[Block]] = []
+    for block in blocks:
+        if not chapters or (isinstance(block, Heading) and block.level == 1):
+            chapters.append([])
+        chapters[-1].append(block)
+    return chapters
+
+
+def extract_metadata(blocks: List[Block]) -> Dict[str, str]:
+    """从块列表中取出 YAML 元数据"""
+    if blocks and isinstance(blocks[0], FrontMatter):
+        return dict(blocks[0].metadata)
+    return {}
+
+
+_IMAGE_RE = re.compile(r'!\[[^\]]*\]\(([^)\s]+)')
+
+
+def referenced_files(blocks: List[Block]) -> List[str]:
+    """
+    收集文档引用的本地文件（#figure / #table 数据和 Markdown 图片）
+
+    Args:
+        blocks: 块列表
+
+    Returns:
+        按出现顺序去重的相对路径列表
+    """
+    files = []
+    for block in blocks:
+        if isinstance(block, (Figure, Table)):
+            paths = [block.path]
+        elif isinstance(block, (Text, Abstract)):
+            paths = _IMAGE_RE.findall(block.text)
+        else:
+            continue
+        for path in paths:
+            if '://' not in path and path not in files:
+                files.append(path)
+    return files
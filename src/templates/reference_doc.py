@@ -0,0 +1,158 @@
+"""
+模板 reference.docx 生成与缓存
+按模板样式修改 pandoc 内置的 reference.docx，作为 --reference-doc 传给 pandoc，
+这样正文、标题样式和页面设置直接由 pandoc 写入，python-docx 只需补充封面和页眉页脚。
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt, Mm
+
+from src.converters.pandoc_runner import get_pandoc_runner
+from src.templates.registry import TemplateStyle
+from src.utils.config import Config
+
+
+# 样式生成逻辑变化时递增，使磁盘上旧的 reference.docx 失效
+REFERENCE_VERSION = 1
+
+REFERENCE_DIR = "reference"
+
+
+def apply_document_styles(doc: Document, style: TemplateStyle):
+    """
+    把模板的页面、标题和正文样式写入文档
+
+    Args:
+        doc: python-docx Document
+        style: 模板样式
+    """
+    # 页面尺寸和页边距
+    page = style.page
+    for section in doc.sections:
+        section.page_width = Mm(page.width)
+        section.page_height = Mm(page.height)
+        section.top_margin = Mm(page.margin_top)
+        section.bottom_margin = Mm(page.margin_bottom)
+        section.left_margin = Mm(page.margin_left)
+        section.right_margin = Mm(page.margin_right)
+
+    fonts = style.chinese_fonts
+    sizes = style.font_sizes
+
+    # 标题 1 - 章标题
+    heading = doc.styles['Heading 1']
+    font = heading.font
+    font.name = fonts.heading
+    font.size = Pt(sizes.chapter_title)
+    font.bold = True
+    paragraph_format = heading.paragraph_format
+    paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    paragraph_format.space_before = Pt(24)
+    paragraph_format.space_after = Pt(18)
+
+    # 标题 2 - 节标题
+    font = doc.styles['Heading 2'].font
+    font.name = fonts.heading
+    font.size = Pt(sizes.section_title)
+    font.bold = True
+
+    # 标题 3
+    font = doc.styles['Heading 3'].font
+    font.name = fonts.heading
+    font.size = Pt(sizes.subsection_title)
+    font.bold = True
+
+    # 正文，缩进和段距以字符宽度计
+    body_size = sizes.body
+    paragraph = style.paragraph
+    normal = doc.styles['Normal']
+    font = normal.font
+    font.name = fonts.body
+    font.size = Pt(body_size)
+    paragraph_format = normal.paragraph_format
+    paragraph_format.line_spacing = paragraph.line_spacing
+    paragraph_format.first_line_indent = Pt(body_size * paragraph.first_line_indent)
+    paragraph_format.space_after = Pt(body_size * paragraph.paragraph_spacing)
+
+
+class ReferenceDocCache:
+    """按模板内容缓存生成的 reference.docx"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        if cache_dir is None:
+            cache_dir = Config().config_path.parent / REFERENCE_DIR
+        self.cache_dir = Path(cache_dir)
+        # 样式对象 -> reference.docx 路径
+        self._paths: Dict[TemplateStyle, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, style: TemplateStyle) -> Optional[str]:
+        """
+        获取模板对应的 reference.docx
+
+        Args:
+            style: 模板样式
+
+        Returns:
+            文件路径；pandoc 不可用或无法生成时返回 None，由调用方回退为 python-docx 后处理
+        """
+        with self._lock:
+            path = self._paths.get(style)
+            if path and os.path.exists(path):
+                return path
+
+            try:
+                path = str(self.cache_dir / f"{style.name}-{self._digest(style)}.docx")
+                if not os.path.exists(path):
+                    self._build(style, path)
+            except (RuntimeError, OSError):
+                return None
+
+            self._paths[style] = path
+            return path
+
+    def _digest(self, style: TemplateStyle) -> str:
+        """模板 YAML 内容、生成逻辑版本和 pandoc 版本的摘要（内置 reference.docx 随 pandoc 版本变化）"""
+        h = hashlib.sha256(f'{REFERENCE_VERSION}\0'.encode('ascii'))
+        h.update(get_pandoc_runner().version().encode('utf-8') + b'\0')
+        with open(style.path, 'rb') as f:
+            h.update(f.read())
+        return h.hexdigest()[:16]
+
+    def _build(self, style: TemplateStyle, path: str):
+        """以 pandoc 内置 reference.docx 为基础生成模板的 reference.docx"""
+        base = get_pandoc_runner().default_data_file('reference.docx')
+        doc = Document(io.BytesIO(base))
+        apply_document_styles(doc, style)
+
+        # 先写临时文件再原子替换，避免并行进程读到不完整的文件
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            doc.save(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+
+# 全局实例
+_cache: Optional[ReferenceDocCache] = None
+
+
+def get_reference_doc(style: TemplateStyle) -> Optional[str]:
+    """获取模板对应的 reference.docx 路径"""
+    global _cache
+    if _cache is None:
+        _cache = ReferenceDocCache()
+    return _cache.get(style)
@@ -0,0 +1,291 @@
+"""
+模板注册表
+读取 templates/*.yaml，编译为不可变的样式对象，供 Word / LaTeX / 预览共用。
+样式对象按文件修改时间缓存，修改 YAML 后下次取用时自动重新加载。
+"""
+
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+
+# 模板文件名后缀，如 thesis_template.yaml
+TEMPLATE_SUFFIX = "_template.yaml"
+
+# 未知模板名时使用的模板
+DEFAULT_TEMPLATE = "thesis"
+
+# 内置的排版方式，YAML 中通过 base 指定，新增学校模板时一般取 thesis
+BASES = ("thesis", "journal")
+
+_LENGTH_RE = re.compile(r'^\s*([\d.]+)\s*(mm|cm|in|pt|em)?\s*$')
+_MM_PER_UNIT = {'mm': 1.0, 'cm': 10.0, 'in': 25.4, 'pt': 25.4 / 72}
+
+
+@dataclass(frozen=True)
+class PageStyle:
+    """页面尺寸与页边距（毫米）"""
+    width: float = 210.0
+    height: float = 297.0
+    margin_top: float = 25.0
+    margin_bottom: float = 25.0
+    margin_left: float = 30.0
+    margin_right: float = 30.0
+
+
+@dataclass(frozen=True)
+class FontSet:
+    """一种语言的字体"""
+    title: str
+    heading: str
+    body: str
+    code: str
+
+
+@dataclass(frozen=True)
+class FontSizes:
+    """字号（磅）"""
+    chapter_title: float = 16
+    section_title: float = 14
+    subsection_title: float = 12
+    body: float = 12
+    caption: float = 10.5
+    footnote: float = 9
+
+
+@dataclass(frozen=True)
+class ParagraphStyle:
+    """段落设置，缩进和段距以字符宽度（em）计"""
+    line_spacing: float = 1.5
+    first_line_indent: float = 2.0
+    paragraph_spacing: float = 0.0
+
+
+@dataclass(frozen=True)
+class HeaderFooterStyle:
+    """页眉页脚，header_content 中可用 {school} 等元数据占位符"""
+    header_content: str = ""
+    footer_page_number: bool = True
+
+
+@dataclass(frozen=True)
+class CoverStyle:
+    """封面"""
+    show_school_name: bool = False
+    school_name_size: float = 26
+    show_thesis_type: bool = False
+    thesis_type: str = ""
+    thesis_type_size: float = 36
+    title_size: float = 22
+    info_font_size: float = 14
+
+
+@dataclass(frozen=True)
+class TocStyle:
+    """目录"""
+    show_toc: bool = False
+    toc_title: str = "目录"
+    toc_depth: int = 3
+
+
+@dataclass(frozen=True)
+class TemplateStyle:
+    """编译后的模板样式"""
+    name: str
+    base: str
+    description: str
+    path: str
+    page: PageStyle
+    chinese_fonts: FontSet
+    english_fonts: FontSet
+    font_sizes: FontSizes
+    paragraph: ParagraphStyle
+    header_footer: HeaderFooterStyle
+    cover: CoverStyle
+    toc: TocStyle
+    bibliography_style: str = "gb7714"
+    bibliography_title: str = "参考文献"
+
+    def header_text(self, metadata: Dict[str, Any]) -> str:
+        """按元数据填充页眉内容，缺失的字段留空"""
+        return self.header_footer.header_content.format_map(_BlankDict(metadata))
+
+
+class _BlankDict(dict):
+    """format_map 用，缺失的键返回空串"""
+
+    def __missing__(self, key):
+        return ''
+
+
+def parse_length(value: Any, unit: str = 'mm') -> float:
+    """
+    解析长度
+
+    Args:
+        value: 如 "25mm"、"2em" 或数字
+        unit: 返回值的单位，mm 或 em（em 值原样返回）
+
+    Returns:
+        浮点数
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _LENGTH_RE.match(str(value))
+    if not match:
+        raise ValueError(f"无法解析长度: {value}")
+    number, source_unit = float(match.group(1)), match.group(2) or unit
+    if unit == 'em' or source_unit == 'em':
+        return number
+    return number * _MM_PER_UNIT[source_unit] / _MM_PER_UNIT[unit]
+
+
+def _font_set(data: Dict[str, Any], default: FontSet) -> FontSet:
+    """合并字体设置"""
+    return FontSet(
+        title=data.get('title', default.title),
+        heading=data.get('heading', default.heading),
+        body=data.get('body', default.body),
+        code=data.get('code', default.code),
+    )
+
+
+def compile_template(name: str, path: str, data: Dict[str, Any]) -> TemplateStyle:
+    """
+    把 YAML 数据编译为样式对象
+
+    Args:
+        name: 模板名称
+        path: YAML 文件路径
+        data: yaml.safe_load 的结果
+
+    Returns:
+        TemplateStyle
+    """
+    base = data.get('base', name if name in BASES else DEFAULT_TEMPLATE)
+    if base not in BASES:
+        raise ValueError(f"模板 {name} 的 base 必须是 {', '.join(BASES)} 之一: {base}")
+
+    page = data.get('page') or {}
+    fonts = data.get('fonts') or {}
+    sizes = data.get('font_sizes') or {}
+    paragraph = data.get('paragraph') or {}
+    header_footer = data.get('header_footer') or {}
+    cover = data.get('cover') or {}
+    toc = data.get('toc') or {}
+    bibliography = data.get('bibliography') or {}
+
+    return TemplateStyle(
+        name=name,
+        base=base,
+        description=data.get('description', ''),
+        path=path,
+        page=PageStyle(**{key: parse_length(page[key]) for key in PageStyle.__dataclass_fields__
+                          if key in page}),
+        chinese_fonts=_font_set(fonts.get('chinese') or {},
+                                FontSet(title='黑体', heading='黑体', body='宋体', code='宋体')),
+        english_fonts=_font_set(fonts.get('english') or {},
+                                FontSet(title='Times New Roman', heading='Times New Roman',
+                                        body='Times New Roman', code='Courier New')),
+        font_sizes=FontSizes(**{key: float(sizes[key]) for key in FontSizes.__dataclass_fields__
+                                if key in sizes}),
+        paragraph=ParagraphStyle(
+            line_spacing=float(paragraph.get('line_spacing', 1.5)),
+            first_line_indent=parse_length(paragraph.get('first_line_indent', 2), 'em'),
+            paragraph_spacing=parse_length(paragraph.get('paragraph_spacing', 0), 'em'),
+        ),
+        header_footer=HeaderFooterStyle(
+            header_content=str(header_footer.get('header_content', '')),
+            footer_page_number=bool(header_footer.get('footer_page_number', True)),
+        ),
+        cover=CoverStyle(**{key: cover[key] for key in CoverStyle.__dataclass_fields__
+                            if key in cover}),
+        toc=TocStyle(**{key: toc[key] for key in TocStyle.__dataclass_fields__ if key in toc}),
+        bibliography_style=bibliography.get('style', 'gb7714'),
+        bibliography_title=bibliography.get('title', '参考文献'),
+    )
+
+
+class TemplateRegistry:
+    """模板注册表"""
+
+    def __init__(self, templates_dir: Optional[str] = None):
+        self.templates_dir = Path(templates_dir or self._default_dir())
+        # 模板名 -> (修改时间, 样式)
+        self._compiled: Dict[str, Tuple[int, TemplateStyle]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _default_dir() -> str:
+        """模板目录（支持 PyInstaller）"""
+        try:
+            # PyInstaller 创建临时文件夹，将路径存储在 _MEIPASS 中
+            base_path = sys._MEIPASS
+        except Exception:
+            # 不依赖当前目录，批量转换时工作进程会切换到文档所在目录
+            base_path = Path(__file__).resolve().parents[2]
+        return os.path.join(base_path, "templates")
+
+    def names(self) -> List[str]:
+        """可用的模板名称"""
+        names = [path.name[:-len(TEMPLATE_SUFFIX)]
+                 for path in self.templates_dir.glob('*' + TEMPLATE_SUFFIX)]
+        # 内置模板排在前面
+        return sorted(names, key=lambda name: (BASES.index(name) if name in BASES else len(BASES),
+                                               name))
+
+    def path_for(self, name: str) -> str:
+        """模板 YAML 文件路径"""
+        return str(self.templates_dir / f"{name}{TEMPLATE_SUFFIX}")
+
+    def get(self, name: str) -> TemplateStyle:
+        """
+        获取编译后的模板样式
+
+        Args:
+            name: 模板名称，不存在时使用默认模板
+
+        Returns:
+            TemplateStyle
+        """
+        path = self.path_for(name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            if name == DEFAULT_TEMPLATE:
+                raise FileNotFoundError(f"未找到默认模板: {path}")
+            return self.get(DEFAULT_TEMPLATE)
+
+        with self._lock:
+            cached = self._compiled.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+            with open(path, 'r', encoding='utf-8') as f:
+                data = yaml.safe_load(f) or {}
+            style = compile_template(name, path, data)
+            self._compiled[name] = (mtime, style)
+            return style
+
+
+# 全局实例
+_registry: Optional[TemplateRegistry] = None
+
+
+def get_template_registry() -> TemplateRegistry:
+    """获取全局模板注册表"""
+    global _registry
+    if _registry is None:
+        _registry = TemplateRegistry()
+    return _registry
+
+
+def get_template(name: str) -> TemplateStyle:
+    """获取编译后的模板样式"""
+    return get_template_registry().get(name)
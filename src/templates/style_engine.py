@@ -0,0 +1,118 @@
+"""
+Word 段落样式引擎
+一次遍历 w:body 下的段落，按规则表设置段落格式和字符格式，
+代替多次访问 doc.paragraphs（每次访问都会为整个正文重建代理对象）。
+既可以作用于 python-docx Document，也可以作用于 OoxmlPackage 流式读取的正文元素。
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+from docx.oxml.ns import qn
+from docx.shared import Pt
+from docx.text.font import Font
+from docx.text.parfmt import ParagraphFormat
+
+_P = qn('w:p')
+_R = qn('w:r')
+_T = qn('w:t')
+
+
+@dataclass(frozen=True)
+class StyleRule:
+    """
+    段落样式规则
+
+    match 接收段落文本（已去除首尾空白）和段落序号，返回是否应用本规则；
+    值为 None 的属性保持不变。
+    """
+    match: Callable[[str, int], bool]
+    # 段落格式
+    alignment: Optional[int] = None
+    line_spacing: Optional[float] = None
+    # 字符格式（作用于段落中的所有 run）
+    font_name: Optional[str] = None
+    font_size: Optional[float] = None
+    bold: Optional[bool] = None
+
+    @property
+    def has_run_format(self) -> bool:
+        return self.font_name is not None or self.font_size is not None or self.bold is not None
+
+
+@dataclass(frozen=True)
+class BodySummary:
+    """遍历结果，供模板判断是否需要封面等"""
+    paragraph_count: int
+    first_text: str
+
+
+class StyleEngine:
+    """按规则表单次遍历文档正文"""
+
+    def __init__(self, rules: Sequence[StyleRule]):
+        self.rules: List[StyleRule] = list(rules)
+        # 最近一次遍历的结果
+        self.summary = BodySummary(0, '')
+
+    def apply(self, doc) -> BodySummary:
+        """
+        对正文的每个顶层段落依次尝试所有规则
+
+        Args:
+            doc: python-docx Document
+
+        Returns:
+            段落数和第一段文本
+        """
+        for _ in self.process(doc.element.body.iterchildren(_P)):
+            pass
+        return self.summary
+
+    def process(self, elements: Iterable) -> Iterator:
+        """
+        逐个处理正文顶层元素：段落应用规则，其他元素原样产出
+
+        遍历过程中 summary 随之更新，全部产出后为最终结果。
+
+        Args:
+            elements: w:body 的顶层元素
+
+        Yields:
+            处理后的元素
+        """
+        count = 0
+        first_text = ''
+        self.summary = BodySummary(0, '')
+
+        for element in elements:
+            if element.tag == _P:
+                text = ''.join(t.text or '' for t in element.iter(_T)).strip()
+                if count == 0:
+                    first_text = text
+
+                for rule in self.rules:
+                    if rule.match(text, count):
+                        self._apply_rule(element, rule)
+                count += 1
+                self.summary = BodySummary(count, first_text)
+            yield element
+
+    def _apply_rule(self, p, rule: StyleRule):
+        """对一个段落元素应用规则"""
+        if rule.alignment is not None or rule.line_spacing is not None:
+            paragraph_format = ParagraphFormat(p)
+            if rule.alignment is not None:
+                paragraph_format.alignment = rule.alignment
+            if rule.line_spacing is not None:
+                paragraph_format.line_spacing = rule.line_spacing
+
+        if rule.has_run_format:
+            for r in p.iterchildren(_R):
+                font = Font(r)
+                if rule.font_name is not None:
+                    font.name = rule.font_name
+                if rule.font_size is not None:
+                    font.size = Pt(rule.font_size)
+                if rule.bold is not None:
+                    font.bold = rule.bold
@@ -0,0 +1,207 @@
+"""
+转换结果缓存
+按 Markdown 内容、引用的数据/图片文件、模板和转换器版本计算内容哈希，
+命中时直接复制已生成的 docx/tex/pdf，跳过 pandoc 与模板后处理。
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from src import __version__
+from src.utils.config import Config
+
+
+class CacheUsage:
+    """
+    缓存目录的总大小（按最近使用时间进行 LRU 淘汰）
+
+    第一次写入时扫描目录，之后累加每次写入的大小；只有累计值超出上限，
+    或写入次数达到 RESCAN_INTERVAL 时才重新扫描目录并淘汰，避免每次写入都遍历整个缓存。
+    定期扫描用于校正其他进程写入和淘汰造成的偏差。
+    """
+
+    RESCAN_INTERVAL = 64
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._total: Optional[int] = None
+        self._writes = 0
+
+    def add(self, size: int):
+        """记录一次写入（size 为条目大小的变化量），必要时淘汰旧条目"""
+        self._writes += 1
+        if self._total is not None:
+            self._total += size
+        if (self._total is None or self._total > self.max_bytes
+                or self._writes >= self.RESCAN_INTERVAL):
+            self._total = self._evict()
+            self._writes = 0
+
+    def reset(self):
+        """缓存被清空后重新扫描"""
+        self._total = None
+        self._writes = 0
+
+    def _evict(self) -> int:
+        """扫描目录，超出上限时按最近使用时间淘汰旧条目，返回淘汰后的总大小"""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob('*/*'):
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return total
+
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+        return total
+
+
+class ConversionCache:
+    """转换结果缓存（按大小进行 LRU 淘汰）"""
+
+    CACHE_DIR = "cache"
+
+    # 默认缓存上限（MB），可通过配置项 cache_max_mb 修改
+    DEFAULT_MAX_MB = 500
+
+    # 缓存格式变化时递增，使旧缓存失效
+    CACHE_VERSION = 3
+
+    def __init__(self, cache_dir: Optional[str] = None, max_mb: Optional[int] = None):
+        config = Config()
+        if cache_dir is None:
+            cache_dir = config.config_path.parent / self.CACHE_DIR
+        if max_mb is None:
+            max_mb = config.get('cache_max_mb', self.DEFAULT_MAX_MB)
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb) * 1024 * 1024
+        self._usage = CacheUsage(self.cache_dir, self.max_bytes)
+
+        # 文件摘要缓存: 路径 -> ((大小, 修改时间), 摘要)
+        self._file_digests: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+    def make_key(self, md_content: str, output_format: str, template: str,
+                 assets: Iterable[str] = (), base_dir: Optional[str] = None) -> str:
+        """
+        计算缓存键
+
+        Args:
+            md_content: Markdown 内容
+            output_format: 输出格式
+            template: 模板名称
+            assets: 文档引用的文件（CSV、图片等）
+            base_dir: 相对路径的基准目录，默认为当前目录
+
+        Returns:
+            十六进制 SHA-256 摘要
+        """
+        base_dir = base_dir or os.getcwd()
+
+        h = hashlib.sha256()
+        h.update(f'{self.CACHE_VERSION}\0{__version__}\0{output_format}\0{template}\0'.encode('utf-8'))
+        h.update(md_content.encode('utf-8'))
+
+        for asset in sorted(set(assets)):
+            path = os.path.join(base_dir, asset)
+            h.update(b'\0' + asset.encode('utf-8') + b'\0')
+            h.update(self._file_digest(path).encode('ascii'))
+
+        return h.hexdigest()
+
+    def _file_digest(self, path: str) -> str:
+        """计算文件内容摘要（按大小和修改时间记忆，文件不存在时返回 missing）"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 'missing'
+
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = self._file_digests.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._file_digests[path] = (signature, digest)
+        return digest
+
+    def _entry_path(self, key: str) -> Path:
+        """缓存条目路径"""
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key: str, output_file: str) -> bool:
+        """
+        查找缓存，命中时复制到输出路径
+
+        Returns:
+            是否命中
+        """
+        entry = self._entry_path(key)
+        try:
+            shutil.copyfile(entry, output_file)
+        except FileNotFoundError:
+            return False
+
+        # 更新修改时间，作为 LRU 的最近使用时间
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return True
+
+    def put(self, key: str, output_file: str):
+        """将生成的文件存入缓存"""
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        previous = _file_size(entry)
+
+        # 先写临时文件再原子替换，避免并行进程读到不完整的条目
+        fd, temp_path = tempfile.mkstemp(dir=entry.parent, suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(output_file, temp_path)
+            os.replace(temp_path, entry)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+        self._usage.add(_file_size(entry) - previous)
+
+    def clear(self):
+        """清空缓存"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._usage.reset()
+
+
+def _file_size(path: Path) -> int:
+    """文件大小，不存在时为 0"""
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
@@ -54,6 +54,16 @@ class Config:
             self.get('mathpix_app_key', '')
         )
 
+    def get_mathpix_options(self) -> dict:
+        """获取 Mathpix 接口地址、并发数和限速设置（FormulaConverter 的关键字参数）"""
+        # 配置文件中的限速可能写成字符串（如 "2.5"），为空时不限速
+        rate = self.get('mathpix_requests_per_second')
+        return {
+            'api_url': self.get('mathpix_api_url') or None,
+            'max_workers': int(self.get('mathpix_max_workers', 4)),
+            'requests_per_second': float(rate) if rate not in (None, '') else None,
+        }
+
     def set_mathpix_credentials(self, app_id: str, app_key: str):
         """设置 Mathpix API 凭证"""
         self.set('mathpix_app_id', app_id)
@@ -0,0 +1,149 @@
+"""
+公式识别结果缓存
+以图片内容和请求格式的 SHA-256 为键，把 Mathpix 的识别结果保存在 SQLite 中，
+同一张截图再次识别时直接返回，不再发送付费请求，离线时也可用。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from src.utils.config import Config
+
+
+class FormulaCache:
+    """公式识别结果缓存（过期时间 + 按大小进行 LRU 淘汰）"""
+
+    DB_FILE = "formula_cache.sqlite3"
+
+    # 默认保留天数和容量上限（MB），可通过配置项 formula_cache_ttl_days / formula_cache_max_mb 修改
+    DEFAULT_TTL_DAYS = 90
+    DEFAULT_MAX_MB = 20
+
+    def __init__(self, db_path: Optional[str] = None, ttl_days: Optional[float] = None,
+                 max_mb: Optional[float] = None):
+        config = Config()
+        if db_path is None:
+            db_path = config.config_path.parent / self.DB_FILE
+        if ttl_days is None:
+            ttl_days = config.get('formula_cache_ttl_days', self.DEFAULT_TTL_DAYS)
+        if max_mb is None:
+            max_mb = config.get('formula_cache_max_mb', self.DEFAULT_MAX_MB)
+
+        self.db_path = Path(db_path)
+        self.ttl = float(ttl_days) * 24 * 3600
+        self.max_bytes = int(float(max_mb) * 1024 * 1024)
+
+        # 批量识别时多个线程共用一个连接
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库（首次使用时建表）"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=10, check_same_thread=False)
+            # WAL 模式下 GUI 与命令行同时使用时读写互不阻塞
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS formulas (
+                                key TEXT PRIMARY KEY,
+                                result TEXT NOT NULL,
+                                size INTEGER NOT NULL,
+                                created REAL NOT NULL,
+                                accessed REAL NOT NULL)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS formulas_accessed ON formulas (accessed)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(image_data: bytes, formats: Iterable[str]) -> str:
+        """
+        计算缓存键
+
+        Args:
+            image_data: 图片文件内容
+            formats: 请求的输出格式
+
+        Returns:
+            十六进制 SHA-256 摘要
+        """
+        h = hashlib.sha256()
+        h.update(','.join(sorted(formats)).encode('utf-8') + b'\0')
+        h.update(image_data)
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        查找识别结果
+
+        Returns:
+            Mathpix 返回的 JSON；未命中、已过期或数据库不可用时返回 None
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute('SELECT result, created FROM formulas WHERE key = ?',
+                                   (key,)).fetchone()
+                if row is None:
+                    return None
+                if self.ttl and now - row[1] > self.ttl:
+                    conn.execute('DELETE FROM formulas WHERE key = ?', (key,))
+                    conn.commit()
+                    return None
+                # 更新最近使用时间，作为 LRU 淘汰的依据
+                conn.execute('UPDATE formulas SET accessed = ? WHERE key = ?', (now, key))
+                conn.commit()
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError):
+            return None
+
+    def put(self, key: str, result: dict):
+        """保存识别结果（数据库不可用时忽略）"""
+        text = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute('INSERT OR REPLACE INTO formulas VALUES (?, ?, ?, ?, ?)',
+                             (key, text, len(text.encode('utf-8')), now, now))
+                self._evict(conn, now)
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目，超出容量时按最近使用时间淘汰旧条目"""
+        if self.ttl:
+            conn.execute('DELETE FROM formulas WHERE created < ?', (now - self.ttl,))
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM formulas').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        expired = []
+        for key, size in conn.execute('SELECT key, size FROM formulas ORDER BY accessed'):
+            expired.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany('DELETE FROM formulas WHERE key = ?', expired)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM formulas')
+            conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,39 @@
+"""
+转换结果缓存测试
+"""
+
+import os
+
+from src.utils.cache import CacheUsage, ConversionCache
+
+
+def _put(cache, tmp_path, name, size):
+    source = tmp_path / f'{name}.out'
+    source.write_bytes(b'x' * size)
+    cache.put(cache.make_key(name, 'docx', 'thesis'), str(source))
+
+
+def test_eviction_keeps_cache_under_limit(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / 'cache'), max_mb=1)
+    for index in range(5):
+        _put(cache, tmp_path, f'doc{index}', 300 * 1024)
+
+    entries = [path for path in (tmp_path / 'cache').glob('*/*')]
+    assert sum(path.stat().st_size for path in entries) <= cache.max_bytes
+    # 最近写入的条目保留
+    assert os.path.exists(cache._entry_path(cache.make_key('doc4', 'docx', 'thesis')))
+
+
+def test_directory_scanned_only_when_needed(tmp_path, monkeypatch):
+    """第一次写入后不再每次扫描目录，超出上限时才扫描"""
+    scans = []
+    original = CacheUsage._evict
+    monkeypatch.setattr(CacheUsage, '_evict', lambda self: scans.append(1) or original(self))
+
+    cache = ConversionCache(cache_dir=str(tmp_path / 'cache'), max_mb=1)
+    for index in range(10):
+        _put(cache, tmp_path, f'small{index}', 1024)
+    assert len(scans) == 1
+
+    _put(cache, tmp_path, 'large', 1024 * 1024)
+    assert len(scans) == 2
@@ -0,0 +1,193 @@
+"""
+公式识别批量请求测试
+FormulaConverter 指向本地的桩 HTTP 服务器，不访问 Mathpix。
+"""
+
+import base64
+import json
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.converters import formula_converter
+from src.converters.formula_converter import FormulaConverter
+from src.utils.config import Config
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """把请求交给 StubServer.handle 处理"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        status, headers, payload = self.server.stub.handle(body)
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer:
+    """
+    Mathpix 接口的桩服务器
+
+    图片内容即文本名称（如 img3），默认返回 latex_styled = "x_{img3}"。
+    responses 中预先放入的 (状态码, 响应头) 依次用于前几个请求。
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.delay = lambda name: 0.0
+        self.arrivals = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/v3/text'
+
+    def handle(self, body: dict):
+        name = base64.b64decode(body['src'].split(',', 1)[1]).decode('utf-8')
+        with self._lock:
+            self.arrivals.append(time.monotonic())
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            preset = self.responses.pop(0) if self.responses else None
+        try:
+            time.sleep(self.delay(name))
+            if preset is not None:
+                status, headers = preset
+                return status, headers, {'error': 'stub'}
+            return 200, {}, {'latex_styled': f'x_{{{name}}}'}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def server():
+    stub = StubServer()
+    stub.start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def images(tmp_path):
+    """8 个“图片”文件，内容为各自的名称"""
+    paths = []
+    for index in range(8):
+        path = tmp_path / f'img{index}.png'
+        path.write_bytes(f'img{index}'.encode('utf-8'))
+        paths.append(str(path))
+    return paths
+
+
+def _converter(server, **kwargs) -> FormulaConverter:
+    # 不使用缓存和预处理，请求体中直接是文件内容
+    return FormulaConverter('id', 'key', api_url=server.url, use_cache=False, preprocess=False,
+                            **kwargs)
+
+
+def test_results_in_input_order(server, images):
+    """先发出的请求较晚完成，结果仍与输入顺序一致"""
+    server.delay = lambda name: 0.02 * (8 - int(name[3:]))
+    converter = _converter(server, max_workers=8)
+
+    results = converter.image_to_latex_batch(images)
+
+    assert results == [f'x_{{img{index}}}' for index in range(8)]
+
+
+def test_retries_and_retry_after(server, images, monkeypatch):
+    """429 / 5xx 自动重试，Retry-After 指定的等待时间优先"""
+    sleeps = []
+    monkeypatch.setattr(formula_converter, 'time', types.SimpleNamespace(
+        sleep=sleeps.append, monotonic=time.monotonic))
+    server.responses = [(429, {'Retry-After': '7'}), (503, {})]
+    converter = _converter(server, max_workers=1)
+
+    assert converter.image_to_latex(images[0]) == 'x_{img0}'
+    assert len(server.arrivals) == 3
+    assert sleeps[0] == 7.0
+    assert len(sleeps) == 2
+
+
+def test_gives_up_after_max_retries(server, images, monkeypatch):
+    """超过重试次数后返回错误"""
+    monkeypatch.setattr(formula_converter, 'time', types.SimpleNamespace(
+        sleep=lambda seconds: None, monotonic=time.monotonic))
+    server.responses = [(500, {})] * 3
+    converter = _converter(server, max_workers=1, max_retries=2)
+
+    results = converter.image_to_latex_batch(images[:1])
+
+    assert results[0].startswith('Error:')
+    assert len(server.arrivals) == 3
+
+
+def test_max_workers_caps_concurrency(server, images):
+    """同时进行的请求数不超过 max_workers"""
+    server.delay = lambda name: 0.05
+    converter = _converter(server, max_workers=2)
+
+    converter.image_to_latex_batch(images)
+
+    assert server.max_active == 2
+
+
+def test_rate_limiter_spacing(server, images):
+    """请求速率不超过 requests_per_second"""
+    converter = _converter(server, max_workers=4, requests_per_second=20)
+
+    converter.image_to_latex_batch(images)
+
+    arrivals = sorted(server.arrivals)
+    # 8 个请求至少间隔 7 个 1/20 秒（留出计时误差）
+    assert arrivals[-1] - arrivals[0] >= 7 / 20 * 0.9
+
+
+def test_progress_called_once_per_image(server, images):
+    """每张图片完成时回调一次"""
+    calls = []
+    converter = _converter(server, max_workers=4)
+
+    results = converter.image_to_latex_batch(
+        images, progress=lambda done, total, path, result: calls.append((done, total, path, result)))
+
+    assert [done for done, _, _, _ in calls] == list(range(1, 9))
+    assert all(total == 8 for _, total, _, _ in calls)
+    assert sorted(path for _, _, path, _ in calls) == sorted(images)
+    for _, _, path, result in calls:
+        assert result == results[images.index(path)]
+
+
+def test_config_rate_is_converted_to_float(monkeypatch):
+    """配置文件中写成字符串的限速转换为数字"""
+    monkeypatch.setattr(Config, 'get', lambda self, key, default=None:
+                        '2.5' if key == 'mathpix_requests_per_second' else default)
+    assert Config().get_mathpix_options()['requests_per_second'] == 2.5
+
+    monkeypatch.setattr(Config, 'get', lambda self, key, default=None: default)
+    assert Config().get_mathpix_options()['requests_per_second'] is None
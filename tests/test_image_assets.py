@@ -0,0 +1,92 @@
+"""
+插图预处理测试
+"""
+
+import base64
+import os
+
+import pytest
+from PIL import Image
+
+from src.converters.image_assets import ImageAssets
+from src.converters.latex_exporter import LatexExporter
+from src.converters.markdown_to_docx import MarkdownToDocxConverter
+from src.converters.pandoc_runner import PandocRunner
+from src.parsers.extended_markdown import parse
+from src.templates.registry import PageStyle, get_template
+
+
+PAGE = PageStyle()
+
+
+@pytest.fixture
+def assets(tmp_path):
+    return ImageAssets(cache_dir=str(tmp_path / 'cache'), dpi=100, max_mb=10, workers=2)
+
+
+@pytest.fixture
+def document_dir(tmp_path, monkeypatch):
+    """文档目录中有大图；当前目录中有同名的另一张图"""
+    doc = tmp_path / 'doc'
+    doc.mkdir()
+    Image.new('RGB', (4000, 1000), 'blue').save(doc / 'fig.png')
+
+    cwd = tmp_path / 'cwd'
+    cwd.mkdir()
+    Image.new('RGB', (3000, 3000), 'red').save(cwd / 'fig.png')
+    monkeypatch.chdir(cwd)
+    return str(doc)
+
+
+def test_relative_paths_use_base_dir(assets, document_dir):
+    prepared = assets.prepare('fig.png', PAGE, 0.5, base_dir=document_dir)
+
+    with Image.open(prepared) as image:
+        assert image.width == assets.target_width(PAGE, 0.5)
+        assert image.getpixel((0, 0)) == (0, 0, 255)
+
+
+def test_prepare_all_uses_base_dir(assets, document_dir):
+    [prepared] = assets.prepare_all([('fig.png', 0.5)], PAGE, base_dir=document_dir)
+
+    with Image.open(prepared) as image:
+        assert image.getpixel((0, 0)) == (0, 0, 255)
+
+
+def test_small_images_keep_original_path(assets, tmp_path):
+    Image.new('RGB', (10, 10)).save(tmp_path / 'small.png')
+
+    assert assets.prepare('small.png', PAGE, 0.5, base_dir=str(tmp_path)) == 'small.png'
+    assert assets.prepare('missing.png', PAGE, 0.5, base_dir=str(tmp_path)) == 'missing.png'
+
+
+def test_latex_figures_use_base_dir(assets, document_dir):
+    latex = LatexExporter(assets).convert_body('#figure 图 | fig.png | width=50%\n',
+                                               base_dir=document_dir)
+
+    path = latex.split('\\includegraphics[width=0.5\\textwidth]{', 1)[1].split('}', 1)[0]
+    assert os.path.isabs(path)
+    with Image.open(path) as image:
+        assert image.getpixel((0, 0)) == (0, 0, 255)
+
+
+def test_docx_figures_use_base_dir(assets, document_dir):
+    converter = MarkdownToDocxConverter(native_math=False, optimize_images=False)
+    converter.image_assets = assets
+
+    markdown = converter._preprocess_markdown(parse('#figure 图 | fig.png | width=50%\n'),
+                                              style=get_template('thesis'), base_dir=document_dir)
+
+    path = markdown.split('](', 1)[1].split(')', 1)[0]
+    assert path != 'fig.png'
+    with Image.open(path) as image:
+        assert image.getpixel((0, 0)) == (0, 0, 255)
+
+
+def test_pandoc_resources_read_from_base_dir(document_dir):
+    """server 请求中的文件按文档中的写法作为键，内容从 base_dir 读取"""
+    request = PandocRunner(use_server=False)._build_request(
+        '![](fig.png)', 'markdown', 'docx', {'resource_path': document_dir}, ['fig.png'])
+
+    with open(os.path.join(document_dir, 'fig.png'), 'rb') as f:
+        assert base64.b64decode(request['files']['fig.png']) == f.read()
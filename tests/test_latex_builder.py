@@ -0,0 +1,79 @@
+"""
+LaTeX 增量构建测试
+用一个 Python 脚本代替 xelatex：把 document.tex 的内容写入 document.pdf，
+源码中含 FAIL 时只写出一部分 PDF 并以非零状态退出。
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+from src.converters.latex_builder import LatexBuilder
+from src.converters.latex_exporter import END_OF_DUMP, LatexExporter
+
+
+_FAKE_XELATEX = '''#!{python}
+import sys
+source = open('document.tex', encoding='utf-8').read()
+with open('document.log', 'w') as log:
+    log.write('! fake error\\n' if 'FAIL' in source else 'ok\\n')
+with open('document.pdf', 'w', encoding='utf-8') as pdf:
+    pdf.write('partial' if 'FAIL' in source else source)
+sys.exit(1 if 'FAIL' in source else 0)
+'''
+
+
+@pytest.fixture
+def builder(tmp_path):
+    if os.name == 'nt':
+        pytest.skip("假 xelatex 脚本依赖 shebang")
+    script = tmp_path / 'xelatex'
+    script.write_text(_FAKE_XELATEX.format(python=sys.executable), encoding='utf-8')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return LatexBuilder(build_root=str(tmp_path / 'build'), executable=str(script),
+                        use_format=False)
+
+
+def test_unchanged_source_is_reused(builder, tmp_path):
+    output = str(tmp_path / 'out.pdf')
+
+    assert builder.build('good', output, str(tmp_path)) == 1
+    assert builder.build('good', output, str(tmp_path)) == 0
+
+
+def test_failed_build_does_not_leave_a_reusable_stamp(builder, tmp_path):
+    """编译失败后恢复原来的源码，不能复用失败时残留的 PDF"""
+    output = str(tmp_path / 'out.pdf')
+    builder.build('good', output, str(tmp_path))
+
+    with pytest.raises(RuntimeError):
+        builder.build('FAIL', output, str(tmp_path))
+
+    assert builder.build('good', output, str(tmp_path)) == 1
+    with open(output, encoding='utf-8') as f:
+        assert f.read() == 'good'
+
+
+@pytest.mark.parametrize('template', ['thesis', 'journal'])
+def test_fonts_are_set_after_dump_marker(template):
+    """xelatex 不能把字体写入格式文件，导言区固定部分不能加载字体"""
+    latex = LatexExporter().to_latex('正文', template, {})
+    preamble, rest = latex.split(END_OF_DUMP, 1)
+
+    assert 'fontset=none' in preamble
+    assert '\\setCJK' not in preamble
+    assert '\\setCJKmainfont' in rest.split('\\begin{document}', 1)[0]
+
+
+def test_missing_xelatex_does_not_mark_format_failed(tmp_path):
+    """未安装 xelatex 时报告错误，但不记录格式文件生成失败（安装后应重新生成）"""
+    builder = LatexBuilder(build_root=str(tmp_path / 'build'),
+                           executable=str(tmp_path / 'missing-xelatex'))
+    latex = LatexExporter().to_latex('正文', 'thesis', {})
+
+    with pytest.raises(RuntimeError, match='未找到 xelatex'):
+        builder.build(latex, str(tmp_path / 'out.pdf'), str(tmp_path))
+
+    assert not list((tmp_path / 'build').rglob('*.failed'))
@@ -0,0 +1,60 @@
+"""
+Markdown 转 Word 转换器测试
+"""
+
+from src.converters.document_exporter import DocumentExporter
+from src.converters.markdown_to_docx import MarkdownToDocxConverter
+from src.parsers.extended_markdown import parse
+
+
+def test_chapters_split_at_level_one_headings():
+    converter = MarkdownToDocxConverter(workers=2)
+    blocks = parse("# 第一章\n\n正文\n\n# 第二章\n\n正文\n")
+
+    assert len(converter._chapters(blocks)) == 2
+
+
+def test_footnote_definitions_disable_chapter_split():
+    """脚注定义在文末时与第一章的引用不在同一段，不能分章转换"""
+    converter = MarkdownToDocxConverter(workers=2)
+    blocks = parse("# 第一章\n\n正文[^1]\n\n# 第二章\n\n正文\n\n[^1]: 脚注内容\n")
+
+    assert converter._chapters(blocks) == [blocks]
+
+
+def test_link_definitions_disable_chapter_split():
+    converter = MarkdownToDocxConverter(workers=2)
+    blocks = parse("# 第一章\n\n见 [文献][r]\n\n# 第二章\n\n正文\n\n[r]: https://example.com\n")
+
+    assert converter._chapters(blocks) == [blocks]
+
+
+def test_single_worker_never_splits():
+    blocks = parse("# 第一章\n\n正文\n\n# 第二章\n\n正文\n")
+
+    assert MarkdownToDocxConverter(workers=1)._chapters(blocks) == [blocks]
+
+
+def test_exporter_passes_base_dir_to_docx_and_latex(tmp_path, monkeypatch):
+    """导出 Word 和 LaTeX 时相对路径按文档目录解析，与缓存键使用的文件一致"""
+    exporter = DocumentExporter(use_cache=False)
+    calls = []
+    monkeypatch.setattr(exporter.docx_converter, 'convert_string',
+                        lambda md, template, base_dir=None: calls.append(base_dir) or b'')
+    monkeypatch.setattr(exporter.latex_exporter, 'export',
+                        lambda md, output, template, base_dir=None: calls.append(base_dir))
+
+    exporter.export('正文', str(tmp_path / 'out.docx'), 'docx', base_dir='/doc')
+    exporter.export('正文', str(tmp_path / 'out.tex'), 'latex', base_dir='/doc')
+
+    assert calls == ['/doc', '/doc']
+
+
+def test_tables_use_base_dir(tmp_path):
+    (tmp_path / 'data.csv').write_text('a,b\n1,2\n', encoding='utf-8')
+    converter = MarkdownToDocxConverter(workers=1)
+
+    markdown = converter._preprocess_markdown(parse('#table 数据 | data.csv | header=true\n'),
+                                              base_dir=str(tmp_path))
+
+    assert '| 1 | 2 |' in markdown
@@ -0,0 +1,106 @@
+"""
+LaTeX → OMML 公式转换测试
+"""
+
+import pytest
+from lxml import etree
+
+from src.converters import math_converter
+from src.converters.math_converter import OMML_NS, latex_to_omml, normalize_latex
+
+pytest.importorskip('latex2mathml')
+
+NS = {'m': OMML_NS}
+
+
+def _omml(latex: str):
+    root = etree.fromstring(latex_to_omml(latex))
+    assert root.tag == f'{{{OMML_NS}}}oMath'
+    return root
+
+
+def _text(element) -> str:
+    return ''.join(element.itertext())
+
+
+def _val(root, path: str) -> str:
+    return root.find(path, NS).get(f'{{{OMML_NS}}}val')
+
+
+def test_fraction():
+    fraction = _omml(r'\frac{a}{b}').find('m:f', NS)
+
+    assert _text(fraction.find('m:num', NS)) == 'a'
+    assert _text(fraction.find('m:den', NS)) == 'b'
+
+
+def test_sum_limits_above_and_below():
+    nary = _omml(r'\sum_{i=1}^{n} x_i').find('m:nary', NS)
+
+    assert _val(nary, 'm:naryPr/m:chr') == '∑'
+    assert _val(nary, 'm:naryPr/m:limLoc') == 'undOvr'
+    assert _text(nary.find('m:sub', NS)) == 'i=1'
+    assert _text(nary.find('m:sup', NS)) == 'n'
+    # 求和对象
+    assert nary.find('m:e/m:sSub', NS) is not None
+
+
+def test_integral_limits_on_the_side():
+    nary = _omml(r'\int_0^1 f(x)\,dx').find('m:nary', NS)
+
+    assert _val(nary, 'm:naryPr/m:chr') == '∫'
+    assert _val(nary, 'm:naryPr/m:limLoc') == 'subSup'
+    assert _text(nary.find('m:sub', NS)) == '0'
+    assert _text(nary.find('m:sup', NS)) == '1'
+    assert _text(nary.find('m:e', NS)).startswith('f')
+
+
+def test_root_with_degree():
+    radical = _omml(r'\sqrt[3]{x}').find('m:rad', NS)
+
+    assert _text(radical.find('m:deg', NS)) == '3'
+    assert _text(radical.find('m:e', NS)) == 'x'
+
+
+def test_accent():
+    accent = _omml(r'\hat{x}').find('m:acc', NS)
+
+    assert _val(accent, 'm:accPr/m:chr') == '̂'
+    assert _text(accent.find('m:e', NS)) == 'x'
+
+
+def test_left_right_delimiters():
+    delimiter = _omml(r'\left(x+1\right)').find('m:d', NS)
+
+    assert _val(delimiter, 'm:dPr/m:begChr') == '('
+    assert _val(delimiter, 'm:dPr/m:endChr') == ')'
+    assert _text(delimiter.find('m:e', NS)) == 'x+1'
+
+
+def test_pmatrix():
+    root = _omml(r'\begin{pmatrix}1&2\\3&4\end{pmatrix}')
+
+    assert _val(root, 'm:d/m:dPr/m:begChr') == '('
+    rows = root.findall('m:d/m:e/m:m/m:mr', NS)
+    assert [[_text(cell) for cell in row.findall('m:e', NS)] for row in rows] == \
+        [['1', '2'], ['3', '4']]
+
+
+def test_text_is_normal_style():
+    run = _omml(r'\text{if } x').find('m:r', NS)
+
+    assert run.find('m:rPr/m:nor', NS) is not None
+    assert _text(run.find('m:t', NS)) == 'if '
+
+
+def test_normalized_latex_shares_cache_entry():
+    """$x$ 和 ' x ' 规范化后相同，第二次转换命中缓存"""
+    assert normalize_latex('$x$') == normalize_latex(' x ') == 'x'
+
+    math_converter._latex_to_omml.cache_clear()
+    first = latex_to_omml('$x$')
+    second = latex_to_omml(' x ')
+
+    info = math_converter._latex_to_omml.cache_info()
+    assert first == second
+    assert (info.hits, info.misses) == (1, 1)
@@ -0,0 +1,93 @@
+"""
+docx 压缩包流式改写测试
+"""
+
+import io
+import zipfile
+
+import pytest
+from docx import Document
+from docx.shared import Mm
+from PIL import Image
+
+from src.converters.markdown_to_docx import ThesisTemplate
+from src.converters.ooxml_package import OoxmlPackage
+from src.templates.registry import get_template
+
+
+METADATA = {'title': '论文标题', 'author': '作者', 'school': '某某大学'}
+
+
+@pytest.fixture
+def source():
+    """python-docx 生成的文档：若干段落、一张图片"""
+    image = io.BytesIO()
+    Image.new('RGB', (64, 32), 'green').save(image, format='PNG')
+    image.seek(0)
+
+    doc = Document()
+    doc.add_heading('第一章', level=1)
+    doc.add_paragraph('摘要')
+    doc.add_paragraph('正文段落')
+    doc.add_picture(image, width=Mm(40))
+    doc.add_paragraph('关键词：测试')
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def _rewrite(source: bytes, stream_template: bool) -> bytes:
+    output = io.BytesIO()
+    with OoxmlPackage(source) as package:
+        if stream_template:
+            package.rewrite_body(ThesisTemplate(get_template('thesis')).stream(package, METADATA))
+        else:
+            package.rewrite_body(lambda elements: elements)
+        package.save(output)
+    return output.getvalue()
+
+
+def _media(data: bytes) -> dict:
+    """媒体条目压缩后的原始字节"""
+    with OoxmlPackage(data) as package:
+        return {info.filename: package._raw_entry(info) for info in package._infos
+                if info.filename.startswith('word/media/')}
+
+
+def _texts(doc) -> list:
+    return [paragraph.text for paragraph in doc.paragraphs]
+
+
+@pytest.mark.parametrize('stream_template', [False, True])
+def test_output_is_valid_zip_with_raw_media(source, stream_template):
+    result = _rewrite(source, stream_template)
+
+    with zipfile.ZipFile(io.BytesIO(result)) as archive:
+        assert archive.testzip() is None
+    media = _media(source)
+    assert media
+    assert _media(result) == media
+
+
+def test_identity_transform_keeps_document(source):
+    result = Document(io.BytesIO(_rewrite(source, False)))
+
+    assert _texts(result) == _texts(Document(io.BytesIO(source)))
+    assert len(result.inline_shapes) == 1
+
+
+def test_streamed_template_matches_python_docx(source):
+    """流式改写与 python-docx 后处理得到相同的段落、页眉和页脚"""
+    expected = Document(io.BytesIO(source))
+    ThesisTemplate(get_template('thesis')).apply(expected, METADATA)
+
+    result = Document(io.BytesIO(_rewrite(source, True)))
+
+    assert _texts(result) == _texts(expected)
+    assert len(result.inline_shapes) == 1
+    assert _texts(result.sections[0].header) == ['某某大学']
+    for streamed, applied in zip(result.sections, expected.sections):
+        assert _texts(streamed.header) == _texts(applied.header)
+        assert _texts(streamed.footer) == _texts(applied.footer)
+        assert streamed.footer.paragraphs[0]._p.xml.count('PAGE') == \
+            applied.footer.paragraphs[0]._p.xml.count('PAGE')
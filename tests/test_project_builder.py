@@ -0,0 +1,98 @@
+"""
+多文件项目构建测试（LaTeX 输出，不需要 pandoc）
+"""
+
+import os
+
+import pytest
+
+from src.converters.project_builder import ProjectBuilder, load_manifest
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """清单在 project/ 中，输出到 project/build/，两章各有一张图"""
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    root = tmp_path / 'project'
+    (root / 'chapters').mkdir(parents=True)
+    (root / 'fig.png').write_bytes(b'png')
+    (root / 'chapters' / 'ch1.md').write_text('# 第一章\n\n#figure 图一 | fig.png\n',
+                                              encoding='utf-8')
+    (root / 'chapters' / 'ch2.md').write_text('# 第二章\n\n正文\n', encoding='utf-8')
+    (root / 'thesis.yaml').write_text(
+        'template: thesis\ntitle: 标题\noutput: build/thesis.tex\n'
+        'chapters:\n  - chapters/ch1.md\n  - chapters/ch2.md\n', encoding='utf-8')
+    return root
+
+
+def _builder(project, tmp_path):
+    return ProjectBuilder(load_manifest(str(project / 'thesis.yaml')),
+                          build_dir=str(tmp_path / 'state'), workers=1)
+
+
+def test_latex_graphicspath_points_to_manifest_dir(project, tmp_path):
+    """章节中的图片路径相对清单目录，输出目录中的主文档需指向清单目录"""
+    result = _builder(project, tmp_path).build('latex')
+
+    with open(result.output_file, encoding='utf-8') as f:
+        main = f.read()
+    assert '\\graphicspath{{../}}' in main
+    chapter = (project / 'build' / 'chapters' / 'ch01.tex').read_text(encoding='utf-8')
+    assert '{fig.png}' in chapter
+    assert os.path.exists(os.path.join(os.path.dirname(result.output_file), '../fig.png'))
+
+
+def test_only_changed_chapters_are_rebuilt(project, tmp_path):
+    builder = _builder(project, tmp_path)
+    ch1, ch2 = builder.manifest.chapters
+
+    first = builder.build('latex')
+    assert first.rebuilt == [ch1, ch2] and first.reused == []
+
+    (project / 'chapters' / 'ch2.md').write_text('# 第二章\n\n修改后的正文\n', encoding='utf-8')
+    second = _builder(project, tmp_path).build('latex')
+
+    assert second.rebuilt == [ch2]
+    assert second.reused == [ch1]
+    chapter = (project / 'build' / 'chapters' / 'ch02.tex').read_text(encoding='utf-8')
+    assert '修改后的正文' in chapter
+
+
+def test_unchanged_project_output_is_identical(project, tmp_path):
+    """内容不变时不重新转换，输出文件内容和章节文件的修改时间都不变"""
+    builder = _builder(project, tmp_path)
+    first = builder.build('latex')
+    chapter = project / 'build' / 'chapters' / 'ch01.tex'
+    with open(first.output_file, 'rb') as f:
+        main = f.read()
+    mtime = chapter.stat().st_mtime_ns
+
+    again = _builder(project, tmp_path).build('latex')
+
+    assert again.rebuilt == []
+    assert len(again.reused) == 2
+    with open(again.output_file, 'rb') as f:
+        assert f.read() == main
+    assert chapter.stat().st_mtime_ns == mtime
+
+
+def test_force_rebuilds_everything(project, tmp_path):
+    _builder(project, tmp_path).build('latex')
+
+    result = _builder(project, tmp_path).build('latex', force=True)
+
+    assert len(result.rebuilt) == 2 and result.reused == []
+
+
+def test_removed_chapters_are_pruned(project, tmp_path):
+    """清单中删除章节后，多余的哈希记录被删除"""
+    _builder(project, tmp_path).build('latex')
+    (project / 'thesis.yaml').write_text(
+        'template: thesis\noutput: build/thesis.tex\nchapters:\n  - chapters/ch1.md\n',
+        encoding='utf-8')
+
+    builder = _builder(project, tmp_path)
+    result = builder.build('latex')
+
+    assert result.reused == list(builder.manifest.chapters)
+    assert set(builder._load_state()['latex']) == {'ch01'}
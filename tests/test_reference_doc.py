@@ -0,0 +1,42 @@
+"""
+reference.docx 缓存测试
+"""
+
+import types
+
+import pytest
+from docx import Document
+
+from src.templates import reference_doc
+from src.templates.reference_doc import ReferenceDocCache
+from src.templates.registry import get_template
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    """代替 pandoc：内置 reference.docx 为空白文档，版本可修改"""
+    blank = tmp_path / 'blank.docx'
+    Document().save(blank)
+    fake = types.SimpleNamespace(version=lambda: fake.pandoc_version,
+                                 default_data_file=lambda name: blank.read_bytes(),
+                                 pandoc_version='pandoc 3.1.9')
+    monkeypatch.setattr(reference_doc, 'get_pandoc_runner', lambda: fake)
+    return fake
+
+
+def test_pandoc_upgrade_rebuilds_reference_doc(tmp_path, runner):
+    style = get_template('thesis')
+    first = ReferenceDocCache(str(tmp_path / 'reference')).get(style)
+
+    runner.pandoc_version = 'pandoc 3.2'
+    second = ReferenceDocCache(str(tmp_path / 'reference')).get(style)
+
+    assert first and second and first != second
+
+
+def test_unwritable_cache_dir_falls_back(tmp_path, runner):
+    """缓存目录无法创建时返回 None，由调用方回退为 python-docx 后处理"""
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+
+    assert ReferenceDocCache(str(blocker / 'reference')).get(get_template('thesis')) is None
@@ -0,0 +1,63 @@
+"""
+表格转换器测试
+"""
+
+import warnings
+
+from src.converters.table_converter import DEFAULT_TABLE_MAX_ROWS, TableConverter, table_options
+from src.utils.config import Config
+
+
+def _write_csv(tmp_path, text):
+    path = tmp_path / "data.csv"
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_fixed_decimals_keeps_inf_and_huge_values(tmp_path):
+    """inf 和超出 int64 范围的值按文本格式化，不溢出"""
+    path = _write_csv(tmp_path, "name,v\na,inf\nb,1e20\nc,-3.14159\nd,-inf\n")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        table = TableConverter.csv_to_markdown(path, decimals=2)
+
+    rows = table.splitlines()[2:]
+    assert rows == [
+        "| a | inf |",
+        "| b | 100000000000000000000.00 |",
+        "| c | -3.14 |",
+        "| d | -inf |",
+    ]
+
+
+def test_fixed_decimals_thousands_out_of_range(tmp_path):
+    """超出范围的值同样加千位分隔符"""
+    path = _write_csv(tmp_path, "v\n1e20\n1234567.5\n")
+
+    table = TableConverter.csv_to_markdown(path, decimals=0, thousands=True)
+
+    assert table.splitlines()[2:] == [
+        "| 100,000,000,000,000,000,000 |",
+        "| 1,234,568 |",
+    ]
+
+
+def test_table_options_default_row_bound(monkeypatch):
+    """未指定 max_rows / sample 时使用默认行数上限，可通过配置修改"""
+    assert table_options({})['max_rows'] == DEFAULT_TABLE_MAX_ROWS
+    assert table_options({'sample': '50'})['max_rows'] is None
+    assert table_options({'max_rows': '20'})['max_rows'] == 20
+
+    monkeypatch.setattr(Config, 'get', lambda self, key, default=None:
+                        0 if key == 'table_max_rows' else default)
+    assert table_options({})['max_rows'] is None
+
+
+def test_formatted_table_respects_row_bound(tmp_path):
+    path = _write_csv(tmp_path, "v\n" + "".join(f"{i}\n" for i in range(100)))
+
+    table = TableConverter.table_to_markdown(path, **dict(table_options({'max_rows': '5'}),
+                                                          decimals=1))
+
+    assert table.splitlines()[2:] == [f"| {i}.0 |" for i in range(5)]